@@ -2,8 +2,13 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import hashlib
+import uuid
+from typing import Optional
+
+import rapidjson
 from apispec import APISpec, yaml_utils
-from quart import Blueprint, request, render_template, current_app
+from quart import Blueprint, Quart, request, render_template, current_app, make_response
 from zmq.asyncio import Socket
 from flowapi import __version__
 from flowapi.permissions import schema_to_scopes
@@ -11,15 +16,16 @@ from flowapi.permissions import schema_to_scopes
 blueprint = Blueprint("spec", __name__)
 
 
-async def get_spec(socket: Socket, request_id: str) -> APISpec:
+def build_spec(*, app: Quart, flowmachine_query_schemas: dict) -> APISpec:
     """
-    Construct open api spec by interrogating FlowMachine.
+    Construct open api spec from FlowMachine's query schemas.
 
     Parameters
     ----------
-    socket : Socket
-    request_id : str
-        Unique id of the request
+    app : Quart
+        The FlowAPI app to document
+    flowmachine_query_schemas : dict
+        Query schemas returned by FlowMachine
 
     Returns
     -------
@@ -27,18 +33,16 @@ async def get_spec(socket: Socket, request_id: str) -> APISpec:
         The specification object
 
     """
-    msg = {"request_id": request_id, "action": "get_query_schemas"}
-    socket.send_json(msg)
-    #  Get the reply.
-    reply = await socket.recv_json()
-    flowmachine_query_schemas = reply["payload"]["query_schemas"]
     # Need to mark query_kind as a required field
     # this is a workaround because the marshmallow-oneOf plugin strips
     # the query_kind off, which means it can't be required from the marshmallow
     # side without raising an error
     for schema, schema_dict in flowmachine_query_schemas.items():
         try:
-            if "query_kind" in schema_dict["properties"]:
+            if (
+                "query_kind" in schema_dict["properties"]
+                and "query_kind" not in schema_dict["required"]
+            ):
                 schema_dict["required"].append("query_kind")
         except KeyError:
             pass  # Doesn't have any properties
@@ -60,14 +64,14 @@ async def get_spec(socket: Socket, request_id: str) -> APISpec:
             "scheme": "bearer",
             "bearerFormat": "JWT",
             "x-security-scopes": sorted(schema_to_scopes(spec.to_dict())),
-            "x-audience": current_app.config["JWT_DECODE_AUDIENCE"],
+            "x-audience": app.config["JWT_DECODE_AUDIENCE"],
         },
     )
     # Loop over all the registered views and try to parse a yaml
     # openapi spec from their docstrings
-    for rule in current_app.url_map.iter_rules():
+    for rule in app.url_map.iter_rules():
         try:
-            func = current_app.view_functions[rule.endpoint]
+            func = app.view_functions[rule.endpoint]
             operations = yaml_utils.load_operations_from_docstring(func.__doc__)
             if len(operations) > 0:
                 for method, op in operations.items():
@@ -81,16 +85,163 @@ async def get_spec(socket: Socket, request_id: str) -> APISpec:
     return spec
 
 
+class SpecCache:
+    """
+    The open api spec, built once for each version of FlowMachine's query schemas.
+
+    Each time the spec is requested, FlowMachine is asked whether its query schemas
+    have changed since the spec was built, and the spec (including the list of
+    scopes it grants) is only rebuilt if they have.
+
+    Attributes
+    ----------
+    schemas_hash : str or None
+        FlowMachine's hash of the query schemas the spec was built from
+    spec : APISpec or None
+        The specification object
+    spec_dict : dict or None
+        The spec as a dict
+    spec_yaml : str or None
+        The spec as yaml
+    etag : str or None
+        Entity tag identifying this version of the spec
+    """
+
+    def __init__(self) -> None:
+        self.schemas_hash: Optional[str] = None
+        self.spec: Optional[APISpec] = None
+        self.spec_dict: Optional[dict] = None
+        self.spec_yaml: Optional[str] = None
+        self.etag: Optional[str] = None
+
+    async def refresh(self, *, app: Quart, socket: Socket, request_id: str) -> APISpec:
+        """
+        Rebuild the spec if FlowMachine's query schemas have changed since it
+        was last built.
+
+        Parameters
+        ----------
+        app : Quart
+            The FlowAPI app to document
+        socket : Socket
+        request_id : str
+            Unique id of the request
+
+        Returns
+        -------
+        APISpec
+            The specification object
+        """
+        msg = {"request_id": request_id, "action": "get_query_schemas"}
+        if self.schemas_hash is not None:
+            msg["params"] = {"schemas_hash": self.schemas_hash}
+        socket.send_json(msg)
+        #  Get the reply.
+        reply = await socket.recv_json()
+        payload = reply["payload"]
+        if self.spec is None or "query_schemas" in payload:
+            spec = build_spec(
+                app=app, flowmachine_query_schemas=payload["query_schemas"]
+            )
+            spec_dict = spec.to_dict()
+            self.spec, self.spec_dict, self.spec_yaml = spec, spec_dict, spec.to_yaml()
+            self.etag = hashlib.md5(
+                rapidjson.dumps(spec_dict, sort_keys=True).encode()
+            ).hexdigest()
+            self.schemas_hash = payload.get("query_schemas_hash")
+        return self.spec
+
+
+async def get_spec(socket: Socket, request_id: str) -> APISpec:
+    """
+    Get the open api spec, rebuilding it if FlowMachine's query schemas have changed.
+
+    Parameters
+    ----------
+    socket : Socket
+    request_id : str
+        Unique id of the request
+
+    Returns
+    -------
+    APISpec
+        The specification object
+
+    """
+    return await current_app.api_spec_cache.refresh(
+        app=current_app, socket=socket, request_id=request_id
+    )
+
+
+async def preload_spec(app: Quart) -> None:
+    """
+    Build the spec, so that it is ready before the first request for it.
+
+    Parameters
+    ----------
+    app : Quart
+        The FlowAPI app to document
+    """
+    channel = app.flowmachine_client.channel()
+    try:
+        await app.api_spec_cache.refresh(
+            app=app, socket=channel, request_id=str(uuid.uuid4())
+        )
+        app.flowapi_logger.debug("Built API spec.", etag=app.api_spec_cache.etag)
+    except Exception as exc:
+        app.flowapi_logger.error(
+            "Failed to build API spec. It will be built when first requested.",
+            exception=str(exc),
+        )
+    finally:
+        channel.close()
+
+
+async def make_conditional_response(
+    content, *, etag: str, content_type: Optional[str] = None
+):
+    """
+    Make a response, or an empty 304 response if the client already has this
+    version of the content.
+
+    Parameters
+    ----------
+    content
+        Content of the response
+    etag : str
+        Entity tag identifying the content
+    content_type : str, optional
+        Content type of the response, if not the default for the content
+
+    Returns
+    -------
+    Response
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = await make_response("", 304)
+    else:
+        response = await make_response(content)
+        if content_type is not None:
+            response.content_type = content_type
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
 @blueprint.route("/openapi.json")
 async def get_api_spec():
-    spec = await get_spec(request.socket, request.request_id)
-    return spec.to_dict()
+    await get_spec(request.socket, request.request_id)
+    cache = current_app.api_spec_cache
+    return await make_conditional_response(cache.spec_dict, etag=f"{cache.etag}-json")
 
 
 @blueprint.route("/openapi.yaml")
 async def get_yaml_api_spec():
-    spec = await get_spec(request.socket, request.request_id)
-    return spec.to_yaml(), 200, dict(content_type="application/x-yaml")
+    await get_spec(request.socket, request.request_id)
+    cache = current_app.api_spec_cache
+    return await make_conditional_response(
+        cache.spec_yaml, etag=f"{cache.etag}-yaml", content_type="application/x-yaml"
+    )
 
 
 @blueprint.route("/redoc")
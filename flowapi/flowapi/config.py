@@ -54,6 +54,19 @@ def get_config():
 
         flowmachine_host = environ["FLOWMACHINE_HOST"]
         flowmachine_port = environ["FLOWMACHINE_PORT"]
+        flowmachine_request_timeout = float(getenv("FLOWMACHINE_REQUEST_TIMEOUT", "60"))
+        json_encode_in_db = (
+            getenv("FLOWAPI_JSON_ENCODE_IN_DB", "false").lower() == "true"
+        )
+        preload_spec = getenv("FLOWAPI_PRELOAD_SPEC", "true").lower() == "true"
+        # Long-polls must finish well within the FlowMachine request timeout
+        max_poll_wait = min(
+            float(getenv("FLOWAPI_MAX_POLL_WAIT", "30")),
+            flowmachine_request_timeout / 2,
+        )
+        result_cache_dir = getenv("FLOWAPI_RESULT_CACHE_DIR", "") or None
+        result_cache_size = int(getenv("FLOWAPI_RESULT_CACHE_SIZE", str(1024 ** 3)))
+        token_scopes_cache_size = int(getenv("FLOWAPI_TOKEN_SCOPES_CACHE_SIZE", "1024"))
 
         flowdb_user = environ["FLOWAPI_FLOWDB_USER"]
         flowdb_password = environ["FLOWAPI_FLOWDB_PASSWORD"]
@@ -71,6 +84,13 @@ def get_config():
         FLOWAPI_LOG_LEVEL=log_level,
         FLOWMACHINE_HOST=flowmachine_host,
         FLOWMACHINE_PORT=flowmachine_port,
+        FLOWMACHINE_REQUEST_TIMEOUT=flowmachine_request_timeout,
+        MAX_POLL_WAIT=max_poll_wait,
+        TOKEN_SCOPES_CACHE_SIZE=token_scopes_cache_size,
+        PRELOAD_SPEC=preload_spec,
+        JSON_ENCODE_IN_DB=json_encode_in_db,
+        RESULT_CACHE_DIR=result_cache_dir,
+        RESULT_CACHE_SIZE=result_cache_size,
         FLOWDB_DSN=f"postgres://{flowdb_user}:{flowdb_password}@{flowdb_host}:{flowdb_port}/flowdb",
         JWT_DECODE_AUDIENCE=flowapi_server_id,
     )
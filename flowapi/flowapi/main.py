@@ -1,6 +1,7 @@
 # This Source Code Form is subject to the terms of the Mozilla Public
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
+import asyncio
 import rapidjson
 
 import uuid
@@ -9,19 +10,19 @@ import sys
 from quart import Quart, request, current_app
 import asyncpg
 import logging
-import zmq
-from zmq.asyncio import Context
 
 from flowapi.config import get_config
 from flowapi.jwt_auth_callbacks import register_logging_callbacks
 from flowapi.query_endpoints import blueprint as query_endpoints_blueprint
 from flowapi.geography import blueprint as geography_blueprint
-from flowapi.api_spec import blueprint as spec_blueprint
+from flowapi.api_spec import SpecCache, blueprint as spec_blueprint, preload_spec
 from quart_jwt_extended import JWTManager
 
 import structlog
 
-from flowapi.user_model import user_loader_callback
+from flowapi.result_cache import ResultCache
+from flowapi.user_model import TokenScopesCache, user_loader_callback
+from flowapi.zmq_client import FlowmachineClient
 
 
 root_logger = logging.getLogger("flowapi")
@@ -77,46 +78,87 @@ async def connect_logger():
 
 
 async def connect_zmq():
-    context = Context.instance()
-    #  Socket to talk to server
-    current_app.flowapi_logger.debug("Connecting to FlowMachine server…")
-    socket = context.socket(zmq.REQ)
-    socket.connect(
-        f"tcp://{current_app.config['FLOWMACHINE_HOST']}:{current_app.config['FLOWMACHINE_PORT']}"
+    current_app.flowmachine_client = FlowmachineClient(
+        address=f"tcp://{current_app.config['FLOWMACHINE_HOST']}:{current_app.config['FLOWMACHINE_PORT']}",
+        timeout=current_app.config["FLOWMACHINE_REQUEST_TIMEOUT"],
+        logger=current_app.flowapi_logger,
     )
-    request.socket = socket
-    current_app.flowapi_logger.debug("Connected.")
+    current_app.flowmachine_client.connect()
+
+
+async def close_zmq():
+    current_app.flowmachine_client.close()
+
+
+async def create_spec_cache():
+    current_app.api_spec_cache = SpecCache()
+    if current_app.config["PRELOAD_SPEC"]:
+        current_app.preload_spec_task = asyncio.ensure_future(
+            preload_spec(current_app._get_current_object())
+        )
+
+
+async def cancel_preload_spec():
+    try:
+        current_app.preload_spec_task.cancel()
+    except AttributeError:
+        pass  # Spec wasn't preloaded
 
 
 async def add_uuid():
     request.request_id = str(uuid.uuid4())
 
 
-def close_zmq(exc):
-    current_app.flowapi_logger.debug("Closing connection to FlowMachine server…")
+async def open_flowmachine_channel():
+    request.socket = current_app.flowmachine_client.channel()
+
+
+def close_flowmachine_channel(exc):
     try:
         request.socket.close()
-        current_app.flowapi_logger.debug("Closed socket.")
     except AttributeError:
-        current_app.flowapi_logger.debug("No socket to close.")
+        current_app.flowapi_logger.debug("No FlowMachine channel to close.")
+
+
+async def init_db_connection(connection):
+    # Configure asyncpg to encode/decode JSON values
+    await connection.set_type_codec(
+        "json", encoder=rapidjson.dumps, decoder=rapidjson.loads, schema="pg_catalog"
+    )
 
 
 async def create_db():
     dsn = current_app.config["FLOWDB_DSN"]
-    current_app.db_conn_pool = await asyncpg.create_pool(dsn, max_size=20)
+    current_app.db_conn_pool = await asyncpg.create_pool(
+        dsn, max_size=20, init=init_db_connection
+    )
 
 
 def create_app():
     app = Quart(__name__)
 
     app.config.from_mapping(get_config())
+    app.token_scopes_cache = TokenScopesCache(
+        maxsize=app.config["TOKEN_SCOPES_CACHE_SIZE"]
+    )
+    if app.config["RESULT_CACHE_DIR"] is None:
+        app.result_cache = None
+    else:
+        app.result_cache = ResultCache(
+            directory=app.config["RESULT_CACHE_DIR"],
+            max_bytes=app.config["RESULT_CACHE_SIZE"],
+        )
 
     jwt = JWTManager(app)
     app.before_serving(connect_logger)
     app.before_serving(create_db)
+    app.before_serving(connect_zmq)
+    app.before_serving(create_spec_cache)
+    app.after_serving(cancel_preload_spec)
+    app.after_serving(close_zmq)
     app.before_request(add_uuid)
-    app.before_request(connect_zmq)
-    app.teardown_request(close_zmq)
+    app.before_request(open_flowmachine_channel)
+    app.teardown_request(close_flowmachine_channel)
 
     @app.route("/")
     async def root():
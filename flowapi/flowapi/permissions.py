@@ -2,11 +2,13 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 import functools
-from itertools import product, repeat
-from typing import Iterable, List, Optional, Tuple, Union
+import re
+from collections import defaultdict
+from itertools import permutations, product, repeat
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
 
 from prance import ResolvingParser
-from rapidjson import dumps
+from rapidjson import dumps, loads
 
 
 def enum_paths(
@@ -262,10 +264,27 @@ def schema_to_scopes(schema: dict) -> Iterable[str]:
     )
 
 
+def _expand_part(part: str) -> List[str]:
+    # Split a part of a compact scope into its comma separated alternatives,
+    # expanding alternatives whose final segment lists values in braces.
+    alternatives = []
+    for alternative in re.split(r",(?![^{]*})", part.strip()):
+        prefix, brace, values = alternative.partition(".{")
+        if brace and values.endswith("}") and "." not in values:
+            alternatives.extend(f"{prefix}.{value}" for value in values[:-1].split(","))
+        else:
+            alternatives.append(alternative)
+    return alternatives
+
+
 def expand_scopes(*, scopes: List[str]) -> str:
     """
     Expand up a list of compact scopes to full scopes
 
+    The final segment of each alternative in a compact scope may list several
+    values in braces, e.g. "run&dummy.aggregation_unit.{admin0,admin1}", which
+    expands to a scope for each value.
+
     Parameters
     ----------
     scopes : list of str
@@ -279,10 +298,99 @@ def expand_scopes(*, scopes: List[str]) -> str:
     """
     for scope in scopes:
         parts = scope.strip().split("&")
-        ps = (x.split(",") for x in parts)
+        ps = (_expand_part(x) for x in parts)
         yield from (set(x) for x in product(*ps))
 
 
+class CompiledScopes:
+    """
+    Set of full scopes which can be checked for a requested scope.
+
+    Scopes without wildcards are held in a set, so checking them is a single
+    lookup. Scope parts may use `*` as their final dot separated segment to
+    match any value of that segment, e.g. "run&dummy.aggregation_unit.*";
+    `*` anywhere else is not a wildcard. Scopes containing wildcards are indexed
+    by the number of segments in each of their parts, and checked by matching
+    each part's other segments exactly.
+
+    Parameters
+    ----------
+    scopes : iterable of set of str
+        Full scopes, as yielded by `expand_scopes`
+    """
+
+    def __init__(self, scopes: Iterable[set]) -> None:
+        exact = set()
+        self.wildcards: Dict[
+            Tuple[int, ...], List[Tuple[Tuple[str, ...], ...]]
+        ] = defaultdict(list)
+        for scope in scopes:
+            if any(_is_wildcard(part) for part in scope):
+                pattern = tuple(tuple(part.split(".")) for part in scope)
+                self.wildcards[_shape(pattern)].append(pattern)
+            else:
+                exact.add(frozenset(scope))
+        self.exact: FrozenSet[FrozenSet[str]] = frozenset(exact)
+
+    def __contains__(self, scope: FrozenSet[str]) -> bool:
+        if scope in self.exact:
+            return True
+        if not self.wildcards:
+            return False
+        requested = tuple(tuple(part.split(".")) for part in scope)
+        return any(
+            _pattern_matches(pattern, requested)
+            for pattern in self.wildcards.get(_shape(requested), ())
+        )
+
+    def __len__(self) -> int:
+        return len(self.exact) + sum(len(x) for x in self.wildcards.values())
+
+
+def _is_wildcard(part: str) -> bool:
+    return part.endswith(".*")
+
+
+def _shape(scope: Tuple[Tuple[str, ...], ...]) -> Tuple[int, ...]:
+    return tuple(sorted(len(part) for part in scope))
+
+
+def _part_matches(pattern: Tuple[str, ...], part: Tuple[str, ...]) -> bool:
+    return (
+        len(pattern) == len(part)
+        and pattern[:-1] == part[:-1]
+        and (pattern[-1] == part[-1] or (len(pattern) > 1 and pattern[-1] == "*"))
+    )
+
+
+def _pattern_matches(
+    pattern: Tuple[Tuple[str, ...], ...], requested: Tuple[Tuple[str, ...], ...]
+) -> bool:
+    return any(
+        all(_part_matches(p, r) for p, r in zip(pattern, ordering))
+        for ordering in permutations(requested)
+    )
+
+
+def compile_scopes(*, scopes: List[str]) -> CompiledScopes:
+    """
+    Expand a list of compact scopes, and compile them into a set which can
+    be checked for a full scope.
+
+    Parameters
+    ----------
+    scopes : list of str
+        Compressed scopes to expand
+
+    Returns
+    -------
+    CompiledScopes
+        The full scopes
+
+    """
+    return CompiledScopes(expand_scopes(scopes=scopes))
+
+
 @functools.singledispatch
 def query_to_scope_list(tree, paths=None, keep=["aggregation_unit"]) -> str:
     """
@@ -335,3 +443,27 @@ def _(tree: dict, paths=None, keep=["aggregation_unit"]) -> str:
                 yielded_any = True
     if not yielded_any and "query_kind" in tree:
         yield ".".join(paths)
+
+
+@functools.lru_cache(maxsize=4096)
+def _query_string_to_scopes(query_string: str) -> FrozenSet[str]:
+    return frozenset(query_to_scope_list(loads(query_string)))
+
+
+def query_to_scopes(query_json: dict) -> FrozenSet[str]:
+    """
+    Get the set of scope strings needed to access a query, remembering
+    the result for recently seen query specs.
+
+    Parameters
+    ----------
+    query_json : dict
+        Query spec
+
+    Returns
+    -------
+    frozenset of str
+        Scope strings for the query
+
+    """
+    return _query_string_to_scopes(dumps(query_json, sort_keys=True))
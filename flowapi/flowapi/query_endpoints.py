@@ -2,9 +2,19 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import hashlib
+
 from quart_jwt_extended import jwt_required, current_user
 from quart import Blueprint, current_app, request, url_for, stream_with_context
-from .stream_results import stream_result_as_json, stream_result_as_csv
+from .stream_results import (
+    compress_stream,
+    negotiate_content_encoding,
+    stream_result_as_arrow,
+    stream_result_as_csv,
+    stream_result_as_json,
+    stream_result_as_parquet,
+)
+from .utils import get_result_selection
 
 blueprint = Blueprint("query", __name__)
 
@@ -121,6 +131,13 @@ async def poll_query(query_id):
           required: true
           schema:
             type: string
+        - in: query
+          name: wait
+          required: false
+          description: Maximum number of seconds to wait for the query's status to change before replying, if it is queued or executing. Capped by the server.
+          schema:
+            type: number
+            minimum: 0
       responses:
         '202':
           content:
@@ -153,6 +170,12 @@ async def poll_query(query_id):
               schema:
                 format: url
                 type: string
+        '400':
+          content:
+            application/json:
+              schema:
+                type: object
+          description: Invalid wait time.
         '401':
           description: Unauthorized.
         '403':
@@ -168,12 +191,17 @@ async def poll_query(query_id):
       summary: Get the status of a query
     """
     await current_user.can_poll_by_query_id(query_id=query_id)
+    try:
+        wait = float(request.args.get("wait", 0))
+    except ValueError:
+        return {"status": "error", "msg": "'wait' must be a number."}, 400
+    if not wait >= 0:
+        return {"status": "error", "msg": "'wait' must not be negative."}, 400
+    params = {"query_id": query_id}
+    if wait > 0:
+        params["wait"] = min(wait, current_app.config["MAX_POLL_WAIT"])
     request.socket.send_json(
-        {
-            "request_id": request.request_id,
-            "action": "poll_query",
-            "params": {"query_id": query_id},
-        }
+        {"request_id": request.request_id, "action": "poll_query", "params": params}
     )
     reply = await request.socket.recv_json()
     current_app.flowapi_logger.debug(
@@ -230,6 +258,46 @@ async def get_query_result(query_id, filetype="json"):
               - json
               - geojson
               - csv
+              - arrow
+              - parquet
+        - in: query
+          name: columns
+          required: false
+          description: Comma separated names of the columns to include.
+          schema:
+            type: string
+        - in: query
+          name: filters
+          required: false
+          description: JSON object mapping column names to the value rows must have in that column.
+          schema:
+            type: string
+        - in: query
+          name: order_by
+          required: false
+          description: Comma separated names of the columns to order rows by.
+          schema:
+            type: string
+        - in: query
+          name: after
+          required: false
+          description: JSON array of values of the order_by columns. Only rows which come after these values are included.
+          schema:
+            type: string
+        - in: query
+          name: limit
+          required: false
+          description: Maximum number of rows to include.
+          schema:
+            type: integer
+            minimum: 0
+        - in: query
+          name: offset
+          required: false
+          description: Number of rows to skip.
+          schema:
+            type: integer
+            minimum: 0
       responses:
         '200':
           content:
@@ -242,6 +310,14 @@ async def get_query_result(query_id, filetype="json"):
             text/csv:
               schema:
                 type: string
+            application/vnd.apache.arrow.stream:
+              schema:
+                type: string
+                format: binary
+            application/vnd.apache.parquet:
+              schema:
+                type: string
+                format: binary
           description: Results returning.
         '202':
           content:
@@ -249,6 +325,14 @@ async def get_query_result(query_id, filetype="json"):
               schema:
                 type: object
           description: Request accepted.
+        '304':
+          description: Result not modified since it was last retrieved.
+        '400':
+          content:
+            application/json:
+              schema:
+                type: object
+          description: Invalid file format, or selection of part of the result.
         '401':
           description: Unauthorized.
         '403':
@@ -264,12 +348,27 @@ async def get_query_result(query_id, filetype="json"):
       summary: Get the output of query
     """
     await current_user.can_get_results_by_query_id(query_id=query_id)
+    try:
+        selection = get_result_selection(request.args)
+    except ValueError as exc:
+        return {"status": "error", "msg": str(exc)}, 400
+    params = {"query_id": query_id}
+    if selection is not None:
+        if filetype == "geojson":
+            return (
+                {
+                    "status": "error",
+                    "msg": "Parts of results can't be selected for geojson.",
+                },
+                400,
+            )
+        params["selection"] = selection
     msg = {
         "request_id": request.request_id,
         "action": "get_geo_sql_for_query_result"
         if filetype == "geojson"
         else "get_sql_for_query_result",
-        "params": {"query_id": query_id},
+        "params": params,
     }
     request.socket.send_json(msg)
     reply = await request.socket.recv_json()
@@ -290,6 +389,9 @@ async def get_query_result(query_id, filetype="json"):
                 )  # TODO: should this really be 403?
             elif query_state in ("awol", "known"):
                 return {"status": "Error", "msg": reply["msg"]}, 404
+            elif query_state == "completed":
+                # The query is fine, but the selection isn't
+                return {"status": "Error", "msg": reply["msg"]}, 400
             else:
                 return (
                     {
@@ -310,6 +412,12 @@ async def get_query_result(query_id, filetype="json"):
         elif filetype == "csv":
             results_streamer = stream_with_context(stream_result_as_csv)(sql)
             mimetype = "text/csv"
+        elif filetype == "arrow":
+            results_streamer = stream_with_context(stream_result_as_arrow)(sql)
+            mimetype = "application/vnd.apache.arrow.stream"
+        elif filetype == "parquet":
+            results_streamer = stream_with_context(stream_result_as_parquet)(sql)
+            mimetype = "application/vnd.apache.parquet"
         elif filetype == "geojson":
             current_user.can_get_geography(
                 aggregation_unit=reply["payload"]["aggregation_unit"]
@@ -323,18 +431,57 @@ async def get_query_result(query_id, filetype="json"):
         else:
             return {"status": "error", "msg": "Invalid file format"}, 400
 
+        # Arrow and parquet results are already compressed
+        if filetype in ("arrow", "parquet"):
+            content_encoding = None
+        else:
+            content_encoding = negotiate_content_encoding(request.accept_encodings)
+        headers = {"Vary": "Accept-Encoding"}
+
+        # The result can only change if the query's cache table is recreated
+        created = reply["payload"].get("created")
+        if created is None:
+            etag = None
+        else:
+            etag = hashlib.md5(
+                f"{query_id}:{created}:{filetype}:{content_encoding}:{selection}".encode()
+            ).hexdigest()
+            headers["ETag"] = f'"{etag}"'
+            headers["Cache-Control"] = "private, no-cache"
+            if request.if_none_match.contains_weak(etag):
+                current_app.flowapi_logger.debug(
+                    f"Result of query {query_id} not modified.",
+                    request_id=request.request_id,
+                )
+                return "", 304, headers
+
+        headers["Transfer-Encoding"] = "chunked"
+        headers["Content-Disposition"] = f"attachment;filename={query_id}.{filetype}"
+        headers["Content-type"] = mimetype
+        if content_encoding is not None:
+            headers["Content-Encoding"] = content_encoding
+
+        result_cache = current_app.result_cache
+        cached_result = (
+            None if result_cache is None or etag is None else result_cache.get(etag)
+        )
+        if cached_result is not None:
+            current_app.flowapi_logger.debug(
+                f"Returning cached result of query {query_id}.",
+                request_id=request.request_id,
+            )
+            results = cached_result
+        else:
+            results = results_streamer
+            if content_encoding is not None:
+                results = compress_stream(results, content_encoding)
+            if result_cache is not None and etag is not None:
+                results = result_cache.tee(etag, results)
+
         current_app.flowapi_logger.debug(
             f"Returning result of query {query_id}.", request_id=request.request_id
         )
-        return (
-            results_streamer,
-            200,
-            {
-                "Transfer-Encoding": "chunked",
-                "Content-Disposition": f"attachment;filename={query_id}.{filetype}",
-                "Content-type": mimetype,
-            },
-        )
+        return results, 200, headers
 
 
 @blueprint.route("/available_dates")
@@ -0,0 +1,145 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+On-disk cache of rendered query results.
+
+The result of a completed query doesn't change until the query is reset, so
+once a result has been streamed to a client in one format (and encoding) the
+bytes can be kept and sent again to the next client which asks for it, without
+going back to the database. Entries are keyed by the result's ETag, which
+changes whenever the query's cache table is recreated, so stale entries are
+never served; they just age out.
+
+The total size of the cached files is bounded, and the least recently used
+files are removed once it is exceeded.
+"""
+
+import os
+import uuid
+from typing import AsyncIterator, Optional
+
+
+class ResultCache:
+    """
+    Least-recently-used cache of rendered query results, stored as files in a
+    directory.
+
+    Parameters
+    ----------
+    directory : str
+        Directory to store the results in. Created if it doesn't exist.
+    max_bytes : int
+        Maximum total size of the stored results. Results larger than this
+        are never cached.
+    chunk_size : int, default 65536
+        Number of bytes to send at a time when reading a cached result
+    """
+
+    def __init__(self, *, directory: str, max_bytes: int, chunk_size: int = 65536):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> Optional[AsyncIterator[bytes]]:
+        """
+        Get a cached result, marking it as most recently used.
+
+        Parameters
+        ----------
+        key : str
+            Key the result was cached under
+
+        Returns
+        -------
+        async iterator of bytes, or None
+            Chunks of the cached result, or None if it isn't in the cache
+        """
+        path = self._path(key)
+        try:
+            result_file = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # Evicted since opening, but the open file can still be read
+        return self._read(result_file)
+
+    async def _read(self, result_file) -> AsyncIterator[bytes]:
+        with result_file:
+            while True:
+                chunk = result_file.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    async def tee(self, key: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """
+        Pass through a result as it is streamed, storing it in the cache once
+        it has been streamed completely.
+
+        Nothing is stored if streaming fails or is abandoned part way, or if the
+        result is larger than the cache.
+
+        Parameters
+        ----------
+        key : str
+            Key to cache the result under
+        chunks : async iterator of bytes
+            Chunks of the result
+
+        Yields
+        ------
+        bytes
+            The chunks of the result
+        """
+        partial_path = self._path(f"{key}.{uuid.uuid4().hex}.partial")
+        size = 0
+        complete = False
+        try:
+            with open(partial_path, "wb") as partial_file:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size <= self.max_bytes:
+                        partial_file.write(chunk)
+                    yield chunk
+            complete = size <= self.max_bytes
+            if complete:
+                os.replace(partial_path, self._path(key))
+                self.evict()
+        finally:
+            if not complete:
+                try:
+                    os.remove(partial_path)
+                except FileNotFoundError:
+                    pass
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used results until the total size of the
+        cache is within its limit.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".partial"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # Removed by another request
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -1,19 +1,29 @@
 # This Source Code Form is subject to the terms of the Mozilla Public
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
-import csv
-from itertools import chain
+import asyncio
+from typing import Callable, List, Optional, Tuple
 
+import pyarrow as pa
+import pyarrow.parquet as pq
 import rapidjson as json
 from quart import current_app, request
 
 
 async def stream_result_as_json(
-    sql_query, result_name="query_result", additional_elements=None
+    sql_query,
+    result_name="query_result",
+    additional_elements=None,
+    encode_in_db=None,
+    prefetch=10000,
+    chunk_size=65536,
 ):
     """
     Generate a JSON representation of a query result.
 
+    Rows are fetched from the database in batches, and sent in chunks
+    of many rows.
+
     Parameters
     ----------
     sql_query : str
@@ -22,15 +32,25 @@ async def stream_result_as_json(
         Name of the JSON item containing the rows of the result
     additional_elements : dict
         Additional JSON elements to include along with the query result
+    encode_in_db : bool, optional
+        Set to True to have the database encode each row as JSON, rather
+        than encoding them in FlowAPI. Defaults to the JSON_ENCODE_IN_DB
+        config option.
+    prefetch : int, default 10000
+        Number of rows to fetch from the database at a time
+    chunk_size : int, default 65536
+        Approximate number of characters of rows to send in each chunk
 
     Yields
     ------
     bytes
-        Encoded lines of JSON
+        Encoded chunks of JSON
 
     """
     logger = current_app.flowapi_logger
     db_conn_pool = current_app.db_conn_pool
+    if encode_in_db is None:
+        encode_in_db = current_app.config.get("JSON_ENCODE_IN_DB", False)
     prefix = "{"
     if additional_elements:
         for key, value in additional_elements.items():
@@ -40,77 +60,445 @@ async def stream_result_as_json(
     prepend = ""
     logger.debug("Starting generator.", request_id=request.request_id)
     async with db_conn_pool.acquire() as connection:
-        # Configure asyncpg to encode/decode JSON values
-        await connection.set_type_codec(
-            "json", encoder=json.dumps, decoder=json.loads, schema="pg_catalog"
-        )
         logger.debug("Connected.", request_id=request.request_id)
         async with connection.transaction():
             logger.debug("Got transaction.", request_id=request.request_id)
             logger.debug(f"Running {sql_query}", request_id=request.request_id)
             try:
-                async for row in connection.cursor(sql_query):
-                    yield f"{prepend}{json.dumps(dict(row.items()), number_mode=json.NM_DECIMAL, datetime_mode=json.DM_ISO8601)}".encode()
-                    prepend = ", "
+                if encode_in_db:
+                    rows = (
+                        row[0]
+                        async for row in connection.cursor(
+                            f"SELECT row_to_json(_)::text FROM ({sql_query.strip().rstrip(';')}) AS _",
+                            prefetch=prefetch,
+                        )
+                    )
+                else:
+                    rows = (
+                        json.dumps(
+                            dict(row.items()),
+                            number_mode=json.NM_DECIMAL,
+                            datetime_mode=json.DM_ISO8601,
+                        )
+                        async for row in connection.cursor(sql_query, prefetch=prefetch)
+                    )
+                chunk = []
+                chunk_length = 0
+                async for row in rows:
+                    chunk.append(row)
+                    chunk_length += len(row)
+                    if chunk_length >= chunk_size:
+                        yield f"{prepend}{', '.join(chunk)}".encode()
+                        prepend = ", "
+                        chunk = []
+                        chunk_length = 0
+                if chunk:
+                    yield f"{prepend}{', '.join(chunk)}".encode()
                 logger.debug("Finishing up.", request_id=request.request_id)
                 yield b"]}"
             except Exception as e:
                 logger.error(e)
+                raise
 
 
-class Line(object):
-    def __init__(self):
-        self._line = None
+def quote_identifier(identifier: str) -> str:
+    """
+    Quote a string for use as an SQL identifier.
+
+    Parameters
+    ----------
+    identifier : str
+        Identifier to quote
+
+    Returns
+    -------
+    str
+        Quoted identifier
+    """
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+def quote_literal(value) -> str:
+    """
+    Quote a value for use as an SQL text literal.
+
+    Parameters
+    ----------
+    value
+        Value to quote, which will be converted to a string
+
+    Returns
+    -------
+    str
+        Quoted literal
+    """
+    return "'" + str(value).replace("'", "''") + "'"
 
-    def write(self, line):
-        self._line = line
 
-    def read(self):
-        return self._line.encode()
+def with_additional_columns(sql_query: str, additional_elements: dict) -> str:
+    """
+    Wrap a query to add columns with constant values to its result.
 
+    Parameters
+    ----------
+    sql_query : str
+        SQL query to add columns to
+    additional_elements : dict
+        Mapping from column names to values
 
-async def stream_result_as_csv(sql_query, additional_elements=None, **kwargs):
+    Returns
+    -------
+    str
+        SQL query
+    """
+    sql_query = sql_query.strip().rstrip(";")
+    if not additional_elements:
+        return sql_query
+    additional_columns = ", ".join(
+        f"{quote_literal(value)} AS {quote_identifier(key)}"
+        for key, value in additional_elements.items()
+    )
+    return f"SELECT _.*, {additional_columns} FROM ({sql_query}) AS _"
+
+
+async def stream_result_as_csv(
+    sql_query, additional_elements=None, max_buffered_chunks=16, **kwargs
+):
     """
     Generate a CSV representation of a query result.
 
+    The CSV is produced by the database using `COPY ... TO STDOUT`, and
+    streamed out in the chunks it arrives in.
+
     Parameters
     ----------
     sql_query : str
         SQL query to stream output of
     additional_elements : dict
         Additional columns elements to include along with the query result
+    max_buffered_chunks : int, default 16
+        Maximum number of chunks to receive from the database ahead of
+        sending them
 
     Yields
     ------
     bytes
-        Encoded csv lines
+        Chunks of CSV
+
+    """
+    logger = current_app.flowapi_logger
+    db_conn_pool = current_app.db_conn_pool
+    logger.debug("Starting generator.", request_id=request.request_id)
+    copy_query = with_additional_columns(sql_query, additional_elements)
+    chunks = asyncio.Queue(maxsize=max_buffered_chunks)
+
+    async def copy_to_queue(connection):
+        try:
+            await connection.copy_from_query(
+                copy_query, output=chunks.put, format="csv", header=True
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            await chunks.put(exc)
+        else:
+            await chunks.put(None)
+
+    async with db_conn_pool.acquire() as connection:
+        logger.debug("Connected.", request_id=request.request_id)
+        logger.debug(f"Running {copy_query}", request_id=request.request_id)
+        copy = asyncio.ensure_future(copy_to_queue(connection))
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    break
+                elif isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+            logger.debug("Finishing up.", request_id=request.request_id)
+        except Exception as e:
+            logger.error(e)
+            raise
+        finally:
+            if not copy.done():
+                copy.cancel()
+                try:
+                    await copy
+                except asyncio.CancelledError:
+                    pass
+
+
+_ARROW_TYPES = {
+    "bool": pa.bool_(),
+    "int2": pa.int16(),
+    "int4": pa.int32(),
+    "int8": pa.int64(),
+    "float4": pa.float32(),
+    "float8": pa.float64(),
+    "numeric": pa.float64(),
+    "date": pa.date32(),
+    "timestamp": pa.timestamp("us"),
+    "timestamptz": pa.timestamp("us", tz="UTC"),
+}
+
+
+def _to_string(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+def _to_float(value):
+    return None if value is None else float(value)
+
+
+def arrow_schema(attributes) -> Tuple[pa.Schema, List[Callable]]:
+    """
+    Get the arrow schema for the result of a query, and the functions needed
+    to convert each column's values for that schema.
+
+    Columns with types which don't have an arrow equivalent are converted
+    to strings.
+
+    Parameters
+    ----------
+    attributes : tuple of asyncpg.types.Attribute
+        Attributes of the query's result
+
+    Returns
+    -------
+    pyarrow.Schema, list of callable
+        The schema, and a function (or None, if the values can be used as they
+        are) for each column
+    """
+    fields = []
+    converters = []
+    for attribute in attributes:
+        arrow_type = _ARROW_TYPES.get(attribute.type.name, pa.string())
+        fields.append(pa.field(attribute.name, arrow_type))
+        if attribute.type.name == "numeric":
+            converters.append(_to_float)
+        elif arrow_type == pa.string():
+            converters.append(_to_string)
+        else:
+            converters.append(None)
+    return pa.schema(fields), converters
+
+
+class ChunkSink:
+    """
+    Write-only file-like object, which holds the bytes written to it until
+    they are taken.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        """
+        Remove and return the bytes written since this was last called.
+
+        Returns
+        -------
+        bytes
+        """
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def stream_result_with_arrow_writer(
+    sql_query, *, open_writer: Callable, batch_size: int = 65536
+):
+    """
+    Generate a binary representation of a query result using an arrow writer.
+
+    Rows are fetched from the database and written in batches of `batch_size` rows.
+
+    Parameters
+    ----------
+    sql_query : str
+        SQL query to stream output of
+    open_writer : callable
+        Function which takes a file-like object and a pyarrow schema, and returns
+        a writer with `write_table` and `close` methods
+    batch_size : int, default 65536
+        Number of rows to fetch and write at a time
+
+    Yields
+    ------
+    bytes
+        Chunks of the encoded result
 
     """
     logger = current_app.flowapi_logger
     db_conn_pool = current_app.db_conn_pool
     logger.debug("Starting generator.", request_id=request.request_id)
-    yield_header = True
-    line = Line()
-    writer = csv.writer(line)
-    if additional_elements is None:
-        additional_elements = {}
     async with db_conn_pool.acquire() as connection:
-        # Configure asyncpg to encode/decode JSON values
-        await connection.set_type_codec(
-            "json", encoder=json.dumps, decoder=json.loads, schema="pg_catalog"
-        )
         logger.debug("Connected.", request_id=request.request_id)
         async with connection.transaction():
             logger.debug("Got transaction.", request_id=request.request_id)
             logger.debug(f"Running {sql_query}", request_id=request.request_id)
             try:
-                async for row in connection.cursor(sql_query):
-                    if yield_header:
-                        writer.writerow(chain(row.keys(), additional_elements.keys()))
-                        yield line.read()
-                        yield_header = False
-                    writer.writerow(chain(row.values(), additional_elements.values()))
-                    yield line.read()
+                statement = await connection.prepare(sql_query)
+                schema, converters = arrow_schema(statement.get_attributes())
+                sink = ChunkSink()
+                writer = open_writer(sink, schema)
+                cursor = await statement.cursor()
+                while True:
+                    rows = await cursor.fetch(batch_size)
+                    if not rows:
+                        break
+                    columns = [
+                        pa.array(
+                            column if convert is None else map(convert, column),
+                            type=field.type,
+                        )
+                        for column, convert, field in zip(
+                            zip(*rows), converters, schema
+                        )
+                    ]
+                    writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+                    chunk = sink.take()
+                    if chunk:
+                        yield chunk
+                writer.close()
                 logger.debug("Finishing up.", request_id=request.request_id)
+                yield sink.take()
             except Exception as e:
                 logger.error(e)
+                raise
+
+
+async def stream_result_as_arrow(
+    sql_query, compression="zstd", batch_size=65536, **kwargs
+):
+    """
+    Generate an Arrow IPC stream representation of a query result.
+
+    Parameters
+    ----------
+    sql_query : str
+        SQL query to stream output of
+    compression : str or None, default "zstd"
+        Compression to use for the record batches
+    batch_size : int, default 65536
+        Number of rows in each record batch
+
+    Yields
+    ------
+    bytes
+        Chunks of the Arrow IPC stream
+
+    """
+
+    def open_writer(sink, schema):
+        return pa.ipc.new_stream(
+            sink, schema, options=pa.ipc.IpcWriteOptions(compression=compression)
+        )
+
+    async for chunk in stream_result_with_arrow_writer(
+        sql_query, open_writer=open_writer, batch_size=batch_size
+    ):
+        yield chunk
+
+
+async def stream_result_as_parquet(
+    sql_query, compression="zstd", batch_size=65536, **kwargs
+):
+    """
+    Generate a Parquet representation of a query result.
+
+    Parameters
+    ----------
+    sql_query : str
+        SQL query to stream output of
+    compression : str or None, default "zstd"
+        Compression to use for the column chunks
+    batch_size : int, default 65536
+        Number of rows in each row group
+
+    Yields
+    ------
+    bytes
+        Chunks of the Parquet file
+
+    """
+
+    def open_writer(sink, schema):
+        return pq.ParquetWriter(sink, schema, compression=compression)
+
+    async for chunk in stream_result_with_arrow_writer(
+        sql_query, open_writer=open_writer, batch_size=batch_size
+    ):
+        yield chunk
+
+
+# Content encodings results can be compressed with, in order of preference
+CONTENT_ENCODINGS = ("zstd", "gzip")
+
+
+def negotiate_content_encoding(accept_encodings) -> Optional[str]:
+    """
+    Choose the content encoding to compress a response with, given the encodings
+    the client accepts.
+
+    Parameters
+    ----------
+    accept_encodings : Accept
+        Parsed Accept-Encoding header of the request
+
+    Returns
+    -------
+    str or None
+        The content encoding to use, or None to send the response uncompressed
+    """
+    return accept_encodings.best_match(CONTENT_ENCODINGS)
+
+
+async def compress_stream(chunks, encoding: str):
+    """
+    Compress a stream of bytes.
+
+    Parameters
+    ----------
+    chunks : async iterator of bytes
+        Chunks of the content to compress
+    encoding : {"zstd", "gzip"}
+        Content encoding to compress with
+
+    Yields
+    ------
+    bytes
+        Chunks of the compressed content, which are produced whenever the
+        compressor has filled its output buffer
+    """
+    sink = ChunkSink()
+    compressor = pa.CompressedOutputStream(sink, encoding)
+    async for chunk in chunks:
+        compressor.write(chunk)
+        compressed = sink.take()
+        if compressed:
+            yield compressed
+    compressor.close()
+    yield sink.take()
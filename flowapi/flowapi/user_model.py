@@ -1,18 +1,84 @@
 # This Source Code Form is subject to the terms of the Mozilla Public
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
-from itertools import permutations
-from typing import List
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Hashable, List, Optional
 
-from quart_jwt_extended import get_jwt_claims, get_jwt_identity
+from quart_jwt_extended import get_jwt_claims, get_jwt_identity, get_raw_jwt
 from quart_jwt_extended.exceptions import UserClaimsVerificationError
 
 from flowapi.flowapi_errors import BadQueryError, MissingQueryKindError
-from flowapi.permissions import expand_scopes, query_to_scope_list
+from flowapi.permissions import CompiledScopes, compile_scopes, query_to_scopes
 from flowapi.utils import get_query_parameters_from_flowmachine
 from quart import current_app, request
 
 
+class TokenScopesCache:
+    """
+    Bounded cache of the compiled scopes for each token, so that a token's
+    claims only need to be expanded the first time it is used.
+
+    Entries are keyed by the token's unique identifier (or its claims, if it
+    has no identifier), and are dropped once the token expires. When the
+    cache is full, the least recently used entry is evicted.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of tokens to hold compiled scopes for
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._lock = Lock()
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_scopes(
+        self, *, key: Hashable, claims: List[str], expires: Optional[float] = None
+    ) -> CompiledScopes:
+        """
+        Get the compiled scopes for a token, compiling them from the claims
+        if they are not already cached.
+
+        Parameters
+        ----------
+        key : Hashable
+            Unique identifier of the token
+        claims : list of str
+            Compressed scopes granted by the token
+        expires : float, optional
+            Unix time at which the token expires
+
+        Returns
+        -------
+        CompiledScopes
+            The set of full scopes granted by the token
+        """
+        now = time.time()
+        with self._lock:
+            try:
+                entry_expires, scopes = self._entries[key]
+            except KeyError:
+                pass
+            else:
+                if entry_expires is None or entry_expires > now:
+                    self._entries.move_to_end(key)
+                    return scopes
+                del self._entries[key]
+        scopes = compile_scopes(scopes=claims)
+        with self._lock:
+            self._entries[key] = (expires, scopes)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return scopes
+
+
 class UserObject:
     """
     Class to represent a user's permissions as loaded from a JWT.
@@ -23,25 +89,25 @@ class UserObject:
     ----------
     username : str
         Name of the user
-    claims : dict
-        Dictionary giving a whitelist of the user's claims
+    scopes : CompiledScopes
+        The full scopes granted to the user, as returned by `compile_scopes`
     """
 
-    def __init__(self, username: str, scopes: List[str]) -> None:
+    def __init__(self, username: str, scopes: CompiledScopes) -> None:
         self.username = username
         self.scopes = scopes
 
     def has_access(self, *, actions: List[str], query_json: dict) -> bool:
 
         try:
-            scopes = set(query_to_scope_list(query_json))
+            scopes = query_to_scopes(query_json)
         except Exception as exc:
             raise BadQueryError
         if "query_kind" not in query_json:
             raise MissingQueryKindError
 
         for action in actions:
-            if {*scopes, action} in self.scopes:
+            if scopes | {action} in self.scopes:
                 return True
         raise UserClaimsVerificationError
 
@@ -211,6 +277,7 @@ def user_loader_callback(identity):
     )
 
     claims = get_jwt_claims()
+    raw_jwt = get_raw_jwt()
 
     log_dict = dict(
         request_id=request.request_id,
@@ -221,4 +288,7 @@ def user_loader_callback(identity):
     )
     current_app.access_logger.info("Loaded user", **log_dict)
 
-    return UserObject(username=identity, scopes=list(expand_scopes(scopes=claims)))
+    scopes = current_app.token_scopes_cache.get_scopes(
+        key=raw_jwt.get("jti", tuple(claims)), claims=claims, expires=raw_jwt.get("exp")
+    )
+    return UserObject(username=identity, scopes=scopes)
@@ -2,7 +2,9 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+from typing import Optional
 
+import rapidjson
 from quart import request
 from quart.exceptions import HTTPException
 
@@ -42,3 +44,47 @@ async def get_query_parameters_from_flowmachine(*, query_id) -> dict:
             status_code=404,
         )
     return reply["payload"]["query_params"]
+
+
+def get_result_selection(args) -> Optional[dict]:
+    """
+    Get the part of a query result requested in a query string.
+
+    `columns` and `order_by` are comma separated lists of column names,
+    `filters` is a JSON object mapping column names to values, `after` is a
+    JSON array of values of the `order_by` columns, and `limit` and `offset`
+    are integers.
+
+    Parameters
+    ----------
+    args : MultiDict
+        Arguments from the query string
+
+    Returns
+    -------
+    dict or None
+        The selection to pass to FlowMachine, or None if the whole result
+        was requested
+
+    Raises
+    ------
+    ValueError
+        If any of the arguments are malformed
+    """
+    selection = {}
+    for name in ("columns", "order_by"):
+        if name in args:
+            selection[name] = args[name].split(",")
+    for name in ("filters", "after"):
+        if name in args:
+            try:
+                selection[name] = rapidjson.loads(args[name])
+            except ValueError:
+                raise ValueError(f"'{name}' must be valid JSON.")
+    for name in ("limit", "offset"):
+        if name in args:
+            try:
+                selection[name] = int(args[name])
+            except ValueError:
+                raise ValueError(f"'{name}' must be an integer.")
+    return selection if len(selection) > 0 else None
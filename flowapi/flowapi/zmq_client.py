@@ -0,0 +1,283 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Long-lived client for talking to the FlowMachine server over ZeroMQ.
+
+A single DEALER socket is shared by every request the app handles. Each
+message is sent with a unique request id as its routing envelope, which
+FlowMachine's ROUTER socket echoes back with the reply, so many requests
+can be in flight at once and replies can arrive in any order.
+"""
+import asyncio
+import time
+import uuid
+from typing import Dict, Optional
+
+import rapidjson
+import zmq
+from quart.exceptions import HTTPException
+from zmq.asyncio import Context
+
+
+class FlowmachineClient:
+    """
+    Client which multiplexes requests to the FlowMachine server over a single
+    DEALER socket.
+
+    If FlowMachine doesn't reply to a request within `timeout` seconds only
+    that request fails. FlowMachine is then checked for liveness: if it hasn't
+    replied to anything in the last `timeout` seconds and doesn't answer a
+    ping within `timeout` seconds either, it is assumed to have gone away, and
+    the socket is replaced so that any messages queued for it are discarded.
+
+    Parameters
+    ----------
+    address : str
+        zmq address of the FlowMachine server, e.g. "tcp://localhost:5555"
+    timeout : float
+        Number of seconds to wait for a reply
+    logger : structlog.BoundLogger
+        Logger to use
+    """
+
+    def __init__(self, *, address: str, timeout: float, logger):
+        self.address = address
+        self.timeout = timeout
+        self.logger = logger
+        self._socket = None
+        self._receiver = None
+        self._pending: Dict[bytes, asyncio.Future] = {}
+        self._last_reply = time.monotonic()
+        self._liveness_check: Optional[asyncio.Future] = None
+
+    def connect(self) -> None:
+        """
+        Open the DEALER socket, and start listening for replies.
+        """
+        self.logger.debug("Connecting to FlowMachine server…", address=self.address)
+        socket = Context.instance().socket(zmq.DEALER)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.connect(self.address)
+        self._socket = socket
+        self._last_reply = time.monotonic()
+        self._receiver = asyncio.ensure_future(self._receive_replies(socket))
+        self.logger.debug("Connected.")
+
+    def close(self) -> None:
+        """
+        Close the socket, and fail any requests still waiting for a reply.
+        """
+        self.logger.debug("Closing connection to FlowMachine server…")
+        if self._liveness_check is not None:
+            if self._liveness_check is not asyncio.current_task():
+                self._liveness_check.cancel()
+            self._liveness_check = None
+        if self._receiver is not None:
+            self._receiver.cancel()
+            self._receiver = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        for reply in self._pending.values():
+            if not reply.done():
+                reply.set_exception(
+                    ConnectionResetError("Connection to FlowMachine was reset.")
+                )
+        self._pending.clear()
+        self.logger.debug("Closed socket.")
+
+    def reconnect(self) -> None:
+        """
+        Replace the socket with a new one.
+        """
+        self.close()
+        self.connect()
+
+    async def _receive_replies(self, socket: "zmq.asyncio.Socket") -> None:
+        """
+        Receive replies from the socket for as long as it is open, and pass each
+        one to the request waiting for it.
+        """
+        while True:
+            try:
+                multipart_msg = await socket.recv_multipart()
+            except (asyncio.CancelledError, zmq.ZMQError):
+                return
+            if len(multipart_msg) != 3 or multipart_msg[1] != b"":
+                self.logger.error(
+                    "Reply from FlowMachine did not have the expected structure. Ignoring it.",
+                    reply=multipart_msg,
+                )
+                continue
+            request_id, _, reply = multipart_msg
+            self._last_reply = time.monotonic()
+            waiting = self._pending.pop(request_id, None)
+            if waiting is None or waiting.done():
+                self.logger.debug(
+                    "Discarding reply to a request which is no longer waiting.",
+                    request_id=request_id,
+                )
+                continue
+            try:
+                waiting.set_result(rapidjson.loads(reply))
+            except ValueError as exc:
+                waiting.set_exception(exc)
+
+    async def request(self, msg: dict) -> dict:
+        """
+        Send a message to FlowMachine and wait for the reply.
+
+        Parameters
+        ----------
+        msg : dict
+            The message to send
+
+        Returns
+        -------
+        dict
+            FlowMachine's reply
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            If FlowMachine doesn't reply within the timeout
+        ConnectionResetError
+            If the socket is replaced before FlowMachine replies
+
+        Notes
+        -----
+        A timeout fails only this request. The socket is replaced only if a
+        liveness check, run in the background, finds FlowMachine unresponsive.
+        """
+        if self._socket is None:
+            self.connect()
+        socket = self._socket
+        try:
+            return await self._send_and_wait(socket, msg)
+        except asyncio.TimeoutError:
+            self.logger.error(
+                "Timed out waiting for FlowMachine to reply.",
+                timeout=self.timeout,
+                msg=msg,
+            )
+            self._start_liveness_check(socket)
+            raise
+
+    async def _send_and_wait(self, socket: "zmq.asyncio.Socket", msg: dict) -> dict:
+        """
+        Send a message on the socket, and wait up to `timeout` seconds for the reply.
+        """
+        request_id = uuid.uuid4().hex.encode()
+        reply = asyncio.get_event_loop().create_future()
+        self._pending[request_id] = reply
+        try:
+            await socket.send_multipart(
+                [request_id, b"", rapidjson.dumps(msg).encode()]
+            )
+            return await asyncio.wait_for(reply, timeout=self.timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    def _start_liveness_check(self, socket: "zmq.asyncio.Socket") -> None:
+        """
+        Check whether FlowMachine is still alive in the background, unless a
+        check is already running or the socket has already been replaced.
+        """
+        if self._socket is not socket:
+            return
+        if self._liveness_check is not None and not self._liveness_check.done():
+            return
+        self._liveness_check = asyncio.ensure_future(self._check_liveness(socket))
+
+    async def _check_liveness(self, socket: "zmq.asyncio.Socket") -> None:
+        """
+        Replace the socket if FlowMachine hasn't replied to anything within
+        `timeout` seconds, and doesn't reply to a ping within `timeout` seconds.
+        """
+        if time.monotonic() - self._last_reply < self.timeout:
+            return
+        try:
+            await self._send_and_wait(
+                socket, {"request_id": uuid.uuid4().hex, "action": "ping"}
+            )
+        except (asyncio.TimeoutError, ConnectionResetError, zmq.ZMQError):
+            if self._socket is socket:  # Socket may have been closed meanwhile
+                self.logger.error(
+                    "FlowMachine did not respond to a ping. Reconnecting.",
+                    timeout=self.timeout,
+                )
+                self.reconnect()
+
+    def channel(self) -> "FlowmachineChannel":
+        """
+        Get a new channel for one HTTP request to talk to FlowMachine through.
+
+        Returns
+        -------
+        FlowmachineChannel
+        """
+        return FlowmachineChannel(self)
+
+
+class FlowmachineChannel:
+    """
+    Per-request handle to a `FlowmachineClient`, with the send-then-receive
+    interface of a REQ socket.
+
+    Parameters
+    ----------
+    client : FlowmachineClient
+        Client to send messages with
+    """
+
+    def __init__(self, client: FlowmachineClient):
+        self.client = client
+        self._reply: Optional[asyncio.Future] = None
+
+    def send_json(self, msg: dict) -> None:
+        """
+        Send a message to FlowMachine. The reply can be retrieved with `recv_json`.
+
+        Parameters
+        ----------
+        msg : dict
+            The message to send
+        """
+        self._reply = asyncio.ensure_future(self.client.request(msg))
+
+    async def recv_json(self) -> dict:
+        """
+        Wait for the reply to the last message sent.
+
+        Returns
+        -------
+        dict
+            FlowMachine's reply
+
+        Raises
+        ------
+        HTTPException
+            503 if FlowMachine doesn't reply within the client's timeout, or the
+            connection is reset while waiting
+        """
+        if self._reply is None:
+            raise RuntimeError("No message has been sent to FlowMachine.")
+        reply, self._reply = self._reply, None
+        try:
+            return await reply
+        except (asyncio.TimeoutError, ConnectionResetError):
+            raise HTTPException(
+                description="FlowMachine server did not respond in time.",
+                name="FlowMachine unavailable",
+                status_code=503,
+            )
+
+    def close(self) -> None:
+        """
+        Stop waiting for any outstanding reply.
+        """
+        if self._reply is not None and not self._reply.done():
+            self._reply.cancel()
+        self._reply = None
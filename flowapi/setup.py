@@ -37,6 +37,7 @@ setup(
         "apispec[yaml]",
         "get-secret-or-env-var",
         "prance[osv]",
+        "pyarrow",
     ],
     extras_require={"test": ["pytest", "coverage"]},
 )
@@ -6,12 +6,11 @@ from json import JSONDecodeError
 
 import asyncpg
 import pytest
-import zmq
 from _pytest.capture import CaptureResult
 
 from flowapi.main import create_app
+from flowapi.zmq_client import FlowmachineClient
 from asynctest import MagicMock, Mock, CoroutineMock
-from zmq.asyncio import Context
 from collections import namedtuple
 
 TestApp = namedtuple("TestApp", ["client", "db_pool", "tmpdir", "app", "log_capture"])
@@ -38,9 +37,9 @@ def json_log(caplog):
 @pytest.fixture
 def dummy_zmq_server(monkeypatch):
     """
-    A fixture which provides a dummy zero mq
-    socket which records the json it is asked
-    to send.
+    A fixture which replaces requests to FlowMachine
+    with a mock which can be given replies to
+    return.
 
     Parameters
     ----------
@@ -49,14 +48,13 @@ def dummy_zmq_server(monkeypatch):
     Yields
     ------
     asynctest.CoroutineMock
-        Coroutine mocking for the recv_json method of the socket
+        Coroutine mocking the request method of the FlowMachine client
 
     """
-    dummy = Mock()
-    dummy.return_value.socket.return_value.recv_json = CoroutineMock()
+    dummy = CoroutineMock()
 
-    monkeypatch.setattr(zmq.asyncio.Context, "instance", dummy)
-    yield dummy.return_value.socket.return_value.recv_json
+    monkeypatch.setattr(FlowmachineClient, "request", dummy)
+    yield dummy
 
 
 @pytest.fixture
@@ -71,11 +69,6 @@ def dummy_db_pool(monkeypatch):
     """
     dummy = MagicMock()
 
-    # A MagicMock can't be used in an 'await' expression,
-    # so we need to make connection.set_type_codec a CoroutineMock
-    # (awaited in stream_result_as_json())
-    dummy.acquire.return_value.__aenter__.return_value.set_type_codec = CoroutineMock()
-
     async def f(*args, **kwargs):
         return dummy
 
@@ -93,6 +86,7 @@ async def app(monkeypatch, tmpdir, dummy_db_pool, json_log):
     monkeypatch.setenv("FLOWDB_HOST", "localhost")
     monkeypatch.setenv("FLOWDB_PORT", "5432")
     monkeypatch.setenv("FLOWAPI_FLOWDB_PASSWORD", "foo")
+    monkeypatch.setenv("FLOWAPI_PRELOAD_SPEC", "false")
     current_app = create_app()
     await current_app.startup()
     async with current_app.app_context():
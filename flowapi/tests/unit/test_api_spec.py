@@ -0,0 +1,78 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import pytest
+
+dummy_query_schemas = {
+    "FlowmachineQuerySchema": {
+        "oneOf": [{"$ref": "#/components/schemas/DummyQuery"}],
+        "discriminator": {"propertyName": "query_kind"},
+    },
+    "DummyQuery": {
+        "type": "object",
+        "properties": {"query_kind": {"type": "string", "enum": ["dummy_query"]}},
+        "required": [],
+    },
+}
+
+
+@pytest.mark.asyncio
+async def test_spec_only_rebuilt_when_schemas_change(app, dummy_zmq_server):
+    """
+    Test that the spec is only rebuilt when FlowMachine's query schemas change.
+    """
+    dummy_zmq_server.side_effect = (
+        {
+            "status": "success",
+            "msg": "",
+            "payload": {
+                "query_schemas": dummy_query_schemas,
+                "query_schemas_hash": "DUMMY_HASH",
+            },
+        },
+        {
+            "status": "success",
+            "msg": "",
+            "payload": {"query_schemas_hash": "DUMMY_HASH"},
+        },
+    )
+    first = await app.client.get("/api/0/spec/openapi.json")
+    spec = app.app.api_spec_cache.spec
+    second = await app.client.get("/api/0/spec/openapi.json")
+    assert app.app.api_spec_cache.spec is spec
+    assert await first.get_json() == await second.get_json()
+    assert "dummy_query" in str(
+        (await first.get_json())["components"]["securitySchemes"]["token"][
+            "x-security-scopes"
+        ]
+    )
+    assert dummy_zmq_server.call_args[0][-1]["params"] == {"schemas_hash": "DUMMY_HASH"}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("route", ["openapi.json", "openapi.yaml"])
+async def test_spec_conditional_get(route, app, dummy_zmq_server):
+    """
+    Test that the spec is not resent if the client already has the current version.
+    """
+    dummy_zmq_server.return_value = {
+        "status": "success",
+        "msg": "",
+        "payload": {
+            "query_schemas": dummy_query_schemas,
+            "query_schemas_hash": "DUMMY_HASH",
+        },
+    }
+    response = await app.client.get(f"/api/0/spec/{route}")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    response = await app.client.get(
+        f"/api/0/spec/{route}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    response = await app.client.get(
+        f"/api/0/spec/{route}", headers={"If-None-Match": '"NOT_THE_ETAG"'}
+    )
+    assert response.status_code == 200
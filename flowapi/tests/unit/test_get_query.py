@@ -2,8 +2,10 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import gzip
 from json import loads
 
+from flowapi.result_cache import ResultCache
 from tests.unit.zmq_helpers import ZMQReply
 
 import pytest
@@ -28,7 +30,7 @@ from asynctest import CoroutineMock
             b'{"type":"FeatureCollection", "features":[{"key":"value1"}, {"key":"value2"}]}',
             "geojson",
         ),
-        (".csv", b"key\r\nvalue1\r\nvalue2\r\n", "csv",),
+        (".csv", b"key\nvalue1\nvalue2\n", "csv",),
     ],
 )
 @pytest.mark.asyncio
@@ -47,6 +49,15 @@ async def test_get_query(
         {"key": "value1"},
         {"key": "value2"},
     ]
+
+    # CSV is copied out of the db in chunks
+    async def copy_from_query(query, *, output, **kwargs):
+        await output(b"key\nvalue1\n")
+        await output(b"value2\n")
+
+    app.db_pool.acquire.return_value.__aenter__.return_value.copy_from_query = (
+        copy_from_query
+    )
     token = access_token_builder(
         [
             "get_result&modal_location.aggregation_unit.DUMMY_AGGREGATION",
@@ -173,3 +184,141 @@ async def test_get_error_message_without_query_state(
     json = await response.get_json()
     assert 500 == response.status_code
     assert "DUMMY_ERROR_MESSAGE" == json["msg"]
+
+
+@pytest.fixture
+def completed_query_reply(app, access_token_builder, dummy_zmq_server, monkeypatch):
+    """
+    Fixture which sets up a completed query with a cached result, whose rows
+    are returned from the db, and yields the headers needed to get it.
+    """
+    monkeypatch.setattr(
+        "flowapi.user_model.UserObject.can_get_results_by_query_id",
+        CoroutineMock(return_value=True),
+    )
+    dummy_zmq_server.return_value = ZMQReply(
+        status="success",
+        payload={
+            "query_id": "DUMMY_QUERY_ID",
+            "query_state": "completed",
+            "sql": "SELECT 1;",
+            "created": "2020-01-01T00:00:00+00:00",
+        },
+    )
+    app.db_pool.acquire.return_value.__aenter__.return_value.cursor.return_value.__aiter__.return_value = [
+        {"key": "value1"},
+        {"key": "value2"},
+    ]
+    yield {"Authorization": f"Bearer {access_token_builder({})}"}
+
+
+@pytest.mark.asyncio
+async def test_get_query_not_modified(app, completed_query_reply):
+    """
+    Test that a result the client already has isn't sent again.
+    """
+    response = await app.client.get(
+        "/api/0/get/DUMMY_QUERY_ID", headers=completed_query_reply
+    )
+    await response.get_data()
+    etag = response.headers["ETag"]
+    response = await app.client.get(
+        "/api/0/get/DUMMY_QUERY_ID",
+        headers={"If-None-Match": etag, **completed_query_reply},
+    )
+    assert 304 == response.status_code
+    assert b"" == await response.get_data()
+    assert 1 == app.db_pool.acquire.call_count
+
+
+@pytest.mark.asyncio
+async def test_get_query_etag_differs_by_encoding(app, completed_query_reply):
+    """
+    Test that compressed and uncompressed results have different ETags.
+    """
+    plain = await app.client.get(
+        "/api/0/get/DUMMY_QUERY_ID", headers=completed_query_reply
+    )
+    compressed = await app.client.get(
+        "/api/0/get/DUMMY_QUERY_ID",
+        headers={"Accept-Encoding": "gzip", **completed_query_reply},
+    )
+    assert plain.headers["ETag"] != compressed.headers["ETag"]
+
+
+@pytest.mark.asyncio
+async def test_get_query_compressed(app, completed_query_reply):
+    """
+    Test that results are compressed if the client accepts a compressed encoding.
+    """
+    response = await app.client.get(
+        "/api/0/get/DUMMY_QUERY_ID",
+        headers={"Accept-Encoding": "gzip, deflate", **completed_query_reply},
+    )
+    assert "gzip" == response.headers["Content-Encoding"]
+    assert "Accept-Encoding" == response.headers["Vary"]
+    assert (
+        b'{"query_id":"DUMMY_QUERY_ID", "query_result":[{"key":"value1"}, {"key":"value2"}]}'
+        == gzip.decompress(await response.get_data())
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_query_from_result_cache(app, completed_query_reply):
+    """
+    Test that a result is sent from the result cache the second time it is requested.
+    """
+    app.app.result_cache = ResultCache(
+        directory=str(app.tmpdir / "results"), max_bytes=1024
+    )
+    first = await app.client.get(
+        "/api/0/get/DUMMY_QUERY_ID", headers=completed_query_reply
+    )
+    first_data = await first.get_data()
+    second = await app.client.get(
+        "/api/0/get/DUMMY_QUERY_ID", headers=completed_query_reply
+    )
+    assert first_data == await second.get_data()
+    assert 1 == app.db_pool.acquire.call_count
+
+
+@pytest.mark.asyncio
+async def test_get_query_selection_sent_to_flowmachine(
+    app, completed_query_reply, dummy_zmq_server
+):
+    """
+    Test that the part of the result requested is passed on to FlowMachine.
+    """
+    response = await app.client.get(
+        '/api/0/get/DUMMY_QUERY_ID?columns=pcod,value&filters={"pcod":"X"}&order_by=pcod&after=["W"]&limit=10&offset=0',
+        headers=completed_query_reply,
+    )
+    assert 200 == response.status_code
+    assert dummy_zmq_server.call_args[0][0]["params"] == {
+        "query_id": "DUMMY_QUERY_ID",
+        "selection": {
+            "columns": ["pcod", "value"],
+            "filters": {"pcod": "X"},
+            "order_by": ["pcod"],
+            "after": ["W"],
+            "limit": 10,
+            "offset": 0,
+        },
+    }
+
+
+@pytest.mark.parametrize(
+    "route",
+    [
+        "/api/0/get/DUMMY_QUERY_ID?limit=ten",
+        "/api/0/get/DUMMY_QUERY_ID?filters=NOT_JSON",
+        "/api/0/get/DUMMY_QUERY_ID.geojson?columns=pcod",
+    ],
+)
+@pytest.mark.asyncio
+async def test_get_query_invalid_selection(route, app, completed_query_reply):
+    """
+    Test that a malformed selection of part of a result is rejected.
+    """
+    response = await app.client.get(route, headers=completed_query_reply)
+    assert 400 == response.status_code
@@ -2,7 +2,9 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 from flowapi.permissions import (
+    compile_scopes,
     per_query_scopes,
+    query_to_scopes,
     tree_walk_to_scope_list,
     valid_tree_walks,
 )
@@ -151,3 +153,93 @@ def test_per_query_scopes(tree, expected):
 )
 def test_tree_walk_to_scope_list(walk, expected):
     assert list(tree_walk_to_scope_list(walk)) == expected
+
+
+def test_compile_scopes():
+    """
+    Test that compact scopes are compiled to a set of full scopes.
+    """
+    assert compile_scopes(
+        scopes=["get_result,run&dummy.aggregation_unit.A,dummy.aggregation_unit.B"]
+    ).exact == {
+        frozenset({"get_result", "dummy.aggregation_unit.A"}),
+        frozenset({"get_result", "dummy.aggregation_unit.B"}),
+        frozenset({"run", "dummy.aggregation_unit.A"}),
+        frozenset({"run", "dummy.aggregation_unit.B"}),
+    }
+
+
+@pytest.mark.parametrize(
+    "scope, expected",
+    [
+        ({"run", "dummy.aggregation_unit.A"}, True),
+        ({"run", "dummy.aggregation_unit.B"}, True),
+        ({"get_result", "dummy.aggregation_unit.A"}, False),
+        ({"run", "dummy.other_arg.A"}, False),
+        ({"run", "dummy.aggregation_unit.A.B"}, False),
+        (
+            {
+                "run",
+                "flows.from_location.dummy.aggregation_unit.A",
+                "flows.to_location.dummy.aggregation_unit.B",
+            },
+            True,
+        ),
+        (
+            {
+                "run",
+                "flows.from_location.dummy.aggregation_unit.A",
+                "flows.to_location.other.aggregation_unit.B",
+            },
+            False,
+        ),
+        ({"get_result", "available_dates"}, True),
+        ({"run", "other.aggregation_unit.A"}, False),
+        ({"run", "*.aggregation_unit.A"}, True),
+    ],
+)
+def test_compiled_scopes_match_wildcards(scope, expected):
+    """
+    Test that a wildcard matches any value of the final segment of a scope part, and only that segment.
+    """
+    compiled = compile_scopes(
+        scopes=[
+            "run&dummy.aggregation_unit.*",
+            "run&*.aggregation_unit.A",
+            "run&flows.from_location.dummy.aggregation_unit.*&flows.to_location.dummy.aggregation_unit.*",
+            "get_result&available_dates",
+        ]
+    )
+    assert (frozenset(scope) in compiled) is expected
+
+
+def test_compile_grouped_scopes():
+    """
+    Test that values listed in braces are expanded to a scope for each value.
+    """
+    assert compile_scopes(
+        scopes=[
+            "get_result,run&dummy.aggregation_unit.{A,B},other.aggregation_unit.C&flows.to_location.{D,E}"
+        ]
+    ).exact == {
+        frozenset({action, first, second})
+        for action in ("get_result", "run")
+        for first in (
+            "dummy.aggregation_unit.A",
+            "dummy.aggregation_unit.B",
+            "other.aggregation_unit.C",
+        )
+        for second in ("flows.to_location.D", "flows.to_location.E")
+    }
+
+
+def test_query_to_scopes_ignores_key_order():
+    """
+    Test that query specs which differ only in key order give the same scopes.
+    """
+    assert query_to_scopes(
+        {"query_kind": "dummy", "aggregation_unit": "A"}
+    ) == query_to_scopes({"aggregation_unit": "A", "query_kind": "dummy"})
+    assert query_to_scopes({"query_kind": "dummy", "aggregation_unit": "A"}) == {
+        "dummy.aggregation_unit.A"
+    }
@@ -109,3 +109,73 @@ async def test_poll_query_query_error(app, access_token_builder, dummy_zmq_serve
         f"/api/0/poll/DUMMY_QUERY_ID", headers={"Authorization": f"Bearer {token}"}
     )
     assert response.status_code == 404
+
+
+@pytest.mark.parametrize("wait, expected_wait", [("5", 5.0), ("1000", 30.0)])
+@pytest.mark.asyncio
+async def test_poll_query_wait_sent_to_flowmachine(
+    wait, expected_wait, app, access_token_builder, dummy_zmq_server
+):
+    """
+    Test that the time to wait for a status change is passed on to FlowMachine, capped at the maximum.
+    """
+    token = access_token_builder(
+        ["run&modal_location.aggregation_unit.DUMMY_AGGREGATION"]
+    )
+    dummy_zmq_server.side_effect = return_once(
+        ZMQReply(
+            status="success",
+            payload={
+                "query_id": "DUMMY_QUERY_ID",
+                "query_params": {
+                    "query_kind": "modal_location",
+                    "aggregation_unit": "DUMMY_AGGREGATION",
+                },
+            },
+        ),
+        then=ZMQReply(
+            status="success",
+            payload={
+                "query_id": "DUMMY_QUERY_ID",
+                "query_state": "executing",
+                "progress": {"eligible": 0, "queued": 0, "executing": 0},
+            },
+        ),
+    )
+    response = await app.client.get(
+        f"/api/0/poll/DUMMY_QUERY_ID?wait={wait}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 202
+    assert dummy_zmq_server.call_args[0][0]["params"] == {
+        "query_id": "DUMMY_QUERY_ID",
+        "wait": expected_wait,
+    }
+
+
+@pytest.mark.parametrize("wait", ["-1", "soon", "nan"])
+@pytest.mark.asyncio
+async def test_poll_query_invalid_wait(
+    wait, app, access_token_builder, dummy_zmq_server
+):
+    """
+    Test that an invalid time to wait for a status change is rejected.
+    """
+    token = access_token_builder(
+        ["run&modal_location.aggregation_unit.DUMMY_AGGREGATION"]
+    )
+    dummy_zmq_server.return_value = ZMQReply(
+        status="success",
+        payload={
+            "query_id": "DUMMY_QUERY_ID",
+            "query_params": {
+                "query_kind": "modal_location",
+                "aggregation_unit": "DUMMY_AGGREGATION",
+            },
+        },
+    )
+    response = await app.client.get(
+        f"/api/0/poll/DUMMY_QUERY_ID?wait={wait}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 400
@@ -0,0 +1,123 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+
+import asyncpg
+import pytest
+
+from flowapi.result_cache import ResultCache
+from flowapi.stream_results import stream_result_as_csv, stream_result_as_json
+
+
+async def chunks_of(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+@pytest.mark.asyncio
+async def test_result_stored_once_streamed(tmpdir):
+    """
+    Test that a result is passed through unchanged, and can be read back once streamed.
+    """
+    cache = ResultCache(directory=str(tmpdir), max_bytes=100, chunk_size=4)
+    assert cache.get("DUMMY_KEY") is None
+    assert [b"abc", b"def"] == await collect(
+        cache.tee("DUMMY_KEY", chunks_of(b"abc", b"def"))
+    )
+    assert [b"abcd", b"ef"] == await collect(cache.get("DUMMY_KEY"))
+
+
+@pytest.mark.asyncio
+async def test_abandoned_result_not_stored(tmpdir):
+    """
+    Test that nothing is stored if a result is only partly streamed.
+    """
+    cache = ResultCache(directory=str(tmpdir), max_bytes=100)
+    results = cache.tee("DUMMY_KEY", chunks_of(b"abc", b"def"))
+    await results.__anext__()
+    await results.aclose()
+    assert cache.get("DUMMY_KEY") is None
+    assert [] == os.listdir(str(tmpdir))
+
+
+@pytest.mark.asyncio
+async def test_failed_result_not_stored(tmpdir):
+    """
+    Test that nothing is stored if streaming a result fails.
+    """
+
+    async def failing():
+        yield b"abc"
+        raise ValueError("DUMMY_ERROR")
+
+    cache = ResultCache(directory=str(tmpdir), max_bytes=100)
+    with pytest.raises(ValueError):
+        await collect(cache.tee("DUMMY_KEY", failing()))
+    assert [] == os.listdir(str(tmpdir))
+
+
+@pytest.mark.asyncio
+async def test_result_larger_than_cache_not_stored(tmpdir):
+    """
+    Test that a result larger than the whole cache is streamed but not stored.
+    """
+    cache = ResultCache(directory=str(tmpdir), max_bytes=4)
+    assert [b"abc", b"def"] == await collect(
+        cache.tee("DUMMY_KEY", chunks_of(b"abc", b"def"))
+    )
+    assert cache.get("DUMMY_KEY") is None
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_evicted(tmpdir):
+    """
+    Test that the least recently used results are removed to make room.
+    """
+    cache = ResultCache(directory=str(tmpdir), max_bytes=6)
+    await collect(cache.tee("FIRST", chunks_of(b"abc")))
+    await collect(cache.tee("SECOND", chunks_of(b"def")))
+    # Make FIRST the most recently used
+    os.utime(os.path.join(str(tmpdir), "SECOND"), (0, 0))
+    await collect(cache.get("FIRST"))
+    await collect(cache.tee("THIRD", chunks_of(b"ghi")))
+    assert sorted(os.listdir(str(tmpdir))) == ["FIRST", "THIRD"]
+
+
+@pytest.mark.parametrize("format", ["json", "csv"])
+@pytest.mark.asyncio
+async def test_result_not_stored_when_database_fails(format, app):
+    """
+    Test that a result isn't stored if the database fails part way through streaming it.
+    """
+    connection = app.db_pool.acquire.return_value.__aenter__.return_value
+
+    async def failing_cursor(*args, **kwargs):
+        yield {"key": "value1"}
+        raise asyncpg.PostgresError("DUMMY_ERROR")
+
+    async def failing_copy(query, *, output, **kwargs):
+        await output(b"key\nvalue1\n")
+        raise asyncpg.PostgresError("DUMMY_ERROR")
+
+    connection.cursor = failing_cursor
+    connection.copy_from_query = failing_copy
+    streamer = dict(json=stream_result_as_json, csv=stream_result_as_csv)[format]
+    cache = ResultCache(directory=str(app.tmpdir.mkdir("results")), max_bytes=1000)
+    async with app.app.test_request_context("/", method="GET"):
+        from quart import request
+
+        request.request_id = "DUMMY_REQUEST_ID"
+        with pytest.raises(asyncpg.PostgresError):
+            await collect(
+                cache.tee(
+                    "DUMMY_KEY", streamer("SELECT key FROM foo", encode_in_db=False)
+                )
+            )
+    assert cache.get("DUMMY_KEY") is None
+    assert [] == os.listdir(cache.directory)
@@ -0,0 +1,301 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import gzip
+from collections import namedtuple
+from decimal import Decimal
+
+import asyncpg
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from werkzeug.datastructures import Accept
+
+from flowapi.stream_results import (
+    arrow_schema,
+    compress_stream,
+    negotiate_content_encoding,
+    stream_result_as_arrow,
+    stream_result_as_csv,
+    stream_result_as_json,
+    stream_result_as_parquet,
+    with_additional_columns,
+)
+
+Attribute = namedtuple("Attribute", ["name", "type"])
+Type = namedtuple("Type", ["name"])
+
+
+@pytest.mark.parametrize(
+    "additional_elements, expected",
+    [
+        (None, "SELECT 1"),
+        ({}, "SELECT 1"),
+        (
+            {"query_id": "DUMMY_ID"},
+            """SELECT _.*, 'DUMMY_ID' AS "query_id" FROM (SELECT 1) AS _""",
+        ),
+        (
+            {'a "column"': "it's"},
+            'SELECT _.*, \'it\'\'s\' AS "a ""column""" FROM (SELECT 1) AS _',
+        ),
+    ],
+)
+def test_with_additional_columns(additional_elements, expected):
+    """
+    Test that constant columns are added to a query, with names and values quoted.
+    """
+    assert with_additional_columns("SELECT 1; ", additional_elements) == expected
+
+
+@pytest.mark.asyncio
+async def test_stream_result_as_csv_streams_copied_chunks(app):
+    """
+    Test that the chunks copied out of the database are streamed as they arrive.
+    """
+    copied = {}
+
+    async def copy_from_query(query, *, output, **kwargs):
+        copied.update(query=query, **kwargs)
+        await output(b"key,query_id\n")
+        await output(b"value1,DUMMY_ID\nvalue2,DUMMY_ID\n")
+
+    app.db_pool.acquire.return_value.__aenter__.return_value.copy_from_query = (
+        copy_from_query
+    )
+    async with app.app.test_request_context("/", method="GET"):
+        from quart import request
+
+        request.request_id = "DUMMY_REQUEST_ID"
+        chunks = [
+            chunk
+            async for chunk in stream_result_as_csv(
+                "SELECT key FROM foo", additional_elements={"query_id": "DUMMY_ID"}
+            )
+        ]
+    assert chunks == [b"key,query_id\n", b"value1,DUMMY_ID\nvalue2,DUMMY_ID\n"]
+    assert copied == dict(
+        query="""SELECT _.*, 'DUMMY_ID' AS "query_id" FROM (SELECT key FROM foo) AS _""",
+        format="csv",
+        header=True,
+    )
+
+
+@pytest.mark.parametrize(
+    "chunk_size, expected_chunks",
+    [
+        (
+            1,
+            [
+                b'{"query_id":"DUMMY_ID", "query_result":[',
+                b'{"key":"value1"}',
+                b', {"key":"value2"}',
+                b', {"key":"value3"}',
+                b"]}",
+            ],
+        ),
+        (
+            65536,
+            [
+                b'{"query_id":"DUMMY_ID", "query_result":[',
+                b'{"key":"value1"}, {"key":"value2"}, {"key":"value3"}',
+                b"]}",
+            ],
+        ),
+    ],
+)
+@pytest.mark.asyncio
+async def test_stream_result_as_json_chunks_rows(chunk_size, expected_chunks, app):
+    """
+    Test that rows are encoded and sent in chunks.
+    """
+    app.db_pool.acquire.return_value.__aenter__.return_value.cursor.return_value.__aiter__.return_value = [
+        {"key": "value1"},
+        {"key": "value2"},
+        {"key": "value3"},
+    ]
+    async with app.app.test_request_context("/", method="GET"):
+        from quart import request
+
+        request.request_id = "DUMMY_REQUEST_ID"
+        chunks = [
+            chunk
+            async for chunk in stream_result_as_json(
+                "SELECT key FROM foo",
+                additional_elements={"query_id": "DUMMY_ID"},
+                chunk_size=chunk_size,
+            )
+        ]
+    assert chunks == expected_chunks
+
+
+@pytest.mark.asyncio
+async def test_stream_result_as_json_encoded_in_db(app):
+    """
+    Test that rows can be encoded as JSON by the database.
+    """
+    connection = app.db_pool.acquire.return_value.__aenter__.return_value
+    connection.cursor.return_value.__aiter__.return_value = [
+        ['{"key":"value1"}'],
+        ['{"key":"value2"}'],
+    ]
+    async with app.app.test_request_context("/", method="GET"):
+        from quart import request
+
+        request.request_id = "DUMMY_REQUEST_ID"
+        result = b"".join(
+            [
+                chunk
+                async for chunk in stream_result_as_json(
+                    "SELECT key FROM foo;", encode_in_db=True
+                )
+            ]
+        )
+    assert result == b'{"query_result":[{"key":"value1"}, {"key":"value2"}]}'
+    assert connection.cursor.call_args[0][0] == (
+        "SELECT row_to_json(_)::text FROM (SELECT key FROM foo) AS _"
+    )
+
+
+def test_arrow_schema():
+    """
+    Test that postgres types are mapped to arrow types, and unknown types to strings.
+    """
+    schema, converters = arrow_schema(
+        [
+            Attribute("count", Type("int8")),
+            Attribute("value", Type("numeric")),
+            Attribute("pcod", Type("text")),
+            Attribute("geom", Type("geometry")),
+        ]
+    )
+    assert schema == pa.schema(
+        [
+            ("count", pa.int64()),
+            ("value", pa.float64()),
+            ("pcod", pa.string()),
+            ("geom", pa.string()),
+        ]
+    )
+    assert converters[0] is None
+    assert converters[1](Decimal("1.5")) == 1.5
+
+
+@pytest.mark.parametrize(
+    "streamer, read",
+    [
+        (stream_result_as_arrow, lambda data: pa.ipc.open_stream(data).read_all()),
+        (stream_result_as_parquet, lambda data: pq.read_table(pa.BufferReader(data))),
+    ],
+)
+@pytest.mark.asyncio
+async def test_stream_result_as_columnar(streamer, read, app):
+    """
+    Test that rows fetched in batches are streamed in a columnar format.
+    """
+
+    class Cursor:
+        def __init__(self, rows):
+            self.rows = rows
+
+        async def fetch(self, n):
+            batch, self.rows = self.rows[:n], self.rows[n:]
+            return batch
+
+    class Statement:
+        def get_attributes(self):
+            return (
+                Attribute("pcod", Type("text")),
+                Attribute("value", Type("numeric")),
+            )
+
+        async def cursor(self):
+            return Cursor([("a", Decimal("1.5")), ("b", None), ("c", Decimal("3"))])
+
+    async def prepare(query):
+        return Statement()
+
+    app.db_pool.acquire.return_value.__aenter__.return_value.prepare = prepare
+    async with app.app.test_request_context("/", method="GET"):
+        from quart import request
+
+        request.request_id = "DUMMY_REQUEST_ID"
+        chunks = [chunk async for chunk in streamer("SELECT 1", batch_size=2)]
+    assert len(chunks) > 1
+    assert read(b"".join(chunks)).to_pydict() == {
+        "pcod": ["a", "b", "c"],
+        "value": [1.5, None, 3.0],
+    }
+
+
+@pytest.mark.asyncio
+async def test_stream_result_as_arrow_fails_on_error(app):
+    """
+    Test that an error part way through streaming an Arrow result is raised, rather than ending the stream.
+    """
+
+    class Cursor:
+        def __init__(self):
+            self.fetched = False
+
+        async def fetch(self, n):
+            if self.fetched:
+                raise asyncpg.PostgresError("DUMMY_ERROR")
+            self.fetched = True
+            return [(1,)]
+
+    class Statement:
+        def get_attributes(self):
+            return (Attribute("value", Type("int8")),)
+
+        async def cursor(self):
+            return Cursor()
+
+    async def prepare(query):
+        return Statement()
+
+    app.db_pool.acquire.return_value.__aenter__.return_value.prepare = prepare
+    async with app.app.test_request_context("/", method="GET"):
+        from quart import request
+
+        request.request_id = "DUMMY_REQUEST_ID"
+        chunks = []
+        with pytest.raises(asyncpg.PostgresError):
+            async for chunk in stream_result_as_arrow("SELECT 1", batch_size=1):
+                chunks.append(chunk)
+    assert len(chunks) > 0
+
+
+@pytest.mark.parametrize(
+    "accept_encodings, expected",
+    [
+        ([], None),
+        ([("deflate", 1)], None),
+        ([("gzip", 1), ("deflate", 1)], "gzip"),
+        ([("gzip", 1), ("zstd", 1)], "zstd"),
+        ([("gzip", 1), ("zstd", 0.5)], "gzip"),
+        ([("zstd", 0), ("*", 1)], "gzip"),
+    ],
+)
+def test_negotiate_content_encoding(accept_encodings, expected):
+    """
+    Test that the client's preferred compressed encoding is chosen, favouring zstd.
+    """
+    assert negotiate_content_encoding(Accept(accept_encodings)) == expected
+
+
+@pytest.mark.asyncio
+async def test_compress_stream():
+    """
+    Test that a stream is compressed as it is streamed.
+    """
+
+    async def chunks():
+        for i in range(100):
+            yield f"{i}".encode() * 1000
+
+    compressed = [chunk async for chunk in compress_stream(chunks(), "gzip")]
+    assert gzip.decompress(b"".join(compressed)) == b"".join(
+        [f"{i}".encode() * 1000 for i in range(100)]
+    )
@@ -0,0 +1,69 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+import time
+
+import pytest
+from quart_jwt_extended.exceptions import UserClaimsVerificationError
+
+from flowapi.user_model import TokenScopesCache, UserObject
+
+
+def test_scopes_cached_per_token(monkeypatch):
+    """
+    Test that a token's claims are only expanded the first time it is used.
+    """
+    compile_calls = []
+
+    def dummy_compile_scopes(*, scopes):
+        compile_calls.append(scopes)
+        return frozenset()
+
+    monkeypatch.setattr("flowapi.user_model.compile_scopes", dummy_compile_scopes)
+    cache = TokenScopesCache(maxsize=2)
+    cache.get_scopes(key="TOKEN", claims=["run&dummy"])
+    cache.get_scopes(key="TOKEN", claims=["run&dummy"])
+    assert compile_calls == [["run&dummy"]]
+
+
+def test_expired_token_scopes_recompiled(monkeypatch):
+    """
+    Test that scopes cached for an expired token are not reused.
+    """
+    cache = TokenScopesCache(maxsize=2)
+    first = cache.get_scopes(key="TOKEN", claims=["run&dummy"], expires=time.time() - 1)
+    second = cache.get_scopes(key="TOKEN", claims=["run&dummy"])
+    assert first.exact == second.exact
+    assert first is not second
+
+
+def test_least_recently_used_token_evicted():
+    """
+    Test that the least recently used token is evicted when the cache is full.
+    """
+    cache = TokenScopesCache(maxsize=2)
+    first = cache.get_scopes(key="FIRST", claims=["run&dummy"])
+    cache.get_scopes(key="SECOND", claims=["run&dummy"])
+    cache.get_scopes(key="FIRST", claims=["run&dummy"])
+    cache.get_scopes(key="THIRD", claims=["run&dummy"])
+    assert len(cache) == 2
+    assert cache.get_scopes(key="FIRST", claims=["run&dummy"]) is first
+    assert "SECOND" not in cache._entries
+
+
+def test_has_access_with_compiled_scopes():
+    """
+    Test that access is checked against the compiled scopes.
+    """
+    cache = TokenScopesCache(maxsize=1)
+    user = UserObject(
+        username="TEST_USER",
+        scopes=cache.get_scopes(key="TOKEN", claims=["run&dummy.aggregation_unit.A"]),
+    )
+    assert user.can_run(query_json={"query_kind": "dummy", "aggregation_unit": "A"})
+    with pytest.raises(UserClaimsVerificationError):
+        user.can_run(query_json={"query_kind": "dummy", "aggregation_unit": "B"})
+    with pytest.raises(UserClaimsVerificationError):
+        user.can_get_results(
+            query_json={"query_kind": "dummy", "aggregation_unit": "A"}
+        )
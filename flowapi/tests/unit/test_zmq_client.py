@@ -0,0 +1,146 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import asyncio
+import json
+
+import pytest
+import structlog
+import zmq
+from zmq.asyncio import Context
+
+from flowapi.zmq_client import FlowmachineClient
+
+
+@pytest.fixture
+def router():
+    """
+    A ROUTER socket standing in for the FlowMachine server.
+    """
+    socket = Context.instance().socket(zmq.ROUTER)
+    port = socket.bind_to_random_port("tcp://127.0.0.1")
+    yield socket, f"tcp://127.0.0.1:{port}"
+    socket.close(linger=0)
+
+
+@pytest.mark.asyncio
+async def test_replies_matched_to_requests(router):
+    """
+    Test that replies which arrive out of order are returned to the right request.
+    """
+    server, address = router
+    client = FlowmachineClient(
+        address=address, timeout=5, logger=structlog.get_logger()
+    )
+    client.connect()
+    first = asyncio.ensure_future(client.request({"n": 1}))
+    second = asyncio.ensure_future(client.request({"n": 2}))
+    received = [await server.recv_multipart() for _ in range(2)]
+    for *envelope, _, msg in reversed(received):
+        await server.send_multipart([*envelope, b"", msg])
+    assert await first == {"n": 1}
+    assert await second == {"n": 2}
+    client.close()
+
+
+@pytest.mark.asyncio
+async def test_timeout_fails_only_slow_request(router):
+    """
+    Test that when one request times out, other requests waiting for replies
+    still get them, and the socket isn't replaced while FlowMachine is responsive.
+    """
+    server, address = router
+    client = FlowmachineClient(
+        address=address, timeout=0.2, logger=structlog.get_logger()
+    )
+    client.connect()
+    old_socket = client._socket
+    slow = asyncio.ensure_future(client.request({"n": 1}))
+    await server.recv_multipart()
+    await asyncio.sleep(0.1)
+    other = asyncio.ensure_future(client.request({"n": 2}))
+    *envelope, _, msg = await server.recv_multipart()
+    with pytest.raises(asyncio.TimeoutError):
+        await slow
+    # FlowMachine replies to the liveness check ping, and to the other request
+    *ping_envelope, _, ping = await asyncio.wait_for(server.recv_multipart(), 1)
+    assert json.loads(ping)["action"] == "ping"
+    await server.send_multipart([*ping_envelope, b"", b'{"msg": "pong"}'])
+    await server.send_multipart([*envelope, b"", msg])
+    assert await other == {"n": 2}
+    await client._liveness_check
+    assert client._socket is old_socket
+    assert not old_socket.closed
+    client.close()
+
+
+@pytest.mark.asyncio
+async def test_no_ping_after_recent_reply(router):
+    """
+    Test that a timeout doesn't trigger a ping if FlowMachine replied to
+    something within the timeout.
+    """
+    server, address = router
+    client = FlowmachineClient(
+        address=address, timeout=0.2, logger=structlog.get_logger()
+    )
+    client.connect()
+    slow = asyncio.ensure_future(client.request({"n": 1}))
+    await server.recv_multipart()
+    await asyncio.sleep(0.15)
+    fast = asyncio.ensure_future(client.request({"n": 2}))
+    *envelope, _, msg = await server.recv_multipart()
+    await server.send_multipart([*envelope, b"", msg])
+    assert await fast == {"n": 2}
+    with pytest.raises(asyncio.TimeoutError):
+        await slow
+    await client._liveness_check
+    assert not await server.poll(timeout=100)
+    client.close()
+
+
+@pytest.mark.asyncio
+async def test_unresponsive_flowmachine_reconnects(router):
+    """
+    Test that the socket is replaced, and waiting requests fail, if FlowMachine
+    doesn't reply to anything or to a ping.
+    """
+    _, address = router
+    client = FlowmachineClient(
+        address=address, timeout=0.1, logger=structlog.get_logger()
+    )
+    client.connect()
+    old_socket = client._socket
+    slow = asyncio.ensure_future(client.request({"n": 1}))
+    await asyncio.sleep(0.05)
+    waiting = asyncio.ensure_future(client.request({"n": 2}))
+    with pytest.raises(asyncio.TimeoutError):
+        await slow
+    liveness_check = client._liveness_check
+    with pytest.raises((asyncio.TimeoutError, ConnectionResetError)):
+        await waiting
+    await liveness_check
+    assert client._socket is not old_socket
+    assert old_socket.closed
+    client.close()
+
+
+@pytest.mark.asyncio
+async def test_channel_times_out_with_503(router):
+    """
+    Test that a channel raises a 503 if FlowMachine doesn't reply in time.
+    """
+    from quart.exceptions import HTTPException
+
+    _, address = router
+    client = FlowmachineClient(
+        address=address, timeout=0.1, logger=structlog.get_logger()
+    )
+    client.connect()
+    channel = client.channel()
+    channel.send_json({"n": 1})
+    with pytest.raises(HTTPException) as exc:
+        await channel.recv_json()
+    assert exc.value.status_code == 503
+    client.close()
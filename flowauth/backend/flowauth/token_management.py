@@ -3,7 +3,7 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import uuid
-from typing import Iterable, Optional
+from typing import FrozenSet, Iterable, Optional, Tuple
 
 import jwt
 from cryptography.hazmat.backends.openssl.rsa import _RSAPrivateKey
@@ -171,6 +171,7 @@ def add_token(server):
         lifetime=lifetime,
         claims=json["claims"],
         private_key=current_app.config["PRIVATE_JWT_SIGNING_KEY"],
+        group_values=True,
     )
 
     token = Token(
@@ -244,6 +245,79 @@ def squash(xs, ix=0):
     return res
 
 
+def _split_scope(scope: str) -> Tuple[Tuple[str, Optional[FrozenSet[str]]], ...]:
+    # Split each & separated part of a scope into the part before its final
+    # dotted segment, and the set of values of that segment
+    split = []
+    for part in scope.split("&"):
+        prefix, dot, value = part.rpartition(".")
+        if dot and value != "*":
+            split.append((prefix, frozenset([value])))
+        else:
+            split.append((part, None))
+    return tuple(split)
+
+
+def _join_scope(scope: Tuple[Tuple[str, Optional[FrozenSet[str]]], ...]) -> str:
+    parts = []
+    for prefix, values in scope:
+        if values is None:
+            parts.append(prefix)
+        elif len(values) == 1:
+            parts.append(f"{prefix}.{next(iter(values))}")
+        else:
+            parts.append(f"{prefix}.{{{','.join(sorted(values))}}}")
+    return "&".join(parts)
+
+
+def grouped_scopes(scopes: List[str]) -> List[str]:
+    """
+    Combine groups of scope strings which differ only in the final segment of one
+    of their dotted parts, by listing the values of that segment in braces.
+
+    Every value granted is still listed explicitly, so the grouped scopes grant
+    exactly the same as the originals.
+
+    Parameters
+    ----------
+    scopes : list of str
+        List of scope strings of the form <action>&<query_kind>.<arg_name>.<arg_val>
+
+    Returns
+    -------
+    list of str
+        Scope strings, where the final segment of a part may be of the form {<arg_val_a>,<arg_val_b>}
+
+    Examples
+    --------
+    >>> grouped_scopes(["run&dummy.aggregation_unit.admin0", "run&dummy.aggregation_unit.admin1"])
+    ["run&dummy.aggregation_unit.{admin0,admin1}"]
+    """
+    split_scopes = {_split_scope(scope) for scope in scopes}
+    changed = True
+    while changed:
+        changed = False
+        for ix in range(max((len(scope) for scope in split_scopes), default=0)):
+            groups = {}
+            for scope in split_scopes:
+                if ix < len(scope) and scope[ix][1] is not None:
+                    key = (scope[:ix], scope[ix][0], scope[ix + 1 :])
+                    groups.setdefault(key, set()).add(scope)
+                else:
+                    groups[scope] = {scope}
+            grouped = set()
+            for key, group in groups.items():
+                if len(group) == 1:
+                    grouped |= group
+                else:
+                    before, prefix, after = key
+                    values = frozenset().union(*(scope[ix][1] for scope in group))
+                    grouped.add(before + ((prefix, values),) + after)
+            changed = changed or grouped != split_scopes
+            split_scopes = grouped
+    return sorted(_join_scope(scope) for scope in split_scopes)
+
+
 def squashed_scopes(scopes: List[str]) -> Iterable[str]:
     """
     Squashes a list of scope strings by combining them where possible.
@@ -272,6 +346,7 @@ def generate_token(
     private_key: Union[str, _RSAPrivateKey],
     lifetime: datetime.timedelta,
     claims: List[str],
+    group_values: bool = False,
 ) -> str:
     """
 
@@ -288,6 +363,9 @@ def generate_token(
         Dictionary of claims the token will grant
     flowapi_identifier : str, optional
         Optionally provide a string to identify the audience of the token
+    group_values : bool, default False
+        Set to True to combine claims which differ only in the value of one argument
+        by listing the values in braces (see `grouped_scopes`), to make the token smaller.
 
     Examples
     --------
@@ -302,6 +380,8 @@ def generate_token(
 
     """
 
+    if group_values:
+        claims = grouped_scopes(claims)
     now = datetime.datetime.utcnow()
     token_data = dict(
         iat=now,
@@ -8,6 +8,7 @@ import jwt
 
 import pytest
 from flowauth.token_management import generate_token as flowauth_generate_token
+from flowauth.token_management import grouped_scopes
 from flowkit_jwt_generator import generate_token as jwt_generator_generate_token
 from pytest import approx
 
@@ -86,6 +87,87 @@ def test_token_rejected_for_expiry(client, auth, app, test_user):
     } == response.get_json()
 
 
+@pytest.mark.usefixtures("test_data_with_access_rights")
+def test_token_generation_groups_values(client, auth, app, test_user, public_key):
+    """Test that claims which differ only in an argument's value are grouped, listing every value."""
+    uid, uname, upass = test_user
+    response, csrf_cookie = auth.login(uname, upass)
+    expiry = datetime.datetime.now() + datetime.timedelta(minutes=2)
+    token_eq = {
+        "name": "DUMMY_TOKEN",
+        "expiry": expiry.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        "claims": [
+            f"{action}&DUMMY_ROUTE_A.aggregation_unit.admin{x}"
+            for action in ("get_result", "run")
+            for x in range(4)
+        ]
+        + ["run&DUMMY_ROUTE_B.aggregation_unit.admin0"],
+    }
+    response = client.post(
+        "/tokens/tokens/1", headers={"X-CSRF-Token": csrf_cookie}, json=token_eq
+    )
+    assert 200 == response.status_code
+    decoded_token = jwt.decode(
+        jwt=response.get_json()["token"].encode(),
+        key=public_key,
+        algorithms=["RS256"],
+        audience="DUMMY_SERVER_A",
+    )
+    assert [
+        "get_result,run&DUMMY_ROUTE_A.aggregation_unit.{admin0,admin1,admin2,admin3}",
+        "run&DUMMY_ROUTE_B.aggregation_unit.admin0",
+    ] == decoded_token["user_claims"]
+
+
+@pytest.mark.parametrize(
+    "scopes, expected",
+    [
+        (["run&dummy.aggregation_unit.admin0"], ["run&dummy.aggregation_unit.admin0"]),
+        (
+            ["run&dummy.aggregation_unit.admin0", "run&dummy.aggregation_unit.admin1"],
+            ["run&dummy.aggregation_unit.{admin0,admin1}"],
+        ),
+        (
+            [
+                "run&flows.from_location.aggregation_unit.admin0&flows.to_location.aggregation_unit.admin0",
+                "run&flows.from_location.aggregation_unit.admin0&flows.to_location.aggregation_unit.admin1",
+            ],
+            [
+                "run&flows.from_location.aggregation_unit.admin0&flows.to_location.aggregation_unit.{admin0,admin1}"
+            ],
+        ),
+        (
+            [
+                "run&flows.from_location.aggregation_unit.admin0&flows.to_location.aggregation_unit.admin0",
+                "run&flows.from_location.aggregation_unit.admin0&flows.to_location.aggregation_unit.admin1",
+                "run&flows.from_location.aggregation_unit.admin1&flows.to_location.aggregation_unit.admin0",
+                "run&flows.from_location.aggregation_unit.admin1&flows.to_location.aggregation_unit.admin1",
+            ],
+            [
+                "run&flows.from_location.aggregation_unit.{admin0,admin1}&flows.to_location.aggregation_unit.{admin0,admin1}"
+            ],
+        ),
+        (
+            [
+                "run&flows.from_location.aggregation_unit.admin0&flows.to_location.aggregation_unit.admin0",
+                "run&flows.from_location.aggregation_unit.admin1&flows.to_location.aggregation_unit.admin1",
+            ],
+            [
+                "run&flows.from_location.aggregation_unit.admin0&flows.to_location.aggregation_unit.admin0",
+                "run&flows.from_location.aggregation_unit.admin1&flows.to_location.aggregation_unit.admin1",
+            ],
+        ),
+        (
+            ["run&dummy.aggregation_unit.*", "run&dummy.aggregation_unit.admin0"],
+            ["run&dummy.aggregation_unit.*", "run&dummy.aggregation_unit.admin0"],
+        ),
+    ],
+)
+def test_grouped_scopes(scopes, expected):
+    """Test that scopes are only grouped where every combination of values is granted, and wildcards aren't added."""
+    assert grouped_scopes(scopes) == expected
+
+
 def test_against_general_generator(app, public_key):
     """Test that the token generator in FlowAuth and the one in flowkit-jwt-generator produce same results."""
 
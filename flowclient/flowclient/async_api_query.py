@@ -3,7 +3,8 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 
-from typing import Union, Optional
+from functools import partial
+from typing import List, Union, Optional
 
 from flowclient.api_query import APIQuery
 from flowclient.async_connection import ASyncConnection
@@ -87,6 +88,10 @@ class ASyncAPIQuery(APIQuery):
         format: str = "pandas",
         poll_interval: int = 1,
         disable_progress: Optional[bool] = None,
+        columns: Optional[List[str]] = None,
+        filters: Optional[dict] = None,
+        page: Optional[int] = None,
+        page_size: int = 1000,
     ) -> Union["pandas.DataFrame", dict]:
         """
         Get the result of this query, as a pandas DataFrame or GeoJSON dict.
@@ -100,15 +105,38 @@ class ASyncAPIQuery(APIQuery):
         disable_progress : bool, default None
             Set to True to disable progress bar display entirely, None to disable on
             non-TTY, or False to always enable
+        columns : list of str, optional
+            Names of the columns of the result to get (default: all). Only
+            supported for the 'pandas' format.
+        filters : dict, optional
+            Only get rows which have these values in these columns, e.g.
+            `{"pcod": "NPL.1.1_1"}`. Only supported for the 'pandas' format.
+        page : int, optional
+            Number of the page of rows to get, counting from 0 (default: get all
+            rows). Only supported for the 'pandas' format.
+        page_size : int, default 1000
+            Number of rows in each page
 
         Returns
         -------
         pandas.DataFrame or dict
             Query result
         """
+        selection = {}
+        if columns is not None:
+            selection["columns"] = columns
+        if filters is not None:
+            selection["filters"] = filters
+        if page is not None:
+            selection["limit"] = page_size
+            selection["offset"] = page * page_size
         if format == "pandas":
-            result_getter = get_result_by_query_id
+            result_getter = partial(get_result_by_query_id, **selection)
         elif format == "geojson":
+            if len(selection) > 0:
+                raise ValueError(
+                    "Selecting columns, filters or pages is only supported for the 'pandas' format."
+                )
             result_getter = get_geojson_result_by_query_id
         else:
             raise ValueError(
@@ -4,6 +4,7 @@
 
 import logging
 import re
+import time
 from asyncio import sleep
 
 import pandas as pd
@@ -13,6 +14,7 @@ from tqdm.auto import tqdm
 
 
 import flowclient.errors
+from flowclient.client import read_arrow_stream, result_selection_query_string
 from flowclient.async_connection import ASyncConnection
 
 logger = logging.getLogger(__name__)
@@ -24,6 +26,8 @@ async def connect_async(
     token: str,
     api_version: int = 0,
     ssl_certificate: Union[str, None] = None,
+    max_concurrent_requests: int = 10,
+    http2: bool = False,
 ) -> ASyncConnection:
     """
     Connect to a FlowKit API server and return the resulting Connection object.
@@ -39,18 +43,27 @@ async def connect_async(
     ssl_certificate: str or None
         Provide a path to an ssl certificate to use, or None to use
         default root certificates.
+    max_concurrent_requests : int, default 10
+        Maximum number of requests to have in flight at once
+    http2 : bool, default False
+        Set to True to use HTTP/2 if the server supports it
 
     Returns
     -------
     ASyncConnection
     """
     return ASyncConnection(
-        url=url, token=token, api_version=api_version, ssl_certificate=ssl_certificate
+        url=url,
+        token=token,
+        api_version=api_version,
+        ssl_certificate=ssl_certificate,
+        max_concurrent_requests=max_concurrent_requests,
+        http2=http2,
     )
 
 
 async def query_is_ready(
-    *, connection: ASyncConnection, query_id: str
+    *, connection: ASyncConnection, query_id: str, wait: float = 0
 ) -> Tuple[bool, requests.Response]:
     """
     Check if a query id has results available.
@@ -61,6 +74,9 @@ async def query_is_ready(
         API connection  to use
     query_id : str
         Identifier of the query to retrieve
+    wait : float, default 0
+        If the query is queued or executing, ask the server to wait up to this
+        many seconds for its status to change before replying
 
     Returns
     -------
@@ -75,7 +91,10 @@ async def query_is_ready(
     logger.info(
         f"Polling server on {connection.url}/api/{connection.api_version}/poll/{query_id}"
     )
-    reply = await connection.get_url(route=f"poll/{query_id}")
+    route = f"poll/{query_id}"
+    if wait > 0:
+        route += f"?wait={wait}"
+    reply = await connection.get_url(route=route)
 
     if reply.status_code == 303:
         logger.info(
@@ -138,11 +157,16 @@ async def wait_for_query_to_be_ready(
     query_id: str,
     poll_interval: int = 1,
     disable_progress: Optional[bool] = None,
+    wait: float = 10,
 ) -> requests.Response:
     """
     Wait until a query id has finished running, and if it finished successfully
     return the reply from flowapi.
 
+    Each poll is a long-poll: the server holds the request open until the
+    query's status changes (or `wait` seconds pass), so the query being ready
+    is noticed as soon as it happens without repeatedly polling.
+
     Parameters
     ----------
     connection : ASyncConnection
@@ -150,10 +174,14 @@ async def wait_for_query_to_be_ready(
     query_id : str
         Identifier of the query to retrieve
     poll_interval : int
-        Number of seconds to wait between checks for the query being ready
+        Minimum number of seconds between checks for the query being ready
     disable_progress : bool, default None
         Set to True to disable progress bar display entirely, None to disable on
         non-TTY, or False to always enable
+    wait : float, default 10
+        Maximum number of seconds the server should wait for the query's status
+        to change before replying to each poll (the progress bar is updated at
+        least this often). Set to 0 to poll every `poll_interval` seconds instead.
 
     Returns
     -------
@@ -165,6 +193,7 @@ async def wait_for_query_to_be_ready(
     FlowclientConnectionError
         If the query has finished running unsuccessfully
     """
+    last_poll = time.monotonic()
     query_ready, reply = await query_is_ready(
         connection=connection, query_id=query_id
     )  # Poll the server
@@ -177,12 +206,13 @@ async def wait_for_query_to_be_ready(
             desc="Parts run", disable=disable_progress, unit="q", total=total_eligible
         ) as total_bar:
             while not query_ready:
-                logger.info("Waiting before polling again.")
-                await sleep(
-                    poll_interval
-                )  # Wait a second, then check if the query is ready again
+                # Don't poll more often than every poll_interval seconds, e.g. if
+                # the server doesn't support waiting for the status to change
+                await sleep(max(0, poll_interval - (time.monotonic() - last_poll)))
+                logger.info("Waiting for the query's status to change.")
+                last_poll = time.monotonic()
                 query_ready, reply = await query_is_ready(
-                    connection=connection, query_id=query_id
+                    connection=connection, query_id=query_id, wait=wait
                 )  # Poll the server
                 if query_ready:
                     break
@@ -278,6 +308,40 @@ async def get_json_dataframe(
     return pd.DataFrame.from_records(result["query_result"])
 
 
+async def get_arrow_dataframe(
+    *, connection: ASyncConnection, location: str
+) -> pd.DataFrame:
+    """
+    Get a dataframe from an Arrow IPC stream source.
+
+    Parameters
+    ----------
+    connection : ASyncConnection
+        API connection  to use
+    location : str
+        API enpoint to retrieve the Arrow stream from
+
+    Returns
+    -------
+    pandas.DataFrame
+        Dataframe containing the result
+
+    """
+
+    response = await connection.get_url(route=location)
+    if response.status_code != 200:
+        try:
+            msg = response.json()["msg"]
+            more_info = f" Reason: {msg}"
+        except KeyError:
+            more_info = ""
+        raise flowclient.errors.FlowclientConnectionError(
+            f"Could not get result. API returned with status code: {response.status_code}.{more_info}"
+        )
+    logger.info(f"Got {connection.url}/api/{connection.api_version}/{location}")
+    return read_arrow_stream(response.content)
+
+
 async def get_geojson_result_by_query_id(
     *,
     connection: ASyncConnection,
@@ -331,6 +395,13 @@ async def get_result_by_query_id(
     query_id: str,
     poll_interval: int = 1,
     disable_progress: Optional[bool] = None,
+    filetype: str = "arrow",
+    columns: Optional[List[str]] = None,
+    filters: Optional[dict] = None,
+    order_by: Optional[List[str]] = None,
+    after: Optional[list] = None,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
 ) -> pd.DataFrame:
     """
     Get a query by id, and return it as a dataframe
@@ -346,6 +417,25 @@ async def get_result_by_query_id(
     disable_progress : bool, async default None
         Set to True to disable progress bar display entirely, None to disable on
         non-TTY, or False to always enable
+    filetype : {"arrow", "json"}, default "arrow"
+        Format to fetch the result in. Arrow results are smaller, and keep
+        the column types, so are faster to fetch and decode.
+    columns : list of str, optional
+        Names of the columns of the result to get (default: all)
+    filters : dict, optional
+        Only get rows which have these values in these columns, e.g.
+        `{"pcod": "NPL.1.1_1"}`
+    order_by : list of str, optional
+        Columns to order the rows by
+    after : list, optional
+        Only get rows which come after these values of the `order_by` columns.
+        Pass the `order_by` values of the last row of one page of results to get
+        the next page; the `order_by` columns must uniquely identify each row.
+    limit : int, optional
+        Maximum number of rows to get
+    offset : int, optional
+        Number of rows to skip. If `limit` or `offset` is given without
+        `order_by`, rows are ordered by all the columns.
 
     Returns
     -------
@@ -353,13 +443,31 @@ async def get_result_by_query_id(
         Dataframe containing the result
 
     """
+    if filetype not in ("arrow", "json"):
+        raise ValueError(
+            f"Invalid filetype: '{filetype}'. Expected one of {{'arrow', 'json'}}."
+        )
     result_endpoint = await get_result_location_from_id_when_ready(
         connection=connection,
         query_id=query_id,
         poll_interval=poll_interval,
         disable_progress=disable_progress,
     )
-    return await get_json_dataframe(connection=connection, location=result_endpoint)
+    query_string = result_selection_query_string(
+        columns=columns,
+        filters=filters,
+        order_by=order_by,
+        after=after,
+        limit=limit,
+        offset=offset,
+    )
+    if filetype == "arrow":
+        return await get_arrow_dataframe(
+            connection=connection, location=f"{result_endpoint}.arrow{query_string}"
+        )
+    return await get_json_dataframe(
+        connection=connection, location=f"{result_endpoint}{query_string}"
+    )
 
 
 async def get_geojson_result(
@@ -399,6 +507,13 @@ async def get_result(
     connection: ASyncConnection,
     query_spec: dict,
     disable_progress: Optional[bool] = None,
+    filetype: str = "arrow",
+    columns: Optional[List[str]] = None,
+    filters: Optional[dict] = None,
+    order_by: Optional[List[str]] = None,
+    after: Optional[list] = None,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
 ) -> pd.DataFrame:
     """
     Run and retrieve a query of a specified kind with parameters.
@@ -412,6 +527,25 @@ async def get_result(
     disable_progress : bool, async default None
         Set to True to disable progress bar display entirely, None to disable on
         non-TTY, or False to always enable
+    filetype : {"arrow", "json"}, default "arrow"
+        Format to fetch the result in. Arrow results are smaller, and keep
+        the column types, so are faster to fetch and decode.
+    columns : list of str, optional
+        Names of the columns of the result to get (default: all)
+    filters : dict, optional
+        Only get rows which have these values in these columns, e.g.
+        `{"pcod": "NPL.1.1_1"}`
+    order_by : list of str, optional
+        Columns to order the rows by
+    after : list, optional
+        Only get rows which come after these values of the `order_by` columns.
+        Pass the `order_by` values of the last row of one page of results to get
+        the next page; the `order_by` columns must uniquely identify each row.
+    limit : int, optional
+        Maximum number of rows to get
+    offset : int, optional
+        Number of rows to skip. If `limit` or `offset` is given without
+        `order_by`, rows are ordered by all the columns.
 
     Returns
     -------
@@ -423,6 +557,13 @@ async def get_result(
         connection=connection,
         query_id=await run_query(connection=connection, query_spec=query_spec),
         disable_progress=disable_progress,
+        filetype=filetype,
+        columns=columns,
+        filters=filters,
+        order_by=order_by,
+        after=after,
+        limit=limit,
+        offset=offset,
     )
 
 
@@ -2,16 +2,26 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-from typing import Union
+import asyncio
+import logging
+from typing import Optional, Union
 
-import requests
+import httpx
 
 import flowclient.connection
+from flowclient.errors import FlowclientConnectionError
+
+logger = logging.getLogger(__name__)
 
 
 class ASyncConnection(flowclient.connection.Connection):
     """
-    A connection to a FlowKit API server.
+    A connection to a FlowKit API server, which makes requests without
+    blocking the event loop.
+
+    Requests are made over a pool of keep-alive connections, and at most
+    `max_concurrent_requests` are in flight at once, so many queries can be
+    run or polled concurrently (e.g. with `asyncio.gather`).
 
     Attributes
     ----------
@@ -35,11 +45,97 @@ class ASyncConnection(flowclient.connection.Connection):
     ssl_certificate: str or None
         Provide a path to an ssl certificate to use, or None to use
         default root certificates.
+    max_concurrent_requests : int, default 10
+        Maximum number of requests to have in flight at once. This is also
+        the number of connections kept open to the server.
+    http2 : bool, default False
+        Set to True to use HTTP/2 if the server supports it, which allows
+        concurrent requests to share a single connection. Requires the
+        `h2` package (install flowclient with the `http2` extra).
     """
 
+    def __init__(
+        self,
+        *,
+        url: str,
+        token: str,
+        api_version: int = 0,
+        ssl_certificate: Union[str, None] = None,
+        max_concurrent_requests: int = 10,
+        http2: bool = False,
+    ) -> None:
+        super().__init__(
+            url=url,
+            token=token,
+            api_version=api_version,
+            ssl_certificate=ssl_certificate,
+        )
+        self.ssl_certificate = ssl_certificate
+        self.max_concurrent_requests = max_concurrent_requests
+        self.http2 = http2
+        self._client: Optional[httpx.AsyncClient] = None
+        self._request_slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        The HTTP client used to make requests, created on first use so that
+        it belongs to the running event loop.
+
+        Returns
+        -------
+        httpx.AsyncClient
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                verify=True if self.ssl_certificate is None else self.ssl_certificate,
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrent_requests,
+                    max_keepalive_connections=self.max_concurrent_requests,
+                ),
+                timeout=None,
+            )
+            self._request_slots = asyncio.Semaphore(self.max_concurrent_requests)
+        return self._client
+
+    async def _request(
+        self, method: str, *, route: str, data: Union[None, dict] = None
+    ) -> httpx.Response:
+        """
+        Make a request to the API, waiting for a free slot if the maximum
+        number of requests are already in flight.
+
+        Parameters
+        ----------
+        method : str
+            HTTP method to use
+        route : str
+            Path relative to API host
+        data : dict, optional
+            JSON data to send in the request body
+
+        Returns
+        -------
+        httpx.Response
+        """
+        client = self.client
+        async with self._request_slots:
+            try:
+                return await client.request(
+                    method,
+                    f"{self.url}/api/{self.api_version}/{route}",
+                    json=data,
+                    headers={"Authorization": f"Bearer {self.token}"},
+                )
+            except httpx.TransportError as e:
+                error_msg = f"Unable to connect to FlowKit API at {self.url}: {e}"
+                logger.info(error_msg)
+                raise FlowclientConnectionError(error_msg)
+
     async def get_url(
         self, *, route: str, data: Union[None, dict] = None
-    ) -> requests.Response:
+    ) -> httpx.Response:
         """
         Attempt to get something from the API, and return the raw
         response object if an error response wasn't received.
@@ -55,12 +151,14 @@ class ASyncConnection(flowclient.connection.Connection):
 
         Returns
         -------
-        requests.Response
+        httpx.Response
 
         """
-        return super().get_url(route=route, data=data)
+        logger.debug(f"Getting {self.url}/api/{self.api_version}/{route}")
+        response = await self._request("GET", route=route, data=data)
+        return self._check_get_response(route=route, response=response)
 
-    async def post_json(self, *, route: str, data: dict) -> requests.Response:
+    async def post_json(self, *, route: str, data: dict) -> httpx.Response:
         """
         Attempt to post json to the API, and return the raw
         response object if an error response wasn't received.
@@ -75,10 +173,26 @@ class ASyncConnection(flowclient.connection.Connection):
 
         Returns
         -------
-        requests.Response
+        httpx.Response
 
         """
-        return super().post_json(route=route, data=data)
+        logger.debug(f"Posting {data} to {self.url}/api/{self.api_version}/{route}")
+        response = await self._request("POST", route=route, data=data)
+        return self._check_post_response(route=route, response=response)
+
+    async def close(self) -> None:
+        """
+        Close any open connections to the API server.
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self) -> "ASyncConnection":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
 
     def make_api_query(self, parameters: dict) -> "ASyncAPIQuery":
         from flowclient.async_api_query import ASyncAPIQuery
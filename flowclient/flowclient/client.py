@@ -2,10 +2,13 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import json
 import logging
 import re
+from urllib.parse import urlencode
 
 import pandas as pd
+import pyarrow as pa
 import requests
 import time
 from typing import Tuple, Union, List, Optional
@@ -49,7 +52,7 @@ def connect(
 
 
 def query_is_ready(
-    *, connection: Connection, query_id: str
+    *, connection: Connection, query_id: str, wait: float = 0
 ) -> Tuple[bool, requests.Response]:
     """
     Check if a query id has results available.
@@ -60,6 +63,9 @@ def query_is_ready(
         API connection  to use
     query_id : str
         Identifier of the query to retrieve
+    wait : float, default 0
+        If the query is queued or executing, ask the server to wait up to this
+        many seconds for its status to change before replying
 
     Returns
     -------
@@ -74,7 +80,10 @@ def query_is_ready(
     logger.info(
         f"Polling server on {connection.url}/api/{connection.api_version}/poll/{query_id}"
     )
-    reply = connection.get_url(route=f"poll/{query_id}")
+    route = f"poll/{query_id}"
+    if wait > 0:
+        route += f"?wait={wait}"
+    reply = connection.get_url(route=route)
 
     if reply.status_code == 303:
         logger.info(
@@ -137,11 +146,16 @@ def wait_for_query_to_be_ready(
     query_id: str,
     poll_interval: int = 1,
     disable_progress: Optional[bool] = None,
+    wait: float = 10,
 ) -> requests.Response:
     """
     Wait until a query id has finished running, and if it finished successfully
     return the reply from flowapi.
 
+    Each poll is a long-poll: the server holds the request open until the
+    query's status changes (or `wait` seconds pass), so the query being ready
+    is noticed as soon as it happens without repeatedly polling.
+
     Parameters
     ----------
     connection : Connection
@@ -149,10 +163,14 @@ def wait_for_query_to_be_ready(
     query_id : str
         Identifier of the query to retrieve
     poll_interval : int
-        Number of seconds to wait between checks for the query being ready
+        Minimum number of seconds between checks for the query being ready
     disable_progress : bool, default None
         Set to True to disable progress bar display entirely, None to disable on
         non-TTY, or False to always enable
+    wait : float, default 10
+        Maximum number of seconds the server should wait for the query's status
+        to change before replying to each poll (the progress bar is updated at
+        least this often). Set to 0 to poll every `poll_interval` seconds instead.
 
     Returns
     -------
@@ -164,6 +182,7 @@ def wait_for_query_to_be_ready(
     FlowclientConnectionError
         If the query has finished running unsuccessfully
     """
+    last_poll = time.monotonic()
     query_ready, reply = query_is_ready(
         connection=connection, query_id=query_id
     )  # Poll the server
@@ -176,12 +195,13 @@ def wait_for_query_to_be_ready(
             desc="Parts run", disable=disable_progress, unit="q", total=total_eligible
         ) as total_bar:
             while not query_ready:
-                logger.info("Waiting before polling again.")
-                time.sleep(
-                    poll_interval
-                )  # Wait a second, then check if the query is ready again
+                # Don't poll more often than every poll_interval seconds, e.g. if
+                # the server doesn't support waiting for the status to change
+                time.sleep(max(0, poll_interval - (time.monotonic() - last_poll)))
+                logger.info("Waiting for the query's status to change.")
+                last_poll = time.monotonic()
                 query_ready, reply = query_is_ready(
-                    connection=connection, query_id=query_id
+                    connection=connection, query_id=query_id, wait=wait
                 )  # Poll the server
                 if query_ready:
                     break
@@ -242,6 +262,60 @@ def get_result_location_from_id_when_ready(
     )  # strip off the /api/<api_version>/
 
 
+def result_selection_query_string(
+    *,
+    columns: Optional[List[str]] = None,
+    filters: Optional[dict] = None,
+    order_by: Optional[List[str]] = None,
+    after: Optional[list] = None,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
+) -> str:
+    """
+    Get the query string to request part of a query result.
+
+    Parameters
+    ----------
+    columns : list of str, optional
+        Names of the columns of the result to get (default: all)
+    filters : dict, optional
+        Only get rows which have these values in these columns, e.g.
+        `{"pcod": "NPL.1.1_1"}`
+    order_by : list of str, optional
+        Columns to order the rows by
+    after : list, optional
+        Only get rows which come after these values of the `order_by` columns.
+        Pass the `order_by` values of the last row of one page of results to get
+        the next page; the `order_by` columns must uniquely identify each row.
+    limit : int, optional
+        Maximum number of rows to get
+    offset : int, optional
+        Number of rows to skip. If `limit` or `offset` is given without
+        `order_by`, rows are ordered by all the columns.
+
+    Returns
+    -------
+    str
+        Query string, beginning with '?', or an empty string if the whole result
+        is requested
+
+    """
+    args = {}
+    if columns is not None:
+        args["columns"] = ",".join(columns)
+    if filters is not None:
+        args["filters"] = json.dumps(filters)
+    if order_by is not None:
+        args["order_by"] = ",".join(order_by)
+    if after is not None:
+        args["after"] = json.dumps(after)
+    if limit is not None:
+        args["limit"] = limit
+    if offset is not None:
+        args["offset"] = offset
+    return f"?{urlencode(args)}" if len(args) > 0 else ""
+
+
 def get_json_dataframe(*, connection: Connection, location: str) -> pd.DataFrame:
     """
     Get a dataframe from a json source.
@@ -275,6 +349,81 @@ def get_json_dataframe(*, connection: Connection, location: str) -> pd.DataFrame
     return pd.DataFrame.from_records(result["query_result"])
 
 
+# Marks the end of an Arrow IPC stream (older writers end streams with 4 zero bytes)
+ARROW_END_OF_STREAM = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+
+def read_arrow_stream(data: bytes) -> pd.DataFrame:
+    """
+    Read a complete Arrow IPC stream into a dataframe.
+
+    Parameters
+    ----------
+    data : bytes
+        The Arrow IPC stream
+
+    Returns
+    -------
+    pandas.DataFrame
+        Dataframe containing the record batches in the stream
+
+    Raises
+    ------
+    FlowclientConnectionError
+        If the stream ends before its end-of-stream marker, e.g. because
+        the server failed part way through sending it.
+    """
+    # Arrow's stream reader treats the end of the data as the end of the stream,
+    # so walk the messages to check the stream wasn't cut short.
+    reader = pa.BufferReader(data)
+    while True:
+        position = reader.tell()
+        if data[position : position + 8] == ARROW_END_OF_STREAM or (
+            data[position : position + 4] == b"\x00\x00\x00\x00"
+        ):
+            break
+        try:
+            if position >= len(data) or pa.ipc.read_message(reader) is None:
+                raise EOFError
+        except (EOFError, OSError, pa.ArrowInvalid):
+            raise FlowclientConnectionError(
+                "Could not get result. The Arrow stream ended unexpectedly."
+            )
+    return pa.ipc.open_stream(data).read_pandas()
+
+
+def get_arrow_dataframe(*, connection: Connection, location: str) -> pd.DataFrame:
+    """
+    Get a dataframe from an Arrow IPC stream source.
+
+    Parameters
+    ----------
+    connection : Connection
+        API connection  to use
+    location : str
+        API enpoint to retrieve the Arrow stream from
+
+    Returns
+    -------
+    pandas.DataFrame
+        Dataframe containing the result
+
+    """
+
+    response = connection.get_url(route=location)
+    if response.status_code != 200:
+        try:
+            msg = response.json()["msg"]
+            more_info = f" Reason: {msg}"
+        except KeyError:
+            more_info = ""
+        raise FlowclientConnectionError(
+            f"Could not get result. API returned with status code: {response.status_code}.{more_info}"
+        )
+    logger.info(f"Got {connection.url}/api/{connection.api_version}/{location}")
+    return read_arrow_stream(response.content)
+
+
 def get_geojson_result_by_query_id(
     *,
     connection: Connection,
@@ -328,6 +477,13 @@ def get_result_by_query_id(
     query_id: str,
     poll_interval: int = 1,
     disable_progress: Optional[bool] = None,
+    filetype: str = "arrow",
+    columns: Optional[List[str]] = None,
+    filters: Optional[dict] = None,
+    order_by: Optional[List[str]] = None,
+    after: Optional[list] = None,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
 ) -> pd.DataFrame:
     """
     Get a query by id, and return it as a dataframe
@@ -343,6 +499,25 @@ def get_result_by_query_id(
     disable_progress : bool, default None
         Set to True to disable progress bar display entirely, None to disable on
         non-TTY, or False to always enable
+    filetype : {"arrow", "json"}, default "arrow"
+        Format to fetch the result in. Arrow results are smaller, and keep
+        the column types, so are faster to fetch and decode.
+    columns : list of str, optional
+        Names of the columns of the result to get (default: all)
+    filters : dict, optional
+        Only get rows which have these values in these columns, e.g.
+        `{"pcod": "NPL.1.1_1"}`
+    order_by : list of str, optional
+        Columns to order the rows by
+    after : list, optional
+        Only get rows which come after these values of the `order_by` columns.
+        Pass the `order_by` values of the last row of one page of results to get
+        the next page; the `order_by` columns must uniquely identify each row.
+    limit : int, optional
+        Maximum number of rows to get
+    offset : int, optional
+        Number of rows to skip. If `limit` or `offset` is given without
+        `order_by`, rows are ordered by all the columns.
 
     Returns
     -------
@@ -350,13 +525,31 @@ def get_result_by_query_id(
         Dataframe containing the result
 
     """
+    if filetype not in ("arrow", "json"):
+        raise ValueError(
+            f"Invalid filetype: '{filetype}'. Expected one of {{'arrow', 'json'}}."
+        )
     result_endpoint = get_result_location_from_id_when_ready(
         connection=connection,
         query_id=query_id,
         poll_interval=poll_interval,
         disable_progress=disable_progress,
     )
-    return get_json_dataframe(connection=connection, location=result_endpoint)
+    query_string = result_selection_query_string(
+        columns=columns,
+        filters=filters,
+        order_by=order_by,
+        after=after,
+        limit=limit,
+        offset=offset,
+    )
+    if filetype == "arrow":
+        return get_arrow_dataframe(
+            connection=connection, location=f"{result_endpoint}.arrow{query_string}"
+        )
+    return get_json_dataframe(
+        connection=connection, location=f"{result_endpoint}{query_string}"
+    )
 
 
 def get_geojson_result(
@@ -396,6 +589,13 @@ def get_result(
     connection: Connection,
     query_spec: dict,
     disable_progress: Optional[bool] = None,
+    filetype: str = "arrow",
+    columns: Optional[List[str]] = None,
+    filters: Optional[dict] = None,
+    order_by: Optional[List[str]] = None,
+    after: Optional[list] = None,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
 ) -> pd.DataFrame:
     """
     Run and retrieve a query of a specified kind with parameters.
@@ -409,6 +609,25 @@ def get_result(
     disable_progress : bool, default None
         Set to True to disable progress bar display entirely, None to disable on
         non-TTY, or False to always enable
+    filetype : {"arrow", "json"}, default "arrow"
+        Format to fetch the result in. Arrow results are smaller, and keep
+        the column types, so are faster to fetch and decode.
+    columns : list of str, optional
+        Names of the columns of the result to get (default: all)
+    filters : dict, optional
+        Only get rows which have these values in these columns, e.g.
+        `{"pcod": "NPL.1.1_1"}`
+    order_by : list of str, optional
+        Columns to order the rows by
+    after : list, optional
+        Only get rows which come after these values of the `order_by` columns.
+        Pass the `order_by` values of the last row of one page of results to get
+        the next page; the `order_by` columns must uniquely identify each row.
+    limit : int, optional
+        Maximum number of rows to get
+    offset : int, optional
+        Number of rows to skip. If `limit` or `offset` is given without
+        `order_by`, rows are ordered by all the columns.
 
     Returns
     -------
@@ -420,6 +639,13 @@ def get_result(
         connection=connection,
         query_id=run_query(connection=connection, query_spec=query_spec),
         disable_progress=disable_progress,
+        filetype=filetype,
+        columns=columns,
+        filters=filters,
+        order_by=order_by,
+        after=after,
+        limit=limit,
+        offset=offset,
     )
 
 
@@ -115,6 +115,54 @@ class Connection:
             error_msg = f"Unable to connect to FlowKit API at {self.url}: {e}"
             logger.info(error_msg)
             raise FlowclientConnectionError(error_msg)
+        return self._check_get_response(route=route, response=response)
+
+    def post_json(self, *, route: str, data: dict) -> requests.Response:
+        """
+        Attempt to post json to the API, and return the raw
+        response object if an error response wasn't received.
+        If an error response was received, raises an error.
+
+        Parameters
+        ----------
+        route : str
+            Path relative to API host to post_json to
+        data: dict
+            Dictionary of json-encodeable data to post_json
+
+        Returns
+        -------
+        requests.Response
+
+        """
+        logger.debug(f"Posting {data} to {self.url}/api/{self.api_version}/{route}")
+        try:
+            response = self.session.post(
+                f"{self.url}/api/{self.api_version}/{route}", json=data
+            )
+        except ConnectionError as e:
+            error_msg = f"Unable to connect to FlowKit API at {self.url}: {e}"
+            logger.info(error_msg)
+            raise FlowclientConnectionError(error_msg)
+        return self._check_post_response(route=route, response=response)
+
+    def _check_get_response(self, *, route: str, response):
+        """
+        Return the response to a GET request if it isn't an error response,
+        otherwise raise an appropriate error.
+
+        Parameters
+        ----------
+        route : str
+            Path relative to API host the request was made to
+        response : requests.Response or httpx.Response
+            Response to check
+
+        Returns
+        -------
+        requests.Response or httpx.Response
+            The response
+        """
         if response.status_code in {202, 200, 303}:
             return response
         elif response.status_code == 404:
@@ -140,33 +188,23 @@ class Connection:
                 f"Something went wrong: {error}. API returned with status code: {response.status_code} and status '{status}'"
             )
 
-    def post_json(self, *, route: str, data: dict) -> requests.Response:
+    def _check_post_response(self, *, route: str, response):
         """
-        Attempt to post json to the API, and return the raw
-        response object if an error response wasn't received.
-        If an error response was received, raises an error.
+        Return the response to a POST request if it isn't an error response,
+        otherwise raise an appropriate error.
 
         Parameters
         ----------
         route : str
-            Path relative to API host to post_json to
-        data: dict
-            Dictionary of json-encodeable data to post_json
+            Path relative to API host the request was made to
+        response : requests.Response or httpx.Response
+            Response to check
 
         Returns
         -------
-        requests.Response
-
+        requests.Response or httpx.Response
+            The response
         """
-        logger.debug(f"Posting {data} to {self.url}/api/{self.api_version}/{route}")
-        try:
-            response = self.session.post(
-                f"{self.url}/api/{self.api_version}/{route}", json=data
-            )
-        except ConnectionError as e:
-            error_msg = f"Unable to connect to FlowKit API at {self.url}: {e}"
-            logger.info(error_msg)
-            raise FlowclientConnectionError(error_msg)
         if response.status_code == 202:
             return response
         elif response.status_code == 404:
@@ -40,14 +40,16 @@ setup(
     include_package_data=True,
     install_requires=[
         "pandas",
+        "pyarrow",
         "requests",
+        "httpx",
         "pyjwt",
         "ujson",
         "merge-args",
         "tqdm",
         "ipywidgets",
     ],
-    extras_require={"test": test_requirements},
+    extras_require={"test": test_requirements, "http2": ["httpx[http2]"]},
     tests_require=test_requirements,
     setup_requires=["pytest-runner"],
     platforms=["MacOS X", "Linux"],
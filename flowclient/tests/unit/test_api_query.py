@@ -137,6 +137,36 @@ def test_query_get_result_pandas(monkeypatch, format, function):
     )
 
 
+def test_query_get_result_page(monkeypatch):
+    """
+    Test that getting a page of a result requests the right rows and columns.
+    """
+    get_result_mock = Mock(return_value="DUMMY_RESULT")
+    monkeypatch.setattr(f"flowclient.api_query.get_result_by_query_id", get_result_mock)
+    query = APIQuery(connection="DUMMY_CONNECTION", parameters={})
+    query._query_id = "DUMMY_ID"
+    query.get_result(columns=["pcod"], filters={"pcod": "X"}, page=2, page_size=10)
+    get_result_mock.assert_called_once_with(
+        connection="DUMMY_CONNECTION",
+        query_id="DUMMY_ID",
+        poll_interval=1,
+        disable_progress=None,
+        columns=["pcod"],
+        filters={"pcod": "X"},
+        limit=10,
+        offset=20,
+    )
+
+
+def test_query_get_result_geojson_selection_raises():
+    """
+    Test that get_result raises an error for selecting part of a geojson result.
+    """
+    query = APIQuery(connection="DUMMY_CONNECTION", parameters={})
+    with pytest.raises(ValueError, match="only supported for the 'pandas' format"):
+        query.get_result(format="geojson", columns=["pcod"])
+
+
 def test_query_get_result_runs(monkeypatch):
     """
     Test that get_result runs the query if it's not already running.
@@ -5,6 +5,7 @@ from unittest.mock import Mock
 
 from asynctest import Mock as AMock, CoroutineMock
 
+import pyarrow as pa
 import pytest
 
 from flowclient.async_client import (
@@ -12,6 +13,7 @@ from flowclient.async_client import (
     get_geography,
     get_status,
     get_json_dataframe,
+    get_arrow_dataframe,
     get_geojson_result_by_query_id,
     run_query,
     get_available_dates,
@@ -59,6 +61,15 @@ async def test_query_ready_raises():
         await query_is_ready(connection=con_mock, query_id="foo")
 
 
+@pytest.mark.asyncio
+async def test_query_ready_asks_server_to_wait():
+    """ Test that the time to wait for a status change is sent to the server. """
+    con_mock = AMock()
+    con_mock.get_url = CoroutineMock(return_value=AMock(status_code=303))
+    await query_is_ready(connection=con_mock, query_id="foo", wait=10)
+    con_mock.get_url.assert_called_once_with(route="poll/foo?wait=10")
+
+
 @pytest.mark.asyncio
 async def test_run_query_raises():
     con_mock = AMock()
@@ -236,6 +247,36 @@ async def test_get_json_dataframe_raises():
         await get_json_dataframe(connection=con_mock, location="foo")
 
 
+@pytest.mark.asyncio
+async def test_get_arrow_dataframe():
+    """ Test that get_arrow_dataframe decodes an Arrow stream. """
+    stream = pa.BufferOutputStream()
+    table = pa.table({"0": [1]})
+    with pa.ipc.new_stream(stream, table.schema) as writer:
+        writer.write_table(table)
+    con_mock = AMock()
+    con_mock.get_url = CoroutineMock(
+        return_value=Mock(status_code=200, content=stream.getvalue().to_pybytes())
+    )
+    assert (
+        await get_arrow_dataframe(connection=con_mock, location="foo.arrow")
+    ).values.tolist() == [[1]]
+    con_mock.get_url.assert_called_once_with(route="foo.arrow")
+
+
+@pytest.mark.asyncio
+async def test_get_arrow_dataframe_raises():
+    """ Test that get_arrow_dataframe raises an error. """
+    con_mock = AMock()
+    con_mock.get_url = CoroutineMock(
+        return_value=Mock(
+            status_code=500, json=Mock(return_value=dict(msg="DUMMY_ERROR"))
+        )
+    )
+    with pytest.raises(FlowclientConnectionError, match=r".*Reason: DUMMY_ERROR"):
+        await get_arrow_dataframe(connection=con_mock, location="foo")
+
+
 @pytest.mark.asyncio
 async def test_get_geojson_result_by_query_id_raises(monkeypatch):
     """ Test that get_geojson_result_by_query_id raises an error. """
@@ -344,7 +385,7 @@ async def test_get_result():
         ]
     )
     assert (
-        await get_result(connection=con_mock, query_spec="foo")
+        await get_result(connection=con_mock, query_spec="foo", filetype="json")
     ).values.tolist() == [[1]]
 
 
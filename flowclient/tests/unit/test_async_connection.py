@@ -2,29 +2,120 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-from unittest.mock import Mock
+import asyncio
 
+import httpx
 import pytest
 
 from flowclient import ASyncConnection
+from flowclient.errors import FlowclientConnectionError
+
+
+def mock_transport(con, handler):
+    """
+    Make the connection send its requests to a handler function instead of a server.
+    """
+    con._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    con._request_slots = asyncio.Semaphore(con.max_concurrent_requests)
 
 
 @pytest.mark.asyncio
-async def test_get_url(monkeypatch, token):
-    monkeypatch.setattr(
-        "flowclient.connection.Connection.get_url", Mock(return_value="DUMMY_RETURN")
-    )
-    con = ASyncConnection(url="DUMMY_URL", token=token)
-    assert await con.get_url(route="DUMMY_ROUTE", data="DUMMY_DATA")
+async def test_get_url(token):
+    """
+    Test that get_url sends an authenticated GET request and returns the response.
+    """
+
+    def handler(request):
+        assert request.method == "GET"
+        assert request.url == "http://DUMMY_URL/api/0/DUMMY_ROUTE"
+        assert request.headers["Authorization"] == f"Bearer {token}"
+        return httpx.Response(200, json={"DUMMY": "RETURN"})
+
+    con = ASyncConnection(url="http://DUMMY_URL", token=token)
+    mock_transport(con, handler)
+    response = await con.get_url(route="DUMMY_ROUTE", data={"DUMMY": "DATA"})
+    assert response.json() == {"DUMMY": "RETURN"}
 
 
 @pytest.mark.asyncio
-async def test_post_json(monkeypatch, token):
-    monkeypatch.setattr(
-        "flowclient.connection.Connection.post_json", Mock(return_value="DUMMY_RETURN")
+async def test_post_json(token):
+    """
+    Test that post_json sends the json to the API and returns the response.
+    """
+
+    def handler(request):
+        assert request.method == "POST"
+        assert request.read() == b'{"DUMMY":"DATA"}'
+        return httpx.Response(202, headers={"Location": "DUMMY_LOCATION"})
+
+    con = ASyncConnection(url="http://DUMMY_URL", token=token)
+    mock_transport(con, handler)
+    response = await con.post_json(route="DUMMY_ROUTE", data={"DUMMY": "DATA"})
+    assert response.headers["Location"] == "DUMMY_LOCATION"
+
+
+@pytest.mark.asyncio
+async def test_error_response_raises(token):
+    """
+    Test that error responses raise the same errors as for a synchronous connection.
+    """
+    con = ASyncConnection(url="http://DUMMY_URL", token=token)
+    mock_transport(con, lambda request: httpx.Response(404))
+    with pytest.raises(FileNotFoundError):
+        await con.get_url(route="DUMMY_ROUTE")
+    mock_transport(con, lambda request: httpx.Response(403, json={"msg": "DENIED"}))
+    with pytest.raises(FlowclientConnectionError, match="DENIED"):
+        await con.post_json(route="DUMMY_ROUTE", data={})
+
+
+@pytest.mark.asyncio
+async def test_connection_error_raises(token):
+    """
+    Test that failing to connect raises a FlowclientConnectionError.
+    """
+
+    def handler(request):
+        raise httpx.ConnectError("DUMMY_ERROR")
+
+    con = ASyncConnection(url="http://DUMMY_URL", token=token)
+    mock_transport(con, handler)
+    with pytest.raises(FlowclientConnectionError, match="Unable to connect"):
+        await con.get_url(route="DUMMY_ROUTE")
+
+
+@pytest.mark.asyncio
+async def test_requests_overlap_up_to_limit(token):
+    """
+    Test that concurrent requests are in flight at the same time, up to the limit.
+    """
+    in_flight = 0
+    max_in_flight = 0
+
+    async def handler(request):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(in_flight, max_in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return httpx.Response(200)
+
+    con = ASyncConnection(
+        url="http://DUMMY_URL", token=token, max_concurrent_requests=3
     )
-    con = ASyncConnection(url="DUMMY_URL", token=token)
-    assert await con.post_json(route="DUMMY_ROUTE", data="DUMMY_DATA")
+    mock_transport(con, handler)
+    await asyncio.gather(*[con.get_url(route="DUMMY_ROUTE") for _ in range(10)])
+    assert max_in_flight == 3
+
+
+@pytest.mark.asyncio
+async def test_close(token):
+    """
+    Test that closing the connection closes the HTTP client.
+    """
+    async with ASyncConnection(url="http://DUMMY_URL", token=token) as con:
+        client = con.client
+    assert client.is_closed
+    assert con._client is None
 
 
 def test_make_query_object(monkeypatch, token):
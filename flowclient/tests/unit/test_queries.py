@@ -4,6 +4,7 @@
 
 from unittest.mock import Mock, PropertyMock, MagicMock, call
 
+import pyarrow as pa
 import pytest
 import flowclient
 import flowclient.client
@@ -11,6 +12,9 @@ from flowclient.client import (
     get_result_by_query_id,
     get_result,
     query_is_ready,
+    read_arrow_stream,
+    result_selection_query_string,
+    wait_for_query_to_be_ready,
 )
 from flowclient.errors import FlowclientConnectionError
 from flowclient import Connection
@@ -31,7 +35,16 @@ def test_get_result_by_params(monkeypatch, token):
     )
     # Should request the query by id
     dummy_method.assert_called_with(
-        connection=connection_mock, disable_progress=None, query_id="99"
+        connection=connection_mock,
+        disable_progress=None,
+        query_id="99",
+        filetype="arrow",
+        columns=None,
+        filters=None,
+        order_by=None,
+        after=None,
+        limit=None,
+        offset=None,
     )
 
 
@@ -49,7 +62,9 @@ def test_get_result_by_id(token):
     )
     connection_mock.get_url.return_value.headers = {"Location": "/api/0/foo/Test"}
 
-    df = get_result_by_query_id(connection=connection_mock, query_id="99")
+    df = get_result_by_query_id(
+        connection=connection_mock, query_id="99", filetype="json"
+    )
 
     # Query id should be requested
     assert call(route="poll/99") in connection_mock.get_url.call_args_list
@@ -61,6 +76,105 @@ def test_get_result_by_id(token):
     assert "foo" == df.name[0]
 
 
+def test_get_result_by_id_arrow(token):
+    """
+    Test requesting a query by id fetches and decodes the result as Arrow by default.
+    """
+    stream = pa.BufferOutputStream()
+    table = pa.table({"name": ["foo", "bar"], "value": [1.5, 2.0]})
+    with pa.ipc.new_stream(stream, table.schema) as writer:
+        writer.write_table(table)
+    connection_mock = Mock()
+    connection_mock.get_url.return_value.content = stream.getvalue().to_pybytes()
+    type(connection_mock.get_url.return_value).status_code = PropertyMock(
+        side_effect=(303, 200)
+    )
+    connection_mock.get_url.return_value.headers = {"Location": "/api/0/foo/Test"}
+
+    df = get_result_by_query_id(connection=connection_mock, query_id="99")
+
+    assert call(route="foo/Test.arrow") in connection_mock.get_url.call_args_list
+    assert ["foo", "bar"] == df.name.tolist()
+    assert "float64" == df.value.dtype
+
+
+@pytest.mark.parametrize("cut", [8, 20])
+def test_truncated_arrow_stream_raises(cut):
+    """
+    Test that an Arrow stream which ends before its end-of-stream marker raises an error.
+    """
+    stream = pa.BufferOutputStream()
+    table = pa.table({"value": list(range(10))})
+    with pa.ipc.new_stream(stream, table.schema) as writer:
+        writer.write_table(table.slice(0, 5))
+        writer.write_table(table.slice(5))
+    data = stream.getvalue().to_pybytes()
+    assert read_arrow_stream(data).value.tolist() == list(range(10))
+    with pytest.raises(FlowclientConnectionError, match="ended unexpectedly"):
+        read_arrow_stream(data[:-cut])
+
+
+@pytest.mark.parametrize(
+    "selection, expected",
+    [
+        ({}, ""),
+        ({"columns": ["pcod", "value"]}, "?columns=pcod%2Cvalue"),
+        (
+            {"filters": {"pcod": "NPL.1.1_1"}},
+            "?filters=%7B%22pcod%22%3A+%22NPL.1.1_1%22%7D",
+        ),
+        (
+            {"order_by": ["pcod"], "after": ["NPL.1.1_1"], "limit": 10},
+            "?order_by=pcod&after=%5B%22NPL.1.1_1%22%5D&limit=10",
+        ),
+        ({"limit": 10, "offset": 20}, "?limit=10&offset=20"),
+    ],
+)
+def test_result_selection_query_string(selection, expected):
+    """
+    Test that the part of a result to get is encoded in a query string.
+    """
+    assert result_selection_query_string(**selection) == expected
+
+
+def test_get_result_by_id_with_selection(token):
+    """
+    Test requesting part of a query result requests it with a query string.
+    """
+    connection_mock = Mock()
+    connection_mock.get_url.return_value.json.return_value = {
+        "query_id": "99",
+        "query_result": [{"name": "foo"}],
+    }
+    type(connection_mock.get_url.return_value).status_code = PropertyMock(
+        side_effect=(303, 200)
+    )
+    connection_mock.get_url.return_value.headers = {"Location": "/api/0/foo/Test"}
+
+    get_result_by_query_id(
+        connection=connection_mock,
+        query_id="99",
+        filetype="json",
+        columns=["name"],
+        limit=1,
+    )
+
+    assert (
+        call(route="foo/Test?columns=name&limit=1")
+        in connection_mock.get_url.call_args_list
+    )
+
+
+def test_get_result_by_id_invalid_filetype():
+    """
+    Test that an unsupported filetype raises a ValueError.
+    """
+    with pytest.raises(ValueError, match="Invalid filetype"):
+        get_result_by_query_id(
+            connection="placeholder", query_id="99", filetype="geojson"
+        )
+
+
 @pytest.mark.parametrize("http_code", [401, 404, 418, 400])
 def test_get_result_by_id_error(monkeypatch, http_code, token):
     """
@@ -81,7 +195,7 @@ def test_get_result_by_id_error(monkeypatch, http_code, token):
         match=f"Could not get result. API returned with status code: {http_code}. Reason: MESSAGE",
     ):
         get_result_by_query_id(connection=connection_mock, query_id="99")
-    assert call(route="DUMMY_LOCATION") in connection_mock.get_url.call_args_list
+    assert call(route="DUMMY_LOCATION.arrow") in connection_mock.get_url.call_args_list
 
 
 def test_get_result_by_id_poll_loop(monkeypatch):
@@ -108,3 +222,21 @@ def test_get_result_by_id_poll_loop(monkeypatch):
         get_result_by_query_id(connection="placeholder", query_id="99")
 
     assert 2 == ready_mock.call_count
+
+
+def test_wait_for_query_to_be_ready_long_polls(monkeypatch):
+    """
+    Test that waiting for a query asks the server to wait for the query's status to change.
+    """
+    reply_mock = Mock(
+        json=Mock(return_value=dict(progress=dict(eligible=1, running=1, queued=0)))
+    )
+    ready_mock = Mock(side_effect=[(False, reply_mock), (True, reply_mock)])
+    monkeypatch.setattr("flowclient.client.query_is_ready", ready_mock)
+    wait_for_query_to_be_ready(
+        connection="placeholder", query_id="99", poll_interval=0, wait=5
+    )
+    assert ready_mock.call_args_list == [
+        call(connection="placeholder", query_id="99"),
+        call(connection="placeholder", query_id="99", wait=5),
+    ]
@@ -36,3 +36,11 @@ def test_query_ready_raises():
     con_mock.get_url.return_value = Mock(status_code=999)
     with pytest.raises(FlowclientConnectionError):
         query_is_ready(connection=con_mock, query_id="foo")
+
+
+def test_query_ready_asks_server_to_wait():
+    """ Test that the time to wait for a status change is sent to the server. """
+    con_mock = Mock()
+    con_mock.get_url.return_value = Mock(status_code=303)
+    query_is_ready(connection=con_mock, query_id="foo", wait=10)
+    con_mock.get_url.assert_called_once_with(route="poll/foo?wait=10")
@@ -26,8 +26,12 @@ CREATE TABLE IF NOT EXISTS cache.cached
                                 schema CHARACTER VARYING,
                                 tablename CHARACTER VARYING,
                                 obj BYTEA,
+                                table_size BIGINT,
+                                cache_score DOUBLE PRECISION,
                                 CONSTRAINT cache_pkey PRIMARY KEY (query_id)
                             );
+/* Size and score are maintained by the cache_record_update trigger, and indexed so eviction candidates can be found without scanning every cache table */
+CREATE INDEX IF NOT EXISTS cached_cache_score_idx ON cache.cached (cache_score);
 /* Sequence counting total number of retrievals from cache */
 CREATE SEQUENCE cache.cache_touches START 1;
 CREATE TABLE IF NOT EXISTS cache.dependencies
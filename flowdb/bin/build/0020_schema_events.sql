@@ -30,6 +30,18 @@ cause a great toll to the ingestion process. IDs are not
 mandatory, but a number of features created by `flowmachine`
 require this field.
 
+Each table is partitioned by day on `datetime`. The rows for
+a day are held in a partition named `<table>_YYYYMMDD`,
+which is attached by the ETL process once the day has been
+loaded:
+
+    ALTER TABLE events.calls ATTACH PARTITION events.calls_20160101
+        FOR VALUES FROM ('2016-01-01') TO ('2016-01-02');
+
+Queries filtering on `datetime` only scan the partitions for
+the days they need, and per-day aggregates can be computed
+separately for each partition (`enable_partitionwise_aggregate`).
+
 -----------------------------------------------------------
 */
 CREATE SCHEMA IF NOT EXISTS events;
@@ -57,7 +69,7 @@ CREATE SCHEMA IF NOT EXISTS events;
         operator_code NUMERIC,
         country_code NUMERIC
 
-        );
+        ) PARTITION BY RANGE (datetime);
 
     CREATE TABLE IF NOT EXISTS events.forwards(
 
@@ -80,7 +92,7 @@ CREATE SCHEMA IF NOT EXISTS events;
         operator_code NUMERIC,
         country_code NUMERIC
 
-        );
+        ) PARTITION BY RANGE (datetime);
 
     CREATE TABLE IF NOT EXISTS events.sms(
 
@@ -101,7 +113,7 @@ CREATE SCHEMA IF NOT EXISTS events;
         operator_code NUMERIC,
         country_code NUMERIC
 
-        );
+        ) PARTITION BY RANGE (datetime);
 
     CREATE TABLE IF NOT EXISTS events.mds(
 
@@ -124,7 +136,7 @@ CREATE SCHEMA IF NOT EXISTS events;
         operator_code NUMERIC,
         country_code NUMERIC
 
-        );
+        ) PARTITION BY RANGE (datetime);
 
     CREATE TABLE IF NOT EXISTS events.topups(
 
@@ -149,4 +161,4 @@ CREATE SCHEMA IF NOT EXISTS events;
         operator_code NUMERIC,
         country_code NUMERIC
 
-        );
+        ) PARTITION BY RANGE (datetime);
@@ -9,7 +9,8 @@ file, You can obtain one at http://mozilla.org/MPL/2.0/.
  -------------
 
  Adds bookkeeping tables to track what is available for use by flowmachine, based
- on the root tables under the events schema.
+ on the root tables under the events schema (i.e. the tables which
+ are not partitions or children of other tables).
  Should be updated when ingestion occurs.
 */
 
@@ -21,16 +22,16 @@ BEGIN;
         has_counterparts BOOL DEFAULT False
     );
     INSERT INTO available_tables (table_name)
-        (SELECT tablename 
-            FROM pg_tables 
+        (SELECT relname
+            FROM pg_class
+            JOIN pg_namespace ON pg_namespace.oid = relnamespace
                WHERE NOT EXISTS (
-                SELECT c.relname AS child
-                FROM
-                    pg_inherits JOIN pg_class AS c ON (inhrelid=c.oid)
-                    JOIN pg_class as p ON (inhparent=p.oid)
-                    WHERE c.relname=tablename
+                SELECT inhrelid
+                FROM pg_inherits
+                    WHERE inhrelid=pg_class.oid
                     ) AND
-                schemaname='events')
+                relkind IN ('r', 'p') AND
+                nspname='events')
           ON CONFLICT (table_name)
           DO NOTHING;
 END;
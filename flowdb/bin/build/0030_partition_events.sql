@@ -0,0 +1,94 @@
+/*
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+*/
+
+/*
+PARTITIONING EVENTS TABLES ---------------------------------
+
+Older versions of FlowDB created the events tables as plain
+parent tables, with a child table for each day of data which
+inherited from the parent. The events tables are now
+partitioned by day (see 0020_schema_events.sql).
+
+  - partition_events_table(events_table):
+        Converts an events table which uses inheritance to a
+        table partitioned by day on `datetime`. Each child table
+        named `<events_table>_YYYYMMDD` is attached as the
+        partition for that day, and any rows held in the parent
+        table itself are moved to the partitions. Does nothing if
+        the table is already partitioned.
+
+To migrate an existing database, run this file and then call
+the function for each events table, e.g.
+
+    SELECT partition_events_table('calls');
+
+The migration runs in a single transaction, so if it fails (for
+example because a child table isn't named for a day, has extra
+columns, or holds rows outside its day) nothing is changed.
+Adding a CHECK constraint on `datetime` matching its day to each
+child table beforehand avoids scanning it when it is attached.
+
+-----------------------------------------------------------
+*/
+
+CREATE OR REPLACE FUNCTION partition_events_table(IN events_table TEXT)
+    RETURNS VOID AS
+$$
+DECLARE
+    inherited_name TEXT := events_table || '_inherited';
+    child RECORD;
+    table_grant RECORD;
+    child_date DATE;
+BEGIN
+    IF (SELECT relkind FROM pg_class
+            WHERE oid = format('events.%I', events_table)::regclass) = 'p' THEN
+        RAISE NOTICE 'events.% is already partitioned.', events_table;
+        RETURN;
+    END IF;
+
+    EXECUTE format('ALTER TABLE events.%I RENAME TO %I', events_table, inherited_name);
+    EXECUTE format(
+        'CREATE TABLE events.%I (LIKE events.%I INCLUDING ALL) PARTITION BY RANGE (datetime)',
+        events_table, inherited_name
+    );
+    FOR table_grant IN
+        SELECT grantee, privilege_type FROM information_schema.role_table_grants
+            WHERE table_schema = 'events' AND table_name = inherited_name
+                AND grantee <> current_user
+    LOOP
+        EXECUTE format(
+            'GRANT %s ON events.%I TO %s', table_grant.privilege_type, events_table,
+            CASE WHEN table_grant.grantee = 'PUBLIC' THEN 'PUBLIC' ELSE quote_ident(table_grant.grantee) END
+        );
+    END LOOP;
+
+    FOR child IN
+        SELECT nspname, relname FROM pg_inherits
+            JOIN pg_class ON pg_class.oid = inhrelid
+            JOIN pg_namespace ON pg_namespace.oid = relnamespace
+            WHERE inhparent = format('events.%I', inherited_name)::regclass
+    LOOP
+        IF child.relname !~ ('^' || events_table || '_[0-9]{8}$') THEN
+            RAISE EXCEPTION 'Cannot tell which day %.% holds.', child.nspname, child.relname
+                USING HINT = format('Rename it to %s_YYYYMMDD, or drop it.', events_table);
+        END IF;
+        child_date := to_date(right(child.relname, 8), 'YYYYMMDD');
+        EXECUTE format(
+            'ALTER TABLE %I.%I NO INHERIT events.%I', child.nspname, child.relname, inherited_name
+        );
+        EXECUTE format(
+            'ALTER TABLE events.%I ATTACH PARTITION %I.%I FOR VALUES FROM (%L) TO (%L)',
+            events_table, child.nspname, child.relname, child_date, child_date + 1
+        );
+    END LOOP;
+
+    EXECUTE format(
+        'INSERT INTO events.%I SELECT * FROM ONLY events.%I', events_table, inherited_name
+    );
+    EXECUTE format('DROP TABLE events.%I', inherited_name);
+    EXECUTE format('ANALYZE events.%I', events_table);
+END;
+$$ LANGUAGE plpgsql;
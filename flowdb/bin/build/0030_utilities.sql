@@ -271,7 +271,8 @@ SET search_path = public, pg_temp;
 ### touch_cache ###
 
 Update the cache score, access count and most recent access time of a cached query and return
-the new cache score, or raise an error if no cached query with that id exists.
+the new cache score, or raise an error if no cached query with that id exists. The stored
+cache score is updated by the cache_record_update trigger.
 
 ***********************************/
 
@@ -285,7 +286,7 @@ $$
           cache_score_multiplier+POWER(1 + ln(2) / cache_half_life(), nextval('cache.cache_touches') - 2)
         END
         WHERE query_id=cached_query_id
-        RETURNING cache_score(cache_score_multiplier, compute_time, greatest(table_size(tablename, schema), 0.00001)) INTO score;
+        RETURNING cache_score INTO score;
         IF NOT FOUND THEN RAISE EXCEPTION 'Cache record % not found', cached_query_id;
         END IF;
   RETURN score;
@@ -311,6 +312,32 @@ $$ LANGUAGE plpgsql
 SECURITY DEFINER
 SET search_path = public, pg_temp;
 
+/*********************************
+### cache_record_update ###
+
+Trigger function which keeps the table_size and cache_score columns of cache.cached up to date
+whenever a cache record is written or touched. The size of a cache table is only looked up
+once, because cache tables do not change after they are written.
+
+***********************************/
+
+CREATE OR REPLACE FUNCTION cache_record_update()
+	RETURNS trigger AS
+$$
+  BEGIN
+  IF NEW.table_size IS NULL THEN
+    NEW.table_size := table_size(NEW.tablename, NEW.schema);
+  END IF;
+  NEW.cache_score := cache_score(NEW.cache_score_multiplier, NEW.compute_time, greatest(NEW.table_size, 0.00001));
+  RETURN NEW;
+  END
+$$ LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp;
+
+CREATE TRIGGER cache_record_update BEFORE INSERT OR UPDATE ON cache.cached
+    FOR EACH ROW EXECUTE PROCEDURE cache_record_update();
+
 /*
 cache_protected_period
 
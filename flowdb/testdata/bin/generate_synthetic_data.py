@@ -225,10 +225,10 @@ def write_day_csv(subscribers, cells, date, num_calls, call_seed, output_root_di
 
     ingest_sql = """
             CREATE TABLE IF NOT EXISTS events.calls_{table} (
+                    LIKE events.calls,
                     CHECK ( datetime >= '{table}'::TIMESTAMPTZ
                     AND datetime < '{end_date}'::TIMESTAMPTZ)
-                ) INHERITS (events.calls);
-                ALTER TABLE events.calls_{table} NO INHERIT events.calls;
+                );
 
                 COPY events.calls_{table}( datetime,msisdn_counterpart,id,msisdn,location_id,outgoing,duration,tac )
                     FROM '{output_root_dir}/data/records/calls/calls_{table}.csv'
@@ -242,7 +242,8 @@ def write_day_csv(subscribers, cells, date, num_calls, call_seed, output_root_di
             CREATE INDEX ON events.calls_{table} (datetime);
             CLUSTER events.calls_{table} USING calls_{table}_msisdn_idx;
             ANALYZE events.calls_{table};
-            ALTER TABLE events.calls_{table} INHERIT events.calls;""".format(
+            ALTER TABLE events.calls ATTACH PARTITION events.calls_{table}
+                FOR VALUES FROM ('{table}') TO ('{end_date}');""".format(
         output_root_dir=output_root_dir,
         table=date.strftime("%Y%m%d"),
         end_date=(date + datetime.timedelta(days=1)).strftime("%Y%m%d"),
@@ -9,6 +9,15 @@ Tests for the database partitioning system.
 
 import pytest
 import datetime as dt
+import psycopg2 as pg
+
+
+def relation_names(plan):
+    """Names of the tables scanned by a query plan (from EXPLAIN (FORMAT JSON))."""
+    names = {plan["Relation Name"]} if "Relation Name" in plan else set()
+    for subplan in plan.get("Plans", []):
+        names |= relation_names(subplan)
+    return names
 
 
 @pytest.fixture
@@ -23,12 +32,9 @@ def test_tables():
     dates = [dt.date(2017, 1, 1) + dt.timedelta(days=i) for i in range(10)]
     tables = {
         f"events.calls_{d.strftime('%Y%m%d')}": f"""
-            CREATE TABLE IF NOT EXISTS events.calls_{d.strftime('%Y%m%d')} (
-                        CHECK (
-                            datetime >= '{d.strftime('%Y%m%d')}'::timestamptz AND
-                            datetime < '{(d + dt.timedelta(days=1)).strftime('%Y%m%d')}'::timestamptz
-                            )
-                    ) INHERITS (events.calls);
+            CREATE TABLE IF NOT EXISTS events.calls_{d.strftime('%Y%m%d')}
+                PARTITION OF events.calls
+                FOR VALUES FROM ('{d.strftime('%Y%m%d')}') TO ('{(d + dt.timedelta(days=1)).strftime('%Y%m%d')}');
             """
         for d in dates
     }
@@ -52,10 +58,10 @@ def test_native_partitions(cursor, test_tables):
         """
     cursor.execute(sql)
     result = list(cursor.fetchall())[0]
-    for plan in result["QUERY PLAN"][0]["Plan"]["Plans"][0]["Plans"]:
-        assert not plan["Relation Name"] in [
-            s.replace("events.", "") for s in excluded_tables
-        ]
+    scanned_tables = relation_names(result["QUERY PLAN"][0]["Plan"])
+    assert "calls_20170104" in scanned_tables
+    for table in excluded_tables:
+        assert table.replace("events.", "") not in scanned_tables
 
 
 @pytest.mark.usefixtures("create_test_tables")
@@ -72,3 +78,81 @@ def test_dml_parallel(db_conn, cursor):
     result = list(cursor.fetchall())[0]
     for plan in result["QUERY PLAN"][0]["Plan"]["Plans"][0]["Plans"]:
         assert plan["Parallel Aware"] == True
+
+
+@pytest.mark.usefixtures("create_test_tables")
+def test_partitionwise_aggregate(cursor):
+    """Per-day aggregates are computed separately for each partition."""
+
+    sql = """
+        EXPLAIN (FORMAT JSON)
+            SELECT datetime, count(*)
+            FROM events.calls
+                WHERE datetime >= '2017-01-04'::timestamptz AND
+                      datetime < '2017-01-06'::timestamptz
+            GROUP BY datetime;
+        """
+    cursor.execute(sql)
+    result = list(cursor.fetchall())[0]
+    plan = result["QUERY PLAN"][0]["Plan"]
+    assert plan["Node Type"] == "Append"
+    assert relation_names(plan) == {"calls_20170104", "calls_20170105"}
+
+
+def test_migrate_inherited_table(cursor):
+    """An events table using inheritance can be converted to a partitioned table."""
+
+    cursor.execute(
+        """
+        CREATE TABLE events.migration_test (datetime TIMESTAMPTZ NOT NULL, msisdn TEXT);
+        CREATE TABLE events.migration_test_20170101 (
+            CHECK ( datetime >= '20170101'::TIMESTAMPTZ
+                AND datetime < '20170102'::TIMESTAMPTZ)
+            ) INHERITS (events.migration_test);
+        CREATE TABLE events.migration_test_20170102 () INHERITS (events.migration_test);
+        INSERT INTO events.migration_test_20170101 VALUES ('2017-01-01 12:00:00', 'A');
+        INSERT INTO events.migration_test_20170102 VALUES ('2017-01-02 12:00:00', 'B');
+        INSERT INTO events.migration_test VALUES ('2017-01-02 13:00:00', 'C');
+        SELECT partition_events_table('migration_test');
+        """
+    )
+    cursor.execute(
+        "SELECT relkind FROM pg_class WHERE oid='events.migration_test'::regclass"
+    )
+    assert cursor.fetchone()["relkind"] == "p"
+    cursor.execute(
+        """
+        SELECT tableoid::regclass::text AS partition, msisdn
+            FROM events.migration_test ORDER BY msisdn
+        """
+    )
+    assert [(row["partition"], row["msisdn"]) for row in cursor.fetchall()] == [
+        ("events.migration_test_20170101", "A"),
+        ("events.migration_test_20170102", "B"),
+        ("events.migration_test_20170102", "C"),
+    ]
+    cursor.execute(
+        "SELECT count(*) FROM pg_class WHERE relname='migration_test_inherited'"
+    )
+    assert cursor.fetchone()["count"] == 0
+
+
+def test_migrate_rejects_undated_children(cursor):
+    """Migrating an events table fails, leaving it unchanged, if a child table is not named for a day."""
+
+    cursor.execute(
+        """
+        CREATE TABLE events.migration_test (datetime TIMESTAMPTZ NOT NULL, msisdn TEXT);
+        CREATE TABLE events.migration_test_extra () INHERITS (events.migration_test);
+        SAVEPOINT before_migration;
+        """
+    )
+    with pytest.raises(pg.errors.RaiseException):
+        cursor.execute("SELECT partition_events_table('migration_test')")
+    cursor.execute(
+        """
+        ROLLBACK TO SAVEPOINT before_migration;
+        SELECT relkind FROM pg_class WHERE oid='events.migration_test'::regclass
+        """
+    )
+    assert cursor.fetchone()["relkind"] == "r"
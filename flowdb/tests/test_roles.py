@@ -30,8 +30,9 @@ def test_tables(env):
     tables = {
         "events.calls_20160101": """
             CREATE TABLE IF NOT EXISTS
-                events.calls_20160101 ()
-                INHERITS (events.calls)
+                events.calls_20160101
+                PARTITION OF events.calls
+                FOR VALUES FROM ('20160101') TO ('20160102')
             """,
         "routing.foo": """
             CREATE TABLE IF NOT EXISTS
@@ -113,7 +114,8 @@ def test_cannot_create_events(cursor):
     with pytest.raises(pg.ProgrammingError):
         cursor.execute(
             """
-            CREATE TABLE events.calls_20160102 () INHERITS (events.calls)
+            CREATE TABLE events.calls_20160102 PARTITION OF events.calls
+                FOR VALUES FROM ('20160102') TO ('20160103')
         """
         )
 
@@ -4,12 +4,23 @@
 
 from flowetl.mixins.fixed_sql_mixin import fixed_sql_operator
 
+# Parent tables which haven't been migrated to declarative partitioning
+# (see flowdb's partition_events_table function) are still inherited from.
 AttachOperator = fixed_sql_operator(
     class_name="AttachOperator",
     sql="""
         DROP TABLE IF EXISTS {{ final_table }};
         ALTER TABLE {{ extract_table }} RENAME TO {{ table_name }};
         ALTER TABLE {{ etl_schema }}.{{ table_name }} SET SCHEMA {{ final_schema }};
-        ALTER TABLE {{ final_table }} INHERIT {{ parent_table }};
+        DO $$
+        BEGIN
+            IF (SELECT relkind FROM pg_class WHERE oid = '{{ parent_table }}'::regclass) = 'p' THEN
+                ALTER TABLE {{ parent_table }} ATTACH PARTITION {{ final_table }}
+                    FOR VALUES FROM ('{{ ds }}') TO ('{{ tomorrow_ds }}');
+            ELSE
+                ALTER TABLE {{ final_table }} INHERIT {{ parent_table }};
+            END IF;
+        END
+        $$;
         """,
 )
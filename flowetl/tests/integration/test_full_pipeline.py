@@ -42,7 +42,7 @@ def test_file_pipeline(
     ).fetchall()
     assert date_present[0][0] > 0
 
-    # Check table is inherited
+    # Check table is attached as a partition
 
     exists_query = f"""SELECT EXISTS(SELECT relname 
         FROM 
@@ -54,7 +54,9 @@ def test_file_pipeline(
         WHERE 
             inhparent = 'events.calls'::regclass
         AND
-            relname = 'calls_20160301')"""
+            relname = 'calls_20160301'
+        AND
+            relispartition)"""
     assert flowdb_transaction.execute(exists_query).fetchall()[0][0]
 
     # Check table is clustered on the right field
@@ -8,12 +8,14 @@
 Functions which deal with inspecting and managing the query cache.
 """
 import asyncio
+import datetime
 import pickle
+import uuid
 from contextvars import copy_context
 from concurrent.futures import Executor, TimeoutError
 from functools import partial
 
-from typing import TYPE_CHECKING, Tuple, List, Callable, Optional
+from typing import TYPE_CHECKING, Tuple, List, Callable, Iterable, Optional
 
 from psycopg2 import InternalError
 
@@ -26,7 +28,13 @@ from flowmachine.core.errors.flowmachine_errors import (
     QueryErroredException,
     StoreFailedException,
 )
-from flowmachine.core.query_state import QueryStateMachine, QueryEvent
+from flowmachine.core.context import get_redis
+from flowmachine.core.query_state import (
+    QueryStateMachine,
+    QueryEvent,
+    stored_queries_version_key,
+)
+from flowmachine.core.sql_cache import sql_cache
 from flowmachine import __version__
 
 if TYPE_CHECKING:
@@ -37,6 +45,11 @@ import structlog
 
 logger = structlog.get_logger("flowmachine.debug", submodule=__name__)
 
+# Maximum number of cache tables to drop in one transaction when shrinking the cache.
+# Each dropped table holds several locks until the transaction commits, so this is
+# kept well within postgres' default max_locks_per_transaction.
+CACHE_REMOVAL_BATCH_SIZE = 50
+
 
 def write_query_to_cache(
     *,
@@ -75,7 +88,8 @@ def write_query_to_cache(
     schema : str, default "cache"
         Name of the schema to write to
     sleep_duration : int, default 1
-        Number of seconds to wait between polls when monitoring a query being written from elsewhere
+        Maximum number of seconds to wait for a state change notification when monitoring a
+        query being written from elsewhere
 
     Returns
     -------
@@ -102,6 +116,8 @@ def write_query_to_cache(
     current_state, this_thread_is_owner = q_state_machine.execute()
     if this_thread_is_owner:
         logger.debug(f"In charge of executing '{query.query_id}'.")
+        # Make sure we see the table as it is now, not as it was last cached
+        connection.invalidate_catalog_cache(name, schema)
         try:
             query_ddl_ops = ddl_ops_func(name, schema)
         except Exception as exc:
@@ -118,6 +134,8 @@ def write_query_to_cache(
                 q_state_machine.raise_error()
                 logger.error(f"Error executing SQL. Error was {exc}")
                 raise exc
+            finally:
+                connection.invalidate_catalog_cache(name, schema)
             if schema == "cache":
                 try:
                     write_cache_metadata(connection, query, compute_time=plan_time)
@@ -234,6 +252,95 @@ def touch_cache(connection: "Connection", query_id: str) -> float:
         raise ValueError(f"Query id '{query_id}' is not in cache on this connection.")
 
 
+def touch_cache_records(connection: "Connection", query_ids: Iterable[str]) -> None:
+    """
+    'Touch' the cache records of several queries and update their cache scores,
+    in a single round trip to the database. Queries which are not in the cache
+    are ignored.
+
+    Parameters
+    ----------
+    connection : Connection
+    query_ids : iterable of str
+        Unique ids of the queries to touch
+    """
+    query_ids = sorted(set(query_ids))
+    if len(query_ids) == 0:
+        return
+    id_list = ", ".join(f"'{query_id}'" for query_id in query_ids)
+    connection.fetch(
+        f"SELECT touch_cache(query_id) FROM cache.cached WHERE query_id IN ({id_list})"
+    )
+
+
+def get_cached_query_record(
+    connection: "Connection", query_id: str
+) -> Tuple[str, str, datetime.datetime]:
+    """
+    Get the schema and name of the table which stores the result of a cached
+    query, and the time the result was stored, touching its cache record,
+    in a single round trip to the database.
+
+    Parameters
+    ----------
+    connection : Connection
+    query_id : str
+        Unique id of the query
+
+    Returns
+    -------
+    str
+        Schema of the table storing the result
+    str
+        Name of the table storing the result
+    datetime.datetime
+        Time the cached result was created
+
+    Raises
+    ------
+    ValueError
+        If the query is not in the cache
+    """
+    try:
+        _, schema, table_name, created = connection.fetch(
+            f"""
+            SELECT touch_cache(query_id), schema, tablename, created
+            FROM cache.cached WHERE query_id='{query_id}'
+            """
+        )[0]
+    except (IndexError, InternalError):
+        raise ValueError(f"Query id '{query_id}' is not in cache on this connection.")
+    return schema, table_name, created
+
+
+def get_cached_query_sql(connection: "Connection", query_id: str) -> str:
+    """
+    Get SQL which selects the stored result of a cached query, touching its
+    cache record, in a single round trip to the database.
+
+    This is equivalent to calling `get_query` on the stored query object, but
+    doesn't need the object to be unpickled.
+
+    Parameters
+    ----------
+    connection : Connection
+    query_id : str
+        Unique id of the query
+
+    Returns
+    -------
+    str
+        SQL selecting the cached result of the query
+
+    Raises
+    ------
+    ValueError
+        If the query is not in the cache
+    """
+    schema, table_name, _ = get_cached_query_record(connection, query_id)
+    return f"SELECT * FROM {schema}.{table_name}"
+
+
 def reset_cache(
     connection: "Connection", redis: StrictRedis, protect_table_objects: bool = True
 ) -> None:
@@ -271,6 +378,8 @@ def reset_cache(
     for table in tables:
         with connection.engine.begin() as trans:
             trans.execute(f"DROP TABLE IF EXISTS cache.{table[0]} CASCADE")
+    connection.invalidate_catalog_cache()
+    sql_cache.clear()
     if protect_table_objects:
         with connection.engine.begin() as trans:
             trans.execute(f"DELETE FROM cache.cached WHERE schema='cache'")
@@ -305,6 +414,8 @@ def resync_redis_with_cache(connection: "Connection", redis: StrictRedis) -> Non
     logger.debug("Redis resync", queries_in_cache=queries_in_cache)
     redis.flushdb()
     logger.debug("Flushing redis.")
+    # Invalidate any SQL compiled for the queries which were stored before
+    redis.set(stored_queries_version_key(connection.conn_id), uuid.uuid4().hex)
     for event in (QueryEvent.QUEUE, QueryEvent.EXECUTE, QueryEvent.FINISH):
         for qid in queries_in_cache:
             new_state, changed = QueryStateMachine(
@@ -396,16 +507,114 @@ def get_cached_query_objects_ordered_by_score(
         if protected_period is not None
         else " AND NOW()-created > (cache_protected_period()*INTERVAL '1 seconds')"
     )
-    qry = f"""SELECT obj, table_size(tablename, schema) as table_size
+    qry = f"""SELECT obj, table_size
         FROM cache.cached
         WHERE cached.class!='Table' AND cached.class!='GeoTable'
         {protected_period_clause}
-        ORDER BY cache_score(cache_score_multiplier, compute_time, table_size(tablename, schema)) ASC
+        ORDER BY cache_score ASC
         """
     cache_queries = connection.fetch(qry)
     return [(pickle.loads(obj), table_size) for obj, table_size in cache_queries]
 
 
+def _get_cache_size_and_eviction_candidates(
+    connection: "Connection", protected_period: Optional[int] = None,
+) -> Tuple[int, List[Tuple[str, int]]]:
+    """
+    Get the total size of the cache, and the ids and sizes of the cached queries which are
+    eligible for removal in ascending cache score order.
+
+    Parameters
+    ----------
+    connection : Connection
+    protected_period : int, default None
+        Optionally specify a number of seconds within which cache entries are excluded. If None,
+        the value stored in cache.cache_config will be used.Set to a negative number to ignore cache protection
+        completely.
+
+    Returns
+    -------
+    tuple of int, list of tuples
+        Total size in bytes of all cache tables, and a list of query ids with their on disk sizes
+
+    """
+    protected_period_clause = (
+        f"NOW()-created > INTERVAL '{protected_period} seconds'"
+        if protected_period is not None
+        else "NOW()-created > (cache_protected_period()*INTERVAL '1 seconds')"
+    )
+    qry = f"""SELECT query_id, table_size, {protected_period_clause} AS evictable
+        FROM cache.cached
+        WHERE cached.class!='Table' AND cached.class!='GeoTable'
+        ORDER BY cache_score ASC
+        """
+    cache_records = connection.fetch(qry)
+    cache_size = sum(int(table_size or 0) for _, table_size, _ in cache_records)
+    candidates = [
+        (query_id, int(table_size or 0))
+        for query_id, table_size, evictable in cache_records
+        if evictable
+    ]
+    return cache_size, candidates
+
+
+def _remove_batch_from_cache(
+    connection: "Connection", redis: StrictRedis, queries: List["Query"]
+) -> List["Query"]:
+    """
+    Remove a batch of queries from cache without cascading to the queries which depend on them.
+    The cache records of the queries, and of any Table objects which point at their tables,
+    are removed and the tables dropped in a single transaction.
+
+    Parameters
+    ----------
+    connection : Connection
+    redis : StrictRedis
+    queries : list of Query
+        Queries to remove from cache
+
+    Returns
+    -------
+    list of Query
+        The queries which were removed. Queries which could not be marked as resetting, for
+        example because they are already being reset elsewhere, are not removed.
+    """
+    to_remove = {}
+    for query in queries:
+        current_state, this_thread_is_owner = QueryStateMachine(
+            redis, query.query_id, connection.conn_id
+        ).reset()
+        if this_thread_is_owner:
+            to_remove[query.query_id] = query
+        else:
+            logger.info(
+                f"Not removing '{query.query_id}' from cache, because it {current_state.description}."
+            )
+    if len(to_remove) == 0:
+        return []
+
+    table_names = tuple(q.fully_qualified_table_name for q in to_remove.values())
+    with connection.engine.begin() as trans:
+        removed_ids = trans.execute(
+            """DELETE FROM cache.cached
+            WHERE query_id IN %s OR (schema || '.' || tablename) IN %s
+            RETURNING query_id""",
+            (tuple(to_remove.keys()), table_names),
+        ).fetchall()
+        trans.execute(f"DROP TABLE IF EXISTS {', '.join(table_names)}")
+    for table_name in table_names:
+        schema, name = table_name.split(".")
+        connection.invalidate_catalog_cache(name, schema)
+    logger.debug(f"Dropped cache tables {table_names}.")
+
+    for (query_id,) in removed_ids:
+        q_state_machine = QueryStateMachine(redis, query_id, connection.conn_id)
+        if query_id not in to_remove:
+            q_state_machine.reset()  # A Table pointing at one of the removed tables
+        q_state_machine.finish_resetting()
+    return list(to_remove.values())
+
+
 def shrink_one(
     connection: "Connection",
     dry_run: bool = False,
@@ -430,9 +639,11 @@ def shrink_one(
     tuple of "Query", int
         The "Query" object that was removed from cache and the size of it
     """
-    obj_to_remove, obj_size = get_cached_query_objects_ordered_by_score(
+    _, candidates = _get_cache_size_and_eviction_candidates(
         connection, protected_period=protected_period
-    )[0]
+    )
+    query_id, obj_size = candidates[0]
+    obj_to_remove = get_query_object_by_id(connection, query_id)
 
     logger.info(
         f"{'Would' if dry_run else 'Will'} remove cache record for {obj_to_remove.query_id} of type {obj_to_remove.__class__}"
@@ -455,6 +666,10 @@ def shrink_below_size(
     """
     Remove queries from the cache until it is below a specified size threshold.
 
+    The cache tables to remove are chosen in a single pass, by taking the eligible cached
+    queries in ascending score order until enough space would be freed. They are then
+    removed in batches of `CACHE_REMOVAL_BATCH_SIZE`, each in a single transaction.
+
     Parameters
     ----------
     connection : "Connection"
@@ -472,10 +687,11 @@ def shrink_below_size(
     list of "Query"
         List of the queries that were removed
     """
-    initial_cache_size = get_size_of_cache(connection)
+    initial_cache_size, candidates = _get_cache_size_and_eviction_candidates(
+        connection, protected_period=protected_period
+    )
     if size_threshold is None:
         size_threshold = get_max_size_of_cache(connection)
-    removed = []
     logger.info(
         f"Shrinking cache from {initial_cache_size} to below {size_threshold}{' (dry run)' if dry_run else ''}.",
         initial_cache_size=initial_cache_size,
@@ -483,46 +699,57 @@ def shrink_below_size(
         dry_run=dry_run,
     )
 
-    if dry_run:
-        cached_queries = iter(
-            get_cached_query_objects_ordered_by_score(
-                connection, protected_period=protected_period
+    current_cache_size = initial_cache_size
+    to_remove = []
+    for query_id, table_size in candidates:
+        if current_cache_size <= size_threshold:
+            break
+        to_remove.append((query_id, table_size))
+        current_cache_size -= table_size
+
+    objs = {}
+    if len(to_remove) > 0:
+        objs = dict(
+            connection.fetch(
+                f"""SELECT query_id, obj FROM cache.cached
+                WHERE query_id IN ({', '.join(f"'{query_id}'" for query_id, _ in to_remove)})"""
             )
         )
+    removed = []
+    for query_id, table_size in to_remove:
+        obj = pickle.loads(objs[query_id])
+        logger.info(
+            f"{'Would' if dry_run else 'Will'} remove cache record for {obj.query_id} of type {obj.__class__}"
+        )
+        logger.info(
+            f"Table {obj.fully_qualified_table_name} ({table_size} bytes) {'would' if dry_run else 'will'} be removed."
+        )
+        removed.append(obj)
 
-        def dry_run_shrink(connection, protected_period):
-            obj, obj_size = cached_queries.__next__()
-            logger.info(
-                f"Would remove cache record for {obj.query_id} of type {obj.__class__}"
-            )
-            logger.info(
-                f"Table {obj.fully_qualified_table_name} ({obj_size} bytes) would be removed."
+    if not dry_run:
+        redis = get_redis()
+        removed = [
+            obj
+            for batch_start in range(0, len(removed), CACHE_REMOVAL_BATCH_SIZE)
+            for obj in _remove_batch_from_cache(
+                connection,
+                redis,
+                removed[batch_start : batch_start + CACHE_REMOVAL_BATCH_SIZE],
             )
-            return obj, obj_size
+        ]
 
-        shrink = dry_run_shrink
-    else:
-        shrink = shrink_one
-
-    current_cache_size = initial_cache_size
-    try:
-        while current_cache_size > size_threshold:
-            obj_removed, cache_reduction = shrink(
-                connection, protected_period=protected_period
-            )
-            removed.append(obj_removed)
-            current_cache_size -= cache_reduction
+    if current_cache_size > size_threshold:
         logger.info(
-            f"New cache size {'would' if dry_run else 'will'} be {current_cache_size}.",
-            removed=[q.query_id for q in removed],
+            "Unable to shrink cache. No cache items eligible to be removed.",
             dry_run=dry_run,
             initial_cache_size=initial_cache_size,
             current_cache_size=current_cache_size,
             size_threshold=size_threshold,
         )
-    except IndexError:
+    else:
         logger.info(
-            "Unable to shrink cache. No cache items eligible to be removed.",
+            f"New cache size {'would' if dry_run else 'will'} be {current_cache_size}.",
+            removed=[q.query_id for q in removed],
             dry_run=dry_run,
             initial_cache_size=initial_cache_size,
             current_cache_size=current_cache_size,
@@ -574,8 +801,8 @@ def get_size_of_cache(connection: "Connection") -> int:
         Number of bytes in total used by cache tables
 
     """
-    sql = """SELECT sum(table_size(tablename, schema)) as total_bytes 
-        FROM cache.cached  
+    sql = """SELECT sum(table_size) as total_bytes
+        FROM cache.cached
         WHERE cached.class!='Table' AND cached.class!='GeoTable'"""
     cache_bytes = connection.fetch(sql)[0][0]
     return 0 if cache_bytes is None else int(cache_bytes)
@@ -735,8 +962,7 @@ def get_score(connection: "Connection", query_id: str) -> float:
     try:
         return float(
             connection.fetch(
-                f"""SELECT cache_score(cache_score_multiplier, compute_time, table_size(tablename, schema))
-                 FROM cache.cached WHERE query_id='{query_id}'"""
+                f"SELECT cache_score FROM cache.cached WHERE query_id='{query_id}'"
             )[0][0]
         )
     except IndexError:
@@ -12,9 +12,12 @@ import datetime
 import warnings
 from _md5 import md5
 from collections import defaultdict
+from threading import RLock, Thread
 
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+from uuid import uuid4
 
+import pandas as pd
 import sqlalchemy
 
 from urllib.parse import quote_plus as urlquote
@@ -26,6 +29,11 @@ from structlog import get_logger
 
 logger = get_logger(__name__)
 
+# Postgres type oids of columns which need explicit handling when reading CSV output
+_PG_BOOL_OID = 16
+_PG_NUMERIC_OIDS = {20, 21, 23, 700, 701, 1700}
+_PG_DATETIME_OIDS = {1082, 1114, 1184}
+
 
 class Connection:
     """
@@ -41,6 +49,15 @@ class Connection:
         Number of connections to the db to use
     overflow : int, optional
         Number of connections to the db to open temporarily
+    catalog_cache_ttl : float, default 60
+        Number of seconds to remember whether a table exists and what its
+        columns are. Tables created or dropped through flowmachine are
+        forgotten immediately, so this only bounds how long changes made by
+        other clients may go unnoticed.
+    target_partitions : bool, default False
+        Set to True to have subsets of events tables select from only the
+        per-day child tables of the table which hold the dates they cover,
+        rather than from the parent table (see `partitions`).
 
     Notes
     -----
@@ -61,6 +78,8 @@ class Connection:
         pool_size: int = 5,
         overflow: int = 10,
         conn_str: Optional[str] = None,
+        catalog_cache_ttl: float = 60,
+        target_partitions: bool = False,
     ) -> None:
         if conn_str is None:
             if any(arg is None for arg in (port, user, password, host, database)):
@@ -100,6 +119,9 @@ class Connection:
         conn_id.update(str(self.engine.url.port).encode())
         conn_id.update(str(self.engine.url.database).encode())
         self.conn_id = conn_id.hexdigest()
+        self._catalog_cache = TTLCache(maxsize=4096, ttl=catalog_cache_ttl)
+        self._catalog_cache_lock = RLock()
+        self.target_partitions = target_partitions
 
         self.max_connections = pool_size + overflow
         if self.max_connections > os.cpu_count():
@@ -145,6 +167,208 @@ class Connection:
                 rs = curs.fetchall()
         return rs
 
+    def fetch_batches(
+        self, query: str, batch_size: int = 10000
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Iterate over the result of a query in dataframes of at most `batch_size` rows,
+        using a server-side cursor so that only one batch is held in memory at a time.
+
+        Parameters
+        ----------
+        query : str
+            SQL query string.
+        batch_size : int, default 10000
+            Maximum number of rows in each dataframe
+
+        Yields
+        ------
+        pandas.DataFrame
+            The next batch of rows of the result
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer.")
+        with self.engine.connect() as c2:
+            with c2.begin():
+                # Named cursors are server side, and only live within the transaction
+                with c2.connection.cursor(name=f"batches_{uuid4().hex}") as curs:
+                    curs.itersize = batch_size
+                    curs.execute(query)
+                    while True:
+                        rows = curs.fetchmany(batch_size)
+                        if len(rows) == 0:
+                            break
+                        yield pd.DataFrame.from_records(
+                            rows, columns=[col.name for col in curs.description]
+                        )
+
+    def copy_to_dataframe(self, query: str, batch_size: int = 100000) -> pd.DataFrame:
+        """
+        Fetch the result of a query as a dataframe by streaming it out of the
+        database with COPY ... TO STDOUT, and parsing it column-wise in batches
+        as it arrives.
+
+        This avoids building a python tuple per row, and never holds more than
+        one batch of the raw output, so is considerably faster and uses less
+        memory than `pandas.read_sql_query` for large results.
+
+        Parameters
+        ----------
+        query : str
+            SQL query string.
+        batch_size : int, default 100000
+            Number of rows to parse at a time
+
+        Returns
+        -------
+        pandas.DataFrame
+            Result of the query
+
+        Notes
+        -----
+        Numeric columns are returned as numpy numeric types (not
+        `decimal.Decimal`), date columns as datetimes, and nulls in text
+        columns (as well as empty strings) as NaN.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer.")
+        with self.engine.connect() as c2:
+            with c2.begin():
+                curs = c2.connection.cursor()
+                # Plan, but don't run, the query to find the column types
+                curs.execute(f"SELECT * FROM ({query}) _ LIMIT 0")
+                columns = [col.name for col in curs.description]
+                dtypes = {
+                    col.name: object
+                    for col in curs.description
+                    if col.type_code not in _PG_NUMERIC_OIDS | _PG_DATETIME_OIDS
+                    and col.type_code != _PG_BOOL_OID
+                }
+                dates = [
+                    col.name
+                    for col in curs.description
+                    if col.type_code in _PG_DATETIME_OIDS
+                ]
+                read_fd, write_fd = os.pipe()
+                copy_errors = []
+
+                def copy_out():
+                    # Runs in its own thread, writing to the pipe while it's read below
+                    try:
+                        with open(write_fd, "wb") as pipe_in:
+                            curs.copy_expert(
+                                f"COPY ({query}) TO STDOUT WITH (FORMAT CSV)", pipe_in
+                            )
+                    except Exception as exc:
+                        copy_errors.append(exc)
+
+                copier = Thread(target=copy_out, name="copy_to_dataframe")
+                copier.start()
+                batches = []
+                try:
+                    with open(read_fd, "rb") as pipe_out:
+                        try:
+                            for batch in pd.read_csv(
+                                pipe_out,
+                                header=None,
+                                names=columns,
+                                dtype=dtypes,
+                                parse_dates=dates,
+                                true_values=["t"],
+                                false_values=["f"],
+                                keep_default_na=False,
+                                na_values=[""],
+                                chunksize=batch_size,
+                            ):
+                                batches.append(batch)
+                        except pd.errors.EmptyDataError:
+                            pass  # No rows
+                finally:
+                    # Closing the pipe stops the copy if reading failed part way
+                    copier.join()
+                if copy_errors:
+                    raise copy_errors[0]
+                if len(batches) == 0:
+                    return pd.DataFrame(columns=columns)
+                return pd.concat(batches, ignore_index=True)
+
+    def _table_columns_by_schema(
+        self, name: str, schema: Optional[str] = None
+    ) -> Dict[str, Tuple[str, ...]]:
+        """
+        Get the columns of every table, view or foreign table with this name,
+        using the catalog cache if possible.
+
+        Parameters
+        ----------
+        name : str
+            Name of the table
+        schema : str, default None
+            Look only in this schema, if none look for the table in
+            any schema
+
+        Returns
+        -------
+        dict
+            Mapping from schema name to the columns of the table in that schema,
+            in order. Empty if there is no such table.
+        """
+        key = (name, schema)
+        with self._catalog_cache_lock:
+            try:
+                return self._catalog_cache[key]
+            except KeyError:
+                pass
+        catalog_query = f"""
+        SELECT nspname, attname FROM pg_class
+            JOIN pg_namespace ON pg_namespace.oid = pg_class.relnamespace
+            LEFT JOIN pg_attribute ON attrelid = pg_class.oid
+                AND attnum > 0 AND NOT attisdropped
+            WHERE relname='{name}' AND relkind IN ('r', 'p', 'v', 'f')
+        """
+        if schema is not None:
+            catalog_query = f"{catalog_query} AND nspname='{schema}'"
+        catalog_query = f"{catalog_query} ORDER BY nspname, attnum"
+        columns = {}
+        for table_schema, column in self.fetch(catalog_query):
+            table_columns = columns.setdefault(table_schema, [])
+            if column is not None:  # None for a table with no columns
+                table_columns.append(column)
+        columns = {
+            table_schema: tuple(table_columns)
+            for table_schema, table_columns in columns.items()
+        }
+        with self._catalog_cache_lock:
+            self._catalog_cache[key] = columns
+        return columns
+
+    def invalidate_catalog_cache(
+        self, name: Optional[str] = None, schema: Optional[str] = None
+    ) -> None:
+        """
+        Forget cached information about tables, so that it is fetched from
+        the database again next time it is needed. Call this after creating or
+        dropping a table.
+
+        Parameters
+        ----------
+        name : str, optional
+            Name of the table to forget. If not given, forget every table.
+        schema : str, optional
+            Schema of the table to forget. If not given, forget tables with
+            this name in every schema.
+        """
+        with self._catalog_cache_lock:
+            if name is None:
+                self._catalog_cache.clear()
+                return
+            for key in list(self._catalog_cache.keys()):
+                cached_name, cached_schema = key
+                if cached_name == name and (
+                    schema is None or cached_schema in (schema, None)
+                ):
+                    self._catalog_cache.pop(key, None)
+
     def has_table(self, name: str, schema: Optional[str] = None) -> bool:
         """
         Check if a table exists in the database.
@@ -162,17 +386,25 @@ class Connection:
         bool
          true if the given table exists, otherwise false.
         """
-        exists_query = """
-        SELECT * FROM information_schema.tables 
-            WHERE table_name='{}'
-        """.format(
-            name
-        )
-        if schema is not None:
-            exists_query = "{} AND table_schema='{}'".format(exists_query, schema)
-        exists_query = "SELECT EXISTS({})".format(exists_query)
-        with self.engine.begin():
-            return self.engine.execute(exists_query).fetchall()[0][0]
+        return len(self._table_columns_by_schema(name, schema)) > 0
+
+    def table_columns(self, name: str, schema: str) -> List[str]:
+        """
+        Get the names of the columns of a table.
+
+        Parameters
+        ----------
+        name : str
+            Name of the table
+        schema : str
+            Schema the table is in
+
+        Returns
+        -------
+        list of str
+            The table's column names, in order. Empty if the table doesn't exist.
+        """
+        return list(self._table_columns_by_schema(name, schema).get(schema, ()))
 
     @property
     def available_dates(self) -> Dict[str, List[datetime.date]]:
@@ -205,6 +437,52 @@ class Connection:
             ),
         )
 
+    def partitions(
+        self, table: str, schema: str = "events"
+    ) -> Dict[datetime.date, str]:
+        """
+        Find the per-day child tables of a table, which are named
+        `<table>_YYYYMMDD` and hold the rows for one day.
+
+        Parameters
+        ----------
+        table : str
+            Name of the parent table, e.g. 'calls'
+        schema : str, default 'events'
+            Schema of the parent table
+
+        Returns
+        -------
+        dict
+            Mapping from date to the fully qualified name of the child table
+            holding that date's rows. Empty if the table has no per-day children.
+        """
+        return self._partitions(table, schema)
+
+    @cached(TTLCache(256, 120))
+    def _partitions(self, table: str, schema: str) -> Dict[datetime.date, str]:
+        children = self.fetch(
+            f"""
+            SELECT child_ns.nspname, child.relname FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_namespace parent_ns ON parent_ns.oid = parent.relnamespace
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                JOIN pg_namespace child_ns ON child_ns.oid = child.relnamespace
+                WHERE parent.relname='{table}' AND parent_ns.nspname='{schema}'
+            """
+        )
+        partitions = {}
+        for child_schema, child_name in children:
+            prefix, _, suffix = child_name.rpartition("_")
+            if prefix != table or len(suffix) != 8:
+                continue
+            try:
+                date = datetime.datetime.strptime(suffix, "%Y%m%d").date()
+            except ValueError:  # Not a per-day child table
+                continue
+            partitions[date] = f"{child_schema}.{child_name}"
+        return partitions
+
     def min_date(self, table: str = "calls") -> datetime.date:
         """
         Finds the minimum date in the given events table.
@@ -10,7 +10,8 @@ managing queries.
 from contextvars import ContextVar, copy_context
 from concurrent.futures import Executor, Future
 from contextlib import contextmanager
-from typing import Callable
+from threading import Lock
+from typing import Callable, Iterable
 
 from redis import StrictRedis
 
@@ -137,6 +138,64 @@ def submit_to_executor(func: Callable, *args, **kwargs) -> Future:
     return get_executor().submit(current_context.run, func, *args, **kwargs)
 
 
+def submit_to_executor_after(
+    futures: Iterable[Future], func: Callable, *args, **kwargs
+) -> Future:
+    """
+    Submit a callable to the current context's executor pool once all of a collection
+    of futures are done, and get back a future to monitor execution. No worker thread
+    is occupied while waiting for the futures to finish.
+
+    Parameters
+    ----------
+    futures : iterable of Future
+        Futures which must be done before func is submitted
+    func : Callable
+        Callable to be executed
+    args
+        Positional arguments to func
+    kwargs
+        Keyword arguments to func
+
+    Returns
+    -------
+    Future
+
+    """
+    current_context = copy_context()
+    pool = get_executor()
+    outer_future = Future()
+    pending = set(futures)
+    lock = Lock()
+
+    def copy_outcome(inner_future: Future):
+        if inner_future.cancelled():
+            outer_future.cancel()
+        elif inner_future.exception() is None:
+            outer_future.set_result(inner_future.result())
+        else:
+            outer_future.set_exception(inner_future.exception())
+
+    def submit():
+        pool.submit(current_context.run, func, *args, **kwargs).add_done_callback(
+            copy_outcome
+        )
+
+    def on_done(future: Future):
+        with lock:
+            pending.discard(future)
+            all_done = not pending
+        if all_done:
+            submit()
+
+    if pending:
+        for future in list(pending):
+            future.add_done_callback(on_done)
+    else:
+        submit()
+    return outer_future
+
+
 def bind_context(
     connection: Connection, executor_pool: Executor, redis_conn: StrictRedis
 ):
@@ -0,0 +1,212 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Process-wide in-memory cache of query results retrieved as dataframes.
+
+The total memory used by cached dataframes is bounded, and the least recently
+used dataframes are evicted once the budget is exceeded. The budget (in bytes)
+defaults to the value of the FLOWMACHINE_DATAFRAME_CACHE_SIZE environment
+variable, or 1GB if that is not set.
+"""
+
+from threading import RLock
+from typing import Any, Dict, Hashable, Optional
+
+import pandas as pd
+import structlog
+from cachetools import LRUCache
+from get_secret_or_env_var import getenv
+
+logger = structlog.get_logger("flowmachine.debug", submodule=__name__)
+
+DEFAULT_DATAFRAME_CACHE_SIZE = 1024 ** 3
+
+
+def dataframe_size(df: pd.DataFrame) -> int:
+    """
+    Get the number of bytes of memory used by a dataframe, including its index
+    and the contents of any object columns.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Dataframe to measure
+
+    Returns
+    -------
+    int
+        Size of the dataframe in bytes
+    """
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class DataFrameCache:
+    """
+    Thread safe least-recently-used cache of dataframes, bounded by the total
+    memory they use.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Maximum number of bytes of dataframes to hold. Dataframes larger than this
+        are never cached.
+    """
+
+    def __init__(self, max_bytes: int):
+        self._lock = RLock()
+        self._cache = LRUCache(maxsize=max_bytes, getsizeof=dataframe_size)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_bytes(self) -> int:
+        """
+        Maximum number of bytes of dataframes the cache will hold.
+        """
+        return int(self._cache.maxsize)
+
+    @property
+    def current_bytes(self) -> int:
+        """
+        Number of bytes of dataframes currently held in the cache.
+        """
+        return int(self._cache.currsize)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._cache
+
+    def get(self, key: Hashable) -> Optional[pd.DataFrame]:
+        """
+        Get a cached dataframe, marking it as most recently used.
+
+        Parameters
+        ----------
+        key : Hashable
+            Key the dataframe was cached under
+
+        Returns
+        -------
+        pandas.DataFrame or None
+            The cached dataframe, or None if it is not in the cache.
+        """
+        with self._lock:
+            try:
+                df = self._cache[key]
+            except KeyError:
+                self.misses += 1
+                logger.debug("Dataframe cache miss.", key=key)
+                return None
+            self.hits += 1
+            logger.debug("Dataframe cache hit.", key=key)
+            return df
+
+    def put(self, key: Hashable, df: pd.DataFrame) -> bool:
+        """
+        Add a dataframe to the cache, evicting the least recently used dataframes
+        if necessary to stay within the memory budget.
+
+        Parameters
+        ----------
+        key : Hashable
+            Key to cache the dataframe under
+        df : pandas.DataFrame
+            Dataframe to cache
+
+        Returns
+        -------
+        bool
+            True if the dataframe was cached, False if it is too large to fit.
+        """
+        with self._lock:
+            try:
+                self._cache[key] = df
+            except ValueError:
+                # Bigger than the whole budget
+                self._cache.pop(key, None)
+                logger.debug(
+                    "Dataframe too large to cache.",
+                    key=key,
+                    size=dataframe_size(df),
+                    max_bytes=self.max_bytes,
+                )
+                return False
+            return True
+
+    def pop(self, key: Hashable) -> Optional[pd.DataFrame]:
+        """
+        Remove a dataframe from the cache.
+
+        Parameters
+        ----------
+        key : Hashable
+            Key the dataframe was cached under
+
+        Returns
+        -------
+        pandas.DataFrame or None
+            The removed dataframe, or None if it was not in the cache.
+        """
+        with self._lock:
+            return self._cache.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Remove all dataframes from the cache and reset the hit and miss counts.
+        """
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def resize(self, max_bytes: int) -> None:
+        """
+        Change the memory budget of the cache, evicting the least recently used
+        dataframes if the new budget is smaller than the current usage.
+
+        Parameters
+        ----------
+        max_bytes : int
+            New maximum number of bytes of dataframes to hold
+        """
+        with self._lock:
+            old_cache = self._cache
+            self._cache = LRUCache(maxsize=max_bytes, getsizeof=dataframe_size)
+            # popitem removes the least recently used item, so re-adding in
+            # the order they are popped preserves recency.
+            items = []
+            while len(old_cache) > 0:
+                items.append(old_cache.popitem())
+            for key, df in items:
+                try:
+                    self._cache[key] = df
+                except ValueError:
+                    pass  # Too large for the new budget
+
+    def info(self) -> Dict[str, Any]:
+        """
+        Get statistics about the cache.
+
+        Returns
+        -------
+        dict
+            Dict with the number of hits and misses, the number of cached dataframes,
+            and the current and maximum size of the cache in bytes.
+        """
+        with self._lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                entries=len(self._cache),
+                current_bytes=self.current_bytes,
+                max_bytes=self.max_bytes,
+            )
+
+
+dataframe_cache = DataFrameCache(
+    int(getenv("FLOWMACHINE_DATAFRAME_CACHE_SIZE", DEFAULT_DATAFRAME_CACHE_SIZE))
+)
@@ -3,13 +3,17 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 
+import heapq
+import threading
+
 import networkx as nx
 import sys
 import structlog
+from contextvars import copy_context
 from io import BytesIO
 from typing import Union, Tuple, Dict, Sequence, Callable, Any, Optional, List, Set
-from concurrent.futures import wait
-from functools import lru_cache
+from concurrent.futures import wait, Future
+from functools import lru_cache, partial
 
 from flowmachine.core.context import get_redis, get_db
 from flowmachine.core.errors import UnstorableQueryError
@@ -320,29 +324,142 @@ def plot_dependency_graph(
     return result
 
 
-def store_queries_in_order(dependency_graph: nx.DiGraph) -> Dict[str, "Future"]:
+def _critical_path_lengths(dependency_graph: nx.DiGraph) -> Dict[str, int]:
+    """
+    Get the length of the longest chain of queries in a dependency graph which
+    depend on each query, including the query itself.
+
+    Parameters
+    ----------
+    dependency_graph : networkx.DiGraph
+        Dependency graph of query objects
+
+    Returns
+    -------
+    dict
+        Mapping from query nodes to their critical path length
+    """
+    critical_path_lengths = {}
+    for node in nx.topological_sort(dependency_graph):
+        critical_path_lengths[node] = 1 + max(
+            (
+                critical_path_lengths[dependent]
+                for dependent in dependency_graph.predecessors(node)
+            ),
+            default=0,
+        )
+    return critical_path_lengths
+
+
+def store_queries_in_order(
+    dependency_graph: nx.DiGraph, max_concurrency: Optional[int] = None
+) -> Dict[str, "Future"]:
     """
-    Execute queries in an order that ensures each query store is triggered after its dependencies.
+    Store the queries in a dependency graph, triggering each query's store only
+    once all of the queries it depends on have finished.
+
+    Queries which are ready to be stored are dispatched in descending order of their
+    critical path length (the longest chain of queries in the graph which depend on them),
+    so that the queries holding up the most work are run first. Because no store is
+    dispatched before its dependencies are finished, stores never occupy a worker
+    thread while waiting for another store in the graph.
 
     Parameters
     ----------
     dependency_graph : networkx.DiGraph
         Dependency graph of query objects to be stored
-    
+    max_concurrency : int, optional
+        Maximum number of stores to have running at once. Defaults to the maximum
+        number of connections the current flowdb connection may open.
+
     Returns
     -------
     dict
         Mapping from query nodes to Future objects representing the store tasks
+
+    Notes
+    -----
+    All the storable queries in the graph are marked as queued immediately, so that
+    anything using them will wait for them to be stored rather than recalculating them.
+    This function returns immediately.
     """
-    ordered_list_of_queries = list(nx.topological_sort(dependency_graph))[::-1]
-    logger.debug(f"Storing queries with IDs: {ordered_list_of_queries}")
+    if max_concurrency is None:
+        max_concurrency = get_db().max_connections
+    current_context = copy_context()
+    critical_path_lengths = _critical_path_lengths(dependency_graph)
+    unfinished_dependencies = {
+        node: dependency_graph.out_degree(node) for node in dependency_graph
+    }
+    lock = threading.Lock()
+    ready = []
+    running = 0
     store_futures = {}
-    for query in ordered_list_of_queries:
+    unstorable = set()
+
+    for node in dependency_graph:
+        query = dependency_graph.nodes[node]["query_object"]
         try:
-            store_futures[query] = dependency_graph.nodes[query]["query_object"].store()
-        except UnstorableQueryError:
-            # Some queries cannot be stored
-            pass
+            query.fully_qualified_table_name
+        except NotImplementedError:
+            # Some queries cannot be stored, so there is nothing to wait for once
+            # their own dependencies are finished
+            unstorable.add(node)
+            continue
+        store_futures[node] = Future()
+        QueryStateMachine(get_redis(), query.query_id, get_db().conn_id).enqueue()
+    logger.debug(f"Storing queries with IDs: {list(store_futures.keys())}")
+
+    def finished(node: str, store_future: Optional[Future] = None):
+        nonlocal running
+        if store_future is not None:
+            if store_future.cancelled():
+                store_futures[node].cancel()
+            elif store_future.exception() is None:
+                store_futures[node].set_result(store_future.result())
+            else:
+                store_futures[node].set_exception(store_future.exception())
+        with lock:
+            running -= 1
+            for dependent in dependency_graph.predecessors(node):
+                unfinished_dependencies[dependent] -= 1
+                if unfinished_dependencies[dependent] == 0:
+                    heapq.heappush(
+                        ready, (-critical_path_lengths[dependent], dependent)
+                    )
+        dispatch()
+
+    def start(node: str):
+        if node in unstorable:
+            finished(node)
+            return
+        query = dependency_graph.nodes[node]["query_object"]
+        logger.debug(f"Dependencies of '{query.query_id}' finished, storing it.")
+        try:
+            store_future = current_context.copy().run(query.store)
+        except Exception as exc:
+            QueryStateMachine(get_redis(), query.query_id, get_db().conn_id).cancel()
+            store_future = Future()
+            store_future.set_exception(exc)
+        store_future.add_done_callback(
+            partial(current_context.copy().run, finished, node)
+        )
+
+    def dispatch():
+        nonlocal running
+        to_start = []
+        with lock:
+            while ready and running < max_concurrency:
+                _, node = heapq.heappop(ready)
+                running += 1
+                to_start.append(node)
+        for node in to_start:
+            start(node)
+
+    with lock:
+        for node in dependency_graph:
+            if unfinished_dependencies[node] == 0:
+                heapq.heappush(ready, (-critical_path_lengths[node], node))
+    dispatch()
     return store_futures
 
 
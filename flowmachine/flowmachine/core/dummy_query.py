@@ -6,6 +6,7 @@ A dummy query class, primarily useful for testing.
 """
 
 import structlog
+from concurrent.futures import Future
 
 from .context import get_redis, get_db
 from .query import Query
@@ -55,6 +56,9 @@ class DummyQuery(Query):
         q_state_machine.enqueue()
         q_state_machine.execute()
         q_state_machine.finish()
+        store_future = Future()
+        store_future.set_result(self)
+        return store_future
 
     def explain(self, format="json", analyse=False):
         """
@@ -308,6 +308,8 @@ def _do_connect(
             database="flowdb",
             pool_size=flowdb_connection_pool_size,
             overflow=flowdb_connection_pool_overflow,
+            target_partitions=getenv("FLOWMACHINE_TARGET_PARTITIONS", "false").lower()
+            == "true",
         )
 
     redis_connection = redis.StrictRedis(
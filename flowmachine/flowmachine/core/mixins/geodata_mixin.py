@@ -9,6 +9,7 @@ Mixin providing utility methods for geographic type queries.
 
 
 """
+import pandas
 import rapidjson as json
 
 
@@ -202,18 +203,46 @@ class GeoDataMixin:
         self._geojson = {}
         super().turn_off_caching()
 
-    def to_geopandas(self, crs=None):
+    def to_geopandas(self, crs=None, batch_size=None):
         """
         Parameters
         ----------
         crs : int or str
             Optionally give an integer srid, or valid proj4 string to transform output to
+        batch_size : int, optional
+            If given, build the GeoDataFrame from batches of this many features at
+            a time instead of fetching the whole result as geojson, to limit
+            memory usage for large results.
 
         Returns
         -------
         GeoDataFrame
             This query as a GeoPandas GeoDataFrame.
         """
+        if batch_size is not None:
+            proj4_string = proj4string(get_db(), crs)
+            batches = [
+                geopandas.GeoDataFrame.from_features(
+                    [
+                        {
+                            "type": row.type,
+                            "id": row.id,
+                            "geometry": row.geometry,
+                            "properties": row.properties,
+                        }
+                        for row in batch.itertuples(index=False)
+                    ]
+                )
+                for batch in get_db().fetch_batches(
+                    self.geojson_query(crs=proj4_string), batch_size=batch_size
+                )
+            ]
+            if len(batches) == 0:
+                gdf = geopandas.GeoDataFrame()
+            else:
+                gdf = pandas.concat(batches, ignore_index=True)
+            gdf.crs = proj4_string
+            return gdf
 
         js = self.to_geojson(crs=crs)
         gdf = geopandas.GeoDataFrame.from_features(js["features"])
@@ -19,7 +19,9 @@ class GraphMixin:
     can then be analysed further using standard libraries.
     """
 
-    def to_networkx(self, source=None, target=None, directed_graph=True):
+    def to_networkx(
+        self, source=None, target=None, directed_graph=True, batch_size=None
+    ):
         """
         By default, the leftmost column will be used as the source, the next
         leftmost as the target, and any other columns will become edge attributes.
@@ -35,6 +37,10 @@ class GraphMixin:
             Optionally specify the column name for the target nodes.
         directed_graph : bool, default True
             Set to false to return an undirected graph.
+        batch_size : int, optional
+            If given, build the graph from batches of this many rows at a time
+            instead of fetching the whole result as a dataframe, to limit
+            memory usage for large results.
 
         Returns
         -------
@@ -51,6 +57,11 @@ class GraphMixin:
         if not source:
             source, target = self.column_names[:2]
 
+        if batch_size is not None:
+            return self._to_networkx_in_batches(
+                source, target, directed_graph, batch_size
+            )
+
         df = self.get_dataframe()
         if directed_graph:
             if (df.groupby([source, target])[source].count() - 1).any():
@@ -77,3 +88,43 @@ class GraphMixin:
         return nx.from_pandas_edgelist(
             df, source, target, edge_attr=True, create_using=g_type
         )
+
+    def _to_networkx_in_batches(self, source, target, directed_graph, batch_size):
+        """
+        Build a networkx graph from this query, adding edges from one batch
+        of rows at a time.
+
+        Parameters
+        ----------
+        source : str
+            Column name for the source nodes.
+        target : str
+            Column name for the target nodes.
+        directed_graph : bool
+            Set to false to return an undirected graph.
+        batch_size : int
+            Number of rows to add at a time
+
+        Returns
+        -------
+        networkx.Graph
+            This query as a networkx graph object.
+        """
+        g = nx.DiGraph() if directed_graph else nx.Graph()
+        edge_count = 0
+        for batch in self.iter_batches(batch_size=batch_size):
+            attr_cols = [col for col in batch.columns if col not in (source, target)]
+            g.add_edges_from(
+                (row[0], row[1], dict(zip(attr_cols, row[2:])))
+                for row in batch[[source, target] + attr_cols].itertuples(
+                    index=False, name=None
+                )
+            )
+            edge_count += len(batch)
+        if g.number_of_edges() < edge_count:
+            warnings.warn(
+                f" Duplicate edges in {'directed' if directed_graph else 'undirected'} graph. Edge "
+                "information will be lost.",
+                stacklevel=3,
+            )
+        return g
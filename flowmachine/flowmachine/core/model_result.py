@@ -123,6 +123,35 @@ class ModelResult(Query):
         except AttributeError:
             return super().__len__()
 
+    def get_dataframe_async(
+        self, copy: bool = True, fetch_method: str = "sql"
+    ) -> Future:
+        """
+        Return a future object which will contain the result as a pandas dataframe.
+        If the model result has not been stored, this is the dataframe calculated
+        by the model.
+
+        Parameters
+        ----------
+        copy : bool, default True
+            If False, return a shallow copy which shares its data with the
+            model's dataframe. The returned dataframe must be treated as read-only.
+        fetch_method : {"sql", "copy"}, default "sql"
+            How to fetch the result if it is stored in the database.
+
+        Returns
+        -------
+        Future
+            Future object which can be used to get the resulting dataframe
+        """
+        try:
+            df = self._df
+        except AttributeError:
+            return super().get_dataframe_async(copy=copy, fetch_method=fetch_method)
+        df_future = Future()
+        df_future.set_result(df.copy(deep=copy))
+        return df_future
+
     @property
     def column_names(self) -> List[str]:
         try:
@@ -15,7 +15,7 @@ from concurrent.futures import Future
 
 
 import structlog
-from typing import List, Union
+from typing import Iterator, List, Optional, Union
 
 import psycopg2
 import pandas as pd
@@ -25,14 +25,17 @@ from hashlib import md5
 from sqlalchemy.engine import Engine
 from sqlalchemy.exc import ResourceClosedError
 
-from flowmachine.core.cache import touch_cache
+from flowmachine.core.dataframe_cache import dataframe_cache
 from flowmachine.core.context import (
     get_db,
     get_redis,
     submit_to_executor,
+    submit_to_executor_after,
 )
 from flowmachine.core.errors.flowmachine_errors import QueryResetFailedException
+from flowmachine.core.query_compilation import compile_query
 from flowmachine.core.query_state import QueryStateMachine
+from flowmachine.core.sql_cache import NOT_CACHED, sql_cache
 from abc import ABCMeta, abstractmethod
 
 from flowmachine.core.errors import (
@@ -196,7 +199,8 @@ class Query(metaclass=ABCMeta):
 
     def turn_on_caching(self):
         """
-        Turn on the caching, so that a computed dataframe is retained.
+        Turn on the caching, so that a computed dataframe is retained in the
+        process-wide dataframe cache.
         """
         self._cache = True
 
@@ -209,10 +213,8 @@ class Query(metaclass=ABCMeta):
             del self._len
         except AttributeError:
             pass
-        try:
-            del self._df
-        except AttributeError:
-            pass
+        for fetch_method in ("sql", "copy"):
+            dataframe_cache.pop(self._dataframe_cache_key(fetch_method))
 
         self._cache = False
 
@@ -254,16 +256,49 @@ class Query(metaclass=ABCMeta):
         """
         return self.query_state.value
 
-    def get_query(self):
+    def get_query(self, use_ctes: Optional[bool] = None):
         """
         Returns a  string representing an SQL query. The string will point
         to the database cache of this query if it exists.
 
+        Parameters
+        ----------
+        use_ctes : bool, optional
+            Set to True to emit the SQL of each distinct subquery which isn't
+            stored once, as a common table expression referenced wherever the
+            subquery is used, instead of inlining it. Defaults to the current
+            mode (see `flowmachine.core.query_compilation.common_subexpressions_as_ctes`).
+
         Returns
         -------
         str
             SQL query string.
 
+        Notes
+        -----
+        Whether this query is stored, and the SQL compiled for it, are cached
+        until a query is stored or reset (see `flowmachine.core.sql_cache`).
+
+        """
+        with sql_cache.compilation():
+            stored_query = sql_cache.get(self, "stored")
+            if stored_query is NOT_CACHED:
+                with sql_cache.computing() as stored_query_ids:
+                    stored_query = self._get_stored_query()
+                sql_cache.put(self, "stored", stored_query, stored_query_ids)
+            if stored_query is not None:
+                return stored_query
+            return compile_query(self, use_ctes=use_ctes)
+
+    def _get_stored_query(self) -> Optional[str]:
+        """
+        Get SQL selecting from this query's cache table, if it is stored. Waits
+        if the query is currently being stored or reset.
+
+        Returns
+        -------
+        str or None
+            SQL selecting from the cache table, or None if this query isn't stored
         """
         try:
             table_name = self.fully_qualified_table_name
@@ -275,23 +310,51 @@ class Query(metaclass=ABCMeta):
             if state_machine.is_completed and get_db().has_table(
                 schema=schema, name=name
             ):
-                try:
-                    touch_cache(get_db(), self.query_id)
-                except ValueError:
-                    pass  # Cache record not written yet, which can happen for Models
-                    # which will call through to this method from their `_make_query` method while writing metadata.
-                # In that scenario, the table _is_ written, but won't be visible from the connection touch_cache uses
-                # as the cache metadata transaction isn't complete!
+                # The cache record may not be visible yet, which can happen for Models
+                # which will call through to this method from their `_make_query` method while writing metadata.
+                # In that scenario, the table _is_ written, but the cache metadata transaction isn't complete,
+                # and the record isn't touched.
+                sql_cache.read_stored(self)
                 return "SELECT * FROM {}".format(table_name)
         except NotImplementedError:
             pass
-        return self._make_query()
+        return None
+
+    def _dataframe_cache_key(self, fetch_method: str = "sql"):
+        """
+        Key this query's result is held under in the process-wide dataframe cache.
+        Results fetched with each fetch method are held separately, because
+        the types of their columns differ.
 
-    def get_dataframe_async(self):
+        Parameters
+        ----------
+        fetch_method : {"sql", "copy"}, default "sql"
+            Fetch method the result was fetched with
+        """
+        try:
+            conn_id = get_db().conn_id
+        except NotConnectedError:
+            conn_id = None
+        return conn_id, self.query_id, fetch_method
+
+    def get_dataframe_async(self, copy: bool = True, fetch_method: str = "sql"):
         """
         Execute the query in a worker thread and return a future object
         which will contain the result as a pandas dataframe when complete.
 
+        Parameters
+        ----------
+        copy : bool, default True
+            If False, and caching is on, return a shallow copy which shares
+            its data with the cached dataframe instead of a full copy. This
+            avoids duplicating large results, but the returned dataframe must
+            be treated as read-only.
+        fetch_method : {"sql", "copy"}, default "sql"
+            How to fetch the result. "sql" uses `pandas.read_sql_query`, "copy"
+            streams the result with COPY ... TO STDOUT and parses it column-wise,
+            which is much faster and uses less memory for large results (see
+            `Connection.copy_to_dataframe` for the differences in types).
+
         Returns
         -------
         Future
@@ -300,41 +363,87 @@ class Query(metaclass=ABCMeta):
         Notes
         -----
         This should be executed with care, as the results may consume
-        large amounts of memory
+        large amounts of memory. Dataframes retained when caching is on are
+        held in a process-wide cache with a fixed memory budget (see
+        `flowmachine.core.dataframe_cache`), so may be evicted and re-fetched.
 
         """
+        if fetch_method not in ("sql", "copy"):
+            raise ValueError(
+                f"'{fetch_method}' is not a valid fetch method. Use 'sql' or 'copy'."
+            )
+
+        def fetch():
+            qur = (
+                f"SELECT {self.column_names_as_string_list} FROM ({self.get_query()}) _"
+            )
+            if fetch_method == "copy":
+                return get_db().copy_to_dataframe(qur)
+            with get_db().engine.begin():
+                return pd.read_sql_query(qur, con=get_db().engine)
 
         def do_get():
             if self._cache:
-                try:
-                    return self._df.copy()
-                except AttributeError:
-                    qur = f"SELECT {self.column_names_as_string_list} FROM ({self.get_query()}) _"
-                    with get_db().engine.begin():
-                        self._df = pd.read_sql_query(qur, con=get_db().engine)
-
-                    return self._df.copy()
+                key = self._dataframe_cache_key(fetch_method)
+                df = dataframe_cache.get(key)
+                if df is None:
+                    df = fetch()
+                    dataframe_cache.put(key, df)
+                return df.copy(deep=copy)
             else:
-                qur = f"SELECT {self.column_names_as_string_list} FROM ({self.get_query()}) _"
-                with get_db().engine.begin():
-                    return pd.read_sql_query(qur, con=get_db().engine)
+                return fetch()
 
         df_future = submit_to_executor(do_get)
         return df_future
 
-    def get_dataframe(self):
+    def get_dataframe(self, copy: bool = True, fetch_method: str = "sql"):
         """
         Executes the query and return the result as a pandas dataframe.
         This should be executed with care, as the results may consume large
         amounts of memory.
 
+        Parameters
+        ----------
+        copy : bool, default True
+            If False, and caching is on, return a shallow copy which shares
+            its data with the cached dataframe instead of a full copy. The
+            returned dataframe must be treated as read-only.
+        fetch_method : {"sql", "copy"}, default "sql"
+            How to fetch the result. "copy" streams the result with COPY,
+            which is faster and uses less memory for large results.
+
         Returns
         -------
         pandas.DataFrame
             DataFrame containing results of the query.
 
         """
-        return self.get_dataframe_async().result()
+        return self.get_dataframe_async(copy=copy, fetch_method=fetch_method).result()
+
+    def iter_batches(self, batch_size: int = 10000) -> Iterator[pd.DataFrame]:
+        """
+        Iterate over the result of the query as dataframes of at most
+        `batch_size` rows. The rows are read using a server-side cursor, so
+        only one batch is held in memory at a time.
+
+        Parameters
+        ----------
+        batch_size : int, default 10000
+            Maximum number of rows in each dataframe
+
+        Yields
+        ------
+        pandas.DataFrame
+            The next batch of rows of the result
+
+        Examples
+        --------
+        >>> total = 0
+        >>> for batch in daily_location("2016-01-01").iter_batches(batch_size=100):
+        ...     total += len(batch)
+        """
+        qur = f"SELECT {self.column_names_as_string_list} FROM ({self.get_query()}) _"
+        yield from get_db().fetch_batches(qur, batch_size=batch_size)
 
     @property
     @abstractmethod
@@ -375,6 +484,10 @@ class Query(metaclass=ABCMeta):
         pandas.DataFrame
             A DataFrame containing n results
         """
+        if self._cache:
+            df = dataframe_cache.get(self._dataframe_cache_key())
+            if df is not None:
+                return df.head(n)
         try:
             return self._df.head(n)
         except AttributeError:
@@ -537,7 +650,7 @@ class Query(metaclass=ABCMeta):
             return []
 
         Q = f"""EXPLAIN (ANALYZE TRUE, TIMING FALSE, FORMAT JSON) CREATE TABLE {full_name} AS 
-        (SELECT {self.column_names_as_string_list} FROM ({self._make_query()}) _)"""
+        (SELECT {self.column_names_as_string_list} FROM ({compile_query(self)}) _)"""
         queries.append(Q)
         for ix in self.index_cols:
             queries.append(
@@ -574,7 +687,8 @@ class Query(metaclass=ABCMeta):
         Notes
         -----
 
-        This method will return a Future immediately.
+        This method will return a Future immediately. If `store_dependencies` is True,
+        this query is only set running once its dependencies have been stored.
         """
         if len(name) > MAX_POSTGRES_NAME_LENGTH:
             err_msg = (
@@ -606,9 +720,11 @@ class Query(metaclass=ABCMeta):
             return plan_time
 
         if store_dependencies:
-            store_queries_in_order(
+            dependency_futures = store_queries_in_order(
                 unstored_dependencies_graph(self)
             )  # Need to ensure we're behind our deps in the queue
+        else:
+            dependency_futures = {}
 
         ddl_ops_func = self._make_sql
 
@@ -619,7 +735,8 @@ class Query(metaclass=ABCMeta):
             f"Attempted to enqueue query '{self.query_id}', query state is now {current_state} and change happened {'here and now' if changed_to_queue else 'elsewhere'}."
         )
         # name, redis, query, connection, ddl_ops_func, write_func, schema = None, sleep_duration = 1
-        store_future = submit_to_executor(
+        store_future = submit_to_executor_after(
+            dependency_futures.values(),
             write_query_to_cache,
             name=name,
             schema=schema,
@@ -856,6 +973,11 @@ class Query(metaclass=ABCMeta):
                                 self.fully_qualified_table_name
                             )
                         )
+                        (
+                            table_schema,
+                            table_name,
+                        ) = self.fully_qualified_table_name.split(".")
+                        get_db().invalidate_catalog_cache(table_name, table_schema)
                         logger.debug(
                             "Dropped cache for for {}.".format(
                                 self.fully_qualified_table_name
@@ -883,6 +1005,8 @@ class Query(metaclass=ABCMeta):
             logger.debug("Dropping {}".format(full_name))
             with con.begin():
                 con.execute("DROP TABLE IF EXISTS {}".format(full_name))
+            if name is not None:
+                get_db().invalidate_catalog_cache(name, schema)
             q_state_machine.finish_resetting()
         elif q_state_machine.is_resetting:
             logger.debug(
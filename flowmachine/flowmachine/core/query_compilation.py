@@ -0,0 +1,185 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Compiling a tree of queries to a single SQL statement.
+
+By default, each query's SQL inlines the SQL of every subquery it uses, so a
+subquery used in several places (e.g. the same `EventTableSubset` joined to
+itself) appears, and is planned and computed, once for each place it is used,
+and the SQL for deep trees grows exponentially.
+
+Alternatively, queries can be compiled with each distinct subquery (by query
+id) emitted once, as a common table expression which is referenced by name
+wherever the subquery is used. The SQL then grows linearly with the number of
+distinct subqueries, and a subquery used more than once is only computed once.
+Subqueries which are already stored are referenced by their cache table as
+usual, rather than as common table expressions.
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Optional
+
+from flowmachine.core.sql_cache import NOT_CACHED, sql_cache
+
+if TYPE_CHECKING:
+    from flowmachine.core.query import Query
+
+try:
+    cte_mode
+except NameError:
+    cte_mode = ContextVar("cte_mode", default=False)
+
+try:
+    cte_compilation
+except NameError:
+    cte_compilation = ContextVar("cte_compilation", default=None)
+
+
+class CTECompilation:
+    """
+    The common table expressions collected while compiling a query to SQL.
+    """
+
+    def __init__(self):
+        self.ctes = OrderedDict()
+        self.reference_counts = {}
+
+    @staticmethod
+    def cte_name(query: "Query") -> str:
+        """
+        Name of the common table expression for a query.
+
+        Parameters
+        ----------
+        query : Query
+
+        Returns
+        -------
+        str
+        """
+        return f"q_{query.query_id}"
+
+    def reference(self, query: "Query") -> str:
+        """
+        Get SQL selecting from the common table expression for a query,
+        compiling the query if it hasn't been already.
+
+        Parameters
+        ----------
+        query : Query
+            Query to reference
+
+        Returns
+        -------
+        str
+            SQL selecting the result of the query
+        """
+        name = self.cte_name(query)
+        if name not in self.ctes:
+            # Compiling the query adds the expressions for its own subqueries
+            # first, so every expression comes after those it refers to.
+            sql = query._make_query()
+            self.ctes[name] = sql
+            self.reference_counts[name] = 0
+        self.reference_counts[name] += 1
+        return f"SELECT * FROM {name}"
+
+    def with_ctes(self, sql: str) -> str:
+        """
+        Add the collected common table expressions to a query's SQL.
+
+        Expressions referenced more than once are materialised, so that they
+        are only computed once; others are left to be inlined by the planner.
+
+        Parameters
+        ----------
+        sql : str
+            SQL referencing the collected common table expressions
+
+        Returns
+        -------
+        str
+            Complete SQL statement
+        """
+        if len(self.ctes) == 0:
+            return sql
+        ctes = ",\n".join(
+            f"{name} AS {'MATERIALIZED ' if self.reference_counts[name] > 1 else ''}({cte_sql})"
+            for name, cte_sql in self.ctes.items()
+        )
+        if sql.lstrip()[:4].upper() == "WITH":
+            sql = f"SELECT * FROM ({sql}) _"
+        return f"WITH {ctes}\n{sql}"
+
+
+def compile_query(query: "Query", use_ctes: Optional[bool] = None) -> str:
+    """
+    Compile a query which is not stored to SQL. The SQL is cached until any
+    query is stored or reset (see `flowmachine.core.sql_cache`).
+
+    Parameters
+    ----------
+    query : Query
+        Query to compile
+    use_ctes : bool, optional
+        Set to True to emit each distinct subquery once, as a common table
+        expression. Defaults to the current mode (see `common_subexpressions_as_ctes`).
+        Ignored when called while compiling another query with common table
+        expressions, in which case the query becomes one of its expressions.
+
+    Returns
+    -------
+    str
+        SQL for the query
+    """
+    compilation = cte_compilation.get()
+    if compilation is not None:
+        return compilation.reference(query)
+    if use_ctes is None:
+        use_ctes = cte_mode.get()
+    kind = "ctes" if use_ctes else "inline"
+    with sql_cache.compilation():
+        sql = sql_cache.get(query, kind)
+        if sql is NOT_CACHED:
+            with sql_cache.computing() as stored_query_ids:
+                if use_ctes:
+                    compilation = CTECompilation()
+                    token = cte_compilation.set(compilation)
+                    try:
+                        sql = compilation.with_ctes(query._make_query())
+                    finally:
+                        cte_compilation.reset(token)
+                else:
+                    sql = query._make_query()
+            sql_cache.put(query, kind, sql, stored_query_ids)
+    return sql
+
+
+@contextmanager
+def common_subexpressions_as_ctes(enabled: bool = True):
+    """
+    Context manager which sets whether queries are compiled with each distinct
+    subquery emitted once, as a common table expression, within the context.
+
+    Applies to the SQL of queries when they are run (e.g. `get_dataframe`) or
+    stored, and to `Query.get_query`.
+
+    Parameters
+    ----------
+    enabled : bool, default True
+        Set to False to inline the SQL of every subquery within the context
+
+    Examples
+    --------
+    >>> with common_subexpressions_as_ctes():
+    ...     sql = query.get_query()
+    """
+    token = cte_mode.set(enabled)
+    try:
+        yield
+    finally:
+        cte_mode.reset(token)
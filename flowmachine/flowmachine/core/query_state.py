@@ -8,19 +8,76 @@ State machine for queries. Tracks where in a lifecycle a query is to allow
 waiting for a query to finish running, and reporting status to the user.
 """
 
+import asyncio
 import logging
+import uuid
+from contextlib import contextmanager
 from enum import Enum
 
 from finist import Finist
-from typing import Tuple
+from typing import Tuple, Optional
 
 from redis import StrictRedis
+from redis.client import PubSub
+from redis.exceptions import RedisError
 
 from flowmachine.utils import _sleep
 
 logger = logging.getLogger("flowmachine").getChild(__name__)
 
 
+def _wait_for_message(pubsub: Optional[PubSub], timeout: float) -> None:
+    """
+    Block until a message is received on a redis subscription, or
+    until `timeout` seconds have elapsed. If there is no subscription,
+    simply sleeps for `timeout` seconds.
+
+    Parameters
+    ----------
+    pubsub : PubSub or None
+        Subscription to wait on
+    timeout : float
+        Maximum number of seconds to wait
+    """
+    if pubsub is None:
+        _sleep(timeout)
+    else:
+        pubsub.get_message(timeout=timeout)
+
+
+# Changed whenever a query is stored or reset by this process, so that caches
+# can see the change immediately without checking redis.
+_local_stored_queries_version = 0
+
+
+def get_local_stored_queries_version() -> int:
+    """
+    Get the version of the set of stored queries as changed by this process.
+
+    Returns
+    -------
+    int
+    """
+    return _local_stored_queries_version
+
+
+def stored_queries_version_key(db_id: str) -> str:
+    """
+    Get the redis key of the version of the set of stored queries, which is
+    changed whenever a query is stored or reset.
+
+    Parameters
+    ----------
+    db_id : str
+        FlowDB connection id
+
+    Returns
+    -------
+    str
+    """
+    return f"finist:{db_id}:stored-queries-version"
+
+
 class QueryState(str, Enum):
     """
     Possible states for a query to be in.
@@ -99,10 +156,19 @@ class QueryStateMachine:
     Creating a new instance of a state machine for a query will not alter the state, as
     the state is persisted in redis.
 
+    Every successful state transition is published to the redis channel named by
+    `state_change_channel`, which allows `wait_until_complete` to wake up as soon as
+    the query leaves a blocking state rather than polling redis. Storing or resetting
+    a query also changes the version of the set of stored queries (see
+    `flowmachine.core.sql_cache`).
+
     """
 
     def __init__(self, redis_client: StrictRedis, query_id: str, db_id: str):
         self.query_id = query_id
+        self.db_id = db_id
+        self.redis_client = redis_client
+        self.state_change_channel = f"finist:{db_id}:{query_id}-state-changes"
         must_populate = redis_client.get(f"finist:{db_id}:{query_id}-state") is None
         self.state_machine = Finist(
             redis_client, f"{db_id}:{query_id}-state", QueryState.KNOWN
@@ -257,7 +323,28 @@ class QueryStateMachine:
 
         """
         state, trigger_success = self.state_machine.trigger(event)
-        return QueryState(state.decode()), trigger_success
+        new_state = QueryState(state.decode())
+        if trigger_success:
+            try:
+                self.redis_client.publish(self.state_change_channel, new_state.value)
+            except RedisError as exc:
+                # Waiters will still see the change when their subscription times out
+                logger.warning(
+                    f"Failed to publish state change of '{self.query_id}' to {new_state}: {exc}"
+                )
+            if event in (QueryEvent.FINISH, QueryEvent.RESET, QueryEvent.FINISH_RESET):
+                # Invalidates SQL compiled while the query was (or wasn't) stored
+                global _local_stored_queries_version
+                _local_stored_queries_version += 1
+                try:
+                    self.redis_client.set(
+                        stored_queries_version_key(self.db_id), uuid.uuid4().hex
+                    )
+                except RedisError as exc:
+                    logger.warning(
+                        f"Failed to update the stored queries version after '{self.query_id}' changed to {new_state}: {exc}"
+                    )
+        return new_state, trigger_success
 
     def cancel(self):
         """
@@ -350,14 +437,87 @@ class QueryStateMachine:
         """
         return self.trigger_event(QueryEvent.FINISH_RESET)
 
+    @contextmanager
+    def _state_change_subscription(self):
+        """
+        Context manager which subscribes to the state change notifications for this
+        query, and yields the subscription. Yields None if subscribing failed, in which
+        case waiters fall back to polling.
+        """
+        try:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(self.state_change_channel)
+        except RedisError as exc:
+            logger.warning(
+                f"Failed to subscribe to state changes of '{self.query_id}', falling back to polling: {exc}"
+            )
+            yield None
+            return
+        try:
+            yield pubsub
+        finally:
+            pubsub.close()
+
     def wait_until_complete(self, sleep_duration=1):
         """
         Blocks until the query is in a state where its result is determinate
         (i.e., one of "know", "errored", "completed", "cancelled").
 
+        Parameters
+        ----------
+        sleep_duration : int, default 1
+            Maximum number of seconds to wait for a state change notification
+            before checking the state again.
+
+        Notes
+        -----
+        The subscription to state changes is made _before_ the state is checked,
+        so a transition which happens between checking and waiting is not missed.
         """
         if self.is_executing or self.is_queued or self.is_resetting:
-            while not (
-                self.is_finished_executing or self.is_cancelled or self.is_known
-            ):
-                _sleep(sleep_duration)
+            with self._state_change_subscription() as pubsub:
+                while not (
+                    self.is_finished_executing or self.is_cancelled or self.is_known
+                ):
+                    _wait_for_message(pubsub, sleep_duration)
+
+    async def wait_for_state_change(
+        self, state: QueryState, timeout: float, check_interval: float = 0.1
+    ) -> QueryState:
+        """
+        Wait, without blocking the event loop, until the query is no longer in
+        `state` or until `timeout` seconds have elapsed.
+
+        Parameters
+        ----------
+        state : QueryState
+            State to wait for the query to leave
+        timeout : float
+            Maximum number of seconds to wait
+        check_interval : float, default 0.1
+            Number of seconds to wait between checks for a state change
+            notification
+
+        Returns
+        -------
+        QueryState
+            The query's state once waiting has finished
+
+        Notes
+        -----
+        The state is only read from redis again when a state change notification is
+        received (or every `check_interval` seconds if subscribing to notifications
+        failed), so many waiters can be kept open cheaply.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        with self._state_change_subscription() as pubsub:
+            current_state = self.current_query_state
+            while current_state == state:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(check_interval, remaining))
+                if pubsub is None or pubsub.get_message(timeout=0) is not None:
+                    current_state = self.current_query_state
+        return current_state
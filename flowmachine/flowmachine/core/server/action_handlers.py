@@ -18,12 +18,12 @@ from contextvars import copy_context
 from functools import partial
 import json
 import textwrap
-from typing import Callable, Union
+from typing import Callable, Optional, Union
 
 from marshmallow import ValidationError
 
 from flowmachine.core.context import get_db, get_redis
-from flowmachine.core.cache import get_query_object_by_id
+from flowmachine.core.cache import get_cached_query_record, get_query_object_by_id
 from flowmachine.core.query_info_lookup import (
     QueryInfoLookup,
     UnkownQueryIdError,
@@ -33,7 +33,8 @@ from flowmachine.core.query_state import QueryStateMachine, QueryState
 from flowmachine.utils import convert_dict_keys_to_strings
 from .exceptions import FlowmachineServerError
 from .query_schemas import FlowmachineQuerySchema, GeographySchema
-from .query_schemas.flowmachine_query import get_query_schema
+from .query_schemas.flowmachine_query import get_query_schema, get_query_schema_hash
+from .result_selection import ResultSelectionSchema, select_from_result
 from .zmq_helpers import ZMQReply
 
 __all__ = ["perform_action"]
@@ -63,16 +64,26 @@ async def action_handler__get_available_queries(
 
 
 async def action_handler__get_query_schemas(
-    config: "FlowmachineServerConfig",
+    config: "FlowmachineServerConfig", schemas_hash: Optional[str] = None
 ) -> ZMQReply:
     """
     Handler for the 'get_query_schemas' action.
 
     Returns a dict with all supported flowmachine queries as keys
-    and the associated schema for the query parameters as values.
+    and the associated schema for the query parameters as values,
+    and a hash identifying this version of the schemas. If `schemas_hash`
+    is the hash of the current schemas, only the hash is returned.
     """
-
-    return ZMQReply(status="success", payload={"query_schemas": get_query_schema()})
+    current_hash = get_query_schema_hash()
+    if schemas_hash == current_hash:
+        return ZMQReply(status="success", payload={"query_schemas_hash": current_hash})
+    return ZMQReply(
+        status="success",
+        payload={
+            "query_schemas": get_query_schema(),
+            "query_schemas_hash": current_hash,
+        },
+    )
 
 
 async def action_handler__run_query(
@@ -191,12 +202,15 @@ def _get_query_kind_for_query_id(query_id: str) -> Union[None, str]:
 
 
 async def action_handler__poll_query(
-    config: "FlowmachineServerConfig", query_id: str
+    config: "FlowmachineServerConfig", query_id: str, wait: float = 0
 ) -> ZMQReply:
     """
     Handler for the 'poll_query' action.
 
-    Returns the status of the query with the given `query_id`.
+    Returns the status of the query with the given `query_id`. If `wait` is
+    given and the query is queued or executing, waits up to `wait` seconds for
+    its state to change before replying, so that clients can long-poll instead
+    of repeatedly polling.
     """
     query_kind = _get_query_kind_for_query_id(query_id)
     # TODO: we should probably be able to use the QueryStateMachine to determine
@@ -208,10 +222,15 @@ async def action_handler__poll_query(
         )
     else:
         q_state_machine = QueryStateMachine(get_redis(), query_id, get_db().conn_id)
+        query_state = q_state_machine.current_query_state
+        if wait > 0 and query_state in (QueryState.QUEUED, QueryState.EXECUTING):
+            query_state = await q_state_machine.wait_for_state_change(
+                query_state, timeout=wait
+            )
         payload = {
             "query_id": query_id,
             "query_kind": query_kind,
-            "query_state": q_state_machine.current_query_state,
+            "query_state": query_state,
             "progress": query_progress(
                 FlowmachineQuerySchema()
                 .load(QueryInfoLookup(get_redis()).get_query_params(query_id))
@@ -261,13 +280,14 @@ async def action_handler__get_query_params(
 
 
 async def action_handler__get_sql(
-    config: "FlowmachineServerConfig", query_id: str
+    config: "FlowmachineServerConfig", query_id: str, selection: Optional[dict] = None,
 ) -> ZMQReply:
     """
     Handler for the 'get_sql' action.
 
     Returns a SQL string which can be run against flowdb to obtain
-    the result of the query with given `query_id`.
+    the result of the query with given `query_id`, or the part of it
+    described by `selection` (see `ResultSelectionSchema`).
     """
     # TODO: currently we can't use QueryStateMachine to determine whether
     # the query_id belongs to a valid query object, so we need to check it
@@ -284,9 +304,37 @@ async def action_handler__get_sql(
     ).current_query_state
 
     if query_state == QueryState.COMPLETED:
-        q = get_query_object_by_id(get_db(), query_id)
-        sql = q.get_query()
-        payload = {"query_id": query_id, "query_state": query_state, "sql": sql}
+        try:
+            # The SQL for a completed query only depends on its cache table
+            schema, table_name, created = get_cached_query_record(get_db(), query_id)
+            sql = f"SELECT * FROM {schema}.{table_name}"
+            columns = get_db().table_columns(table_name, schema)
+            created = created.isoformat()
+        except ValueError:
+            # Removed from cache since checking the state
+            q = get_query_object_by_id(get_db(), query_id)
+            sql, columns, created = q.get_query(), q.column_names, None
+        if selection is not None:
+            try:
+                sql = select_from_result(
+                    sql,
+                    available_columns=columns,
+                    **ResultSelectionSchema().load(selection),
+                )
+            except ValidationError as exc:
+                msg = f"Invalid result selection: {json.dumps(convert_dict_keys_to_strings(exc.messages))}"
+                payload = {"query_id": query_id, "query_state": query_state}
+                return ZMQReply(status="error", msg=msg, payload=payload)
+            except ValueError as exc:
+                msg = f"Invalid result selection: {exc}"
+                payload = {"query_id": query_id, "query_state": query_state}
+                return ZMQReply(status="error", msg=msg, payload=payload)
+        payload = {
+            "query_id": query_id,
+            "query_state": query_state,
+            "sql": sql,
+            "created": created,
+        }
         return ZMQReply(status="success", payload=payload)
     else:
         msg = f"Query with id '{query_id}' {query_state.description}."
@@ -319,6 +367,10 @@ async def action_handler__get_geo_sql(
 
     if query_state == QueryState.COMPLETED:
         q = get_query_object_by_id(get_db(), query_id)
+        try:
+            created = get_cached_query_record(get_db(), query_id)[2].isoformat()
+        except ValueError:
+            created = None
         try:
             sql = q.geojson_query()
             payload = {
@@ -326,6 +378,7 @@ async def action_handler__get_geo_sql(
                 "query_state": query_state,
                 "sql": sql,
                 "aggregation_unit": q.spatial_unit.canonical_name,
+                "created": created,
             }
             return ZMQReply(status="success", payload=payload)
         except AttributeError:
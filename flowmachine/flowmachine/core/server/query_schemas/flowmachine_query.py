@@ -1,7 +1,9 @@
 # This Source Code Form is subject to the terms of the Mozilla Public
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
+import json
 from functools import lru_cache
+from hashlib import md5
 
 from apispec import APISpec
 from apispec_oneofschema import MarshmallowPlugin
@@ -87,3 +89,17 @@ def get_query_schema() -> dict:
     )
     spec.components.schema("FlowmachineQuerySchema", schema=FlowmachineQuerySchema)
     return spec.to_dict()["components"]["schemas"]
+
+
+@lru_cache(maxsize=1)
+def get_query_schema_hash() -> str:
+    """
+    Get a hash of the FlowmachineQuerySchema api spec, which changes whenever
+    the spec does.
+
+    Returns
+    -------
+    str
+
+    """
+    return md5(json.dumps(get_query_schema(), sort_keys=True).encode()).hexdigest()
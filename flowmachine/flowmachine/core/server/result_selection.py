@@ -0,0 +1,160 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Selecting part of the result of a query - a subset of its columns, the rows
+matching some values, or a page of rows - so that clients don't need to fetch
+the whole result.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+from marshmallow import Schema, ValidationError, fields, validates_schema
+from marshmallow.validate import Length, Range
+
+
+class ResultSelectionSchema(Schema):
+    """
+    Marshmallow schema for the part of a query result to get.
+
+    Keyset pagination (`order_by` and `after`) relies on the values of the
+    `order_by` columns being unique and not null.
+    """
+
+    # Columns to include (default: all)
+    columns = fields.List(fields.String(), validate=Length(min=1))
+    # Only include rows where these columns have these values
+    filters = fields.Dict(keys=fields.String(), values=fields.Raw(allow_none=True))
+    # Columns to order the rows by
+    order_by = fields.List(fields.String(), validate=Length(min=1))
+    # Only include rows which come after these values of the order_by columns
+    after = fields.List(fields.Raw(), validate=Length(min=1))
+    limit = fields.Integer(validate=Range(min=0))
+    offset = fields.Integer(validate=Range(min=0))
+
+    @validates_schema
+    def validate_after(self, data, **kwargs):
+        if "after" not in data:
+            return
+        if len(data["after"]) != len(data.get("order_by", ())):
+            raise ValidationError(
+                "Must have one value for each of the 'order_by' columns.", "after"
+            )
+
+    @validates_schema
+    def validate_values(self, data, **kwargs):
+        for field_name, values in (
+            ("filters", data.get("filters", {}).values()),
+            ("after", data.get("after", ())),
+        ):
+            if any(isinstance(value, (dict, list)) for value in values):
+                raise ValidationError("Values must be strings or numbers.", field_name)
+
+
+def _quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _quote_literal(value: Any) -> str:
+    # Literals are left untyped, so postgres interprets them as the type of
+    # the column they're compared to.
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def select_from_result(
+    sql: str,
+    *,
+    available_columns: Sequence[str],
+    columns: Optional[List[str]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    order_by: Optional[List[str]] = None,
+    after: Optional[List[Any]] = None,
+    limit: Optional[int] = None,
+    offset: Optional[int] = None,
+) -> str:
+    """
+    Get SQL which selects part of a query's result.
+
+    If a limit or offset is given without any columns to order by, rows are
+    ordered by all the selected columns, so that pages are consistent between
+    requests.
+
+    Parameters
+    ----------
+    sql : str
+        SQL selecting the whole result
+    available_columns : list of str
+        Names of the columns of the result
+    columns : list of str, optional
+        Columns to include
+    filters : dict, optional
+        Mapping from column names to the value rows must have in that column
+        (None to match null values)
+    order_by : list of str, optional
+        Columns to order rows by
+    after : list, optional
+        Only include rows which come after these values of the `order_by` columns
+    limit : int, optional
+        Maximum number of rows to include
+    offset : int, optional
+        Number of rows to skip
+
+    Returns
+    -------
+    str
+        SQL selecting the requested part of the result
+
+    Raises
+    ------
+    ValueError
+        If any of the columns aren't columns of the result
+    """
+    unknown_columns = (
+        set(columns or ()) | set(filters or ()) | set(order_by or ())
+    ) - set(available_columns)
+    if len(unknown_columns) > 0:
+        raise ValueError(
+            f"Unknown column(s): {', '.join(sorted(unknown_columns))}. "
+            f"Available columns are: {', '.join(available_columns)}."
+        )
+    if (
+        columns is None
+        and filters is None
+        and order_by is None
+        and limit is None
+        and offset is None
+    ):
+        return sql
+
+    if columns is None:
+        selected = "*"
+    else:
+        selected = ", ".join(_quote_identifier(column) for column in columns)
+    conditions = [
+        f"{_quote_identifier(column)} IS NULL"
+        if value is None
+        else f"{_quote_identifier(column)} = {_quote_literal(value)}"
+        for column, value in (filters or {}).items()
+    ]
+    if after is not None:
+        conditions.append(
+            f"({', '.join(_quote_identifier(column) for column in order_by)}) > "
+            f"({', '.join(_quote_literal(value) for value in after)})"
+        )
+    if order_by is None and (limit is not None or offset is not None):
+        order_by = columns if columns is not None else available_columns
+
+    sql = sql.strip().rstrip(";")
+    selection_sql = f"SELECT {selected} FROM ({sql}) AS _"
+    if len(conditions) > 0:
+        selection_sql += f" WHERE {' AND '.join(conditions)}"
+    if order_by is not None:
+        selection_sql += (
+            f" ORDER BY {', '.join(_quote_identifier(column) for column in order_by)}"
+        )
+    if limit is not None:
+        selection_sql += f" LIMIT {int(limit)}"
+    if offset is not None:
+        selection_sql += f" OFFSET {int(offset)}"
+    return selection_sql
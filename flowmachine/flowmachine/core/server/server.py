@@ -14,7 +14,7 @@ import signal
 import structlog
 import zmq
 from functools import partial
-from typing import NoReturn
+from typing import List, NoReturn
 
 from marshmallow import ValidationError
 from zmq.asyncio import Context
@@ -112,9 +112,10 @@ async def receive_next_zmq_message_and_send_back_reply(
     Listen on the given zmq socket for the next multipart message, .
 
     Note that the only responsibility of this function is to ensure
-    that the incoming zmq message has the expected structure (three
-    parts of the form `return_address, empty_delimiter, msg`) and to
-    send back the reply. The responsibility for actually processing
+    that the incoming zmq message has the expected structure (a return
+    address of one or more parts, an empty delimiter, and the message, as
+    sent by a REQ socket or a DEALER socket which prefixes a request id),
+    and to send back the reply. The responsibility for actually processing
     the message and calculating the reply lies with other functions.
 
     Parameters
@@ -132,16 +133,16 @@ async def receive_next_zmq_message_and_send_back_reply(
     # Check structural integrity of the zmq multipart message.
     # Ignore it if it doesn't have the expected structure.
     #
-    if len(multipart_msg) != 3:
+    if len(multipart_msg) < 3:
         logger.error(
-            "Multipart message did not contain the expected three parts. Ignoring this message "
+            "Multipart message did not contain the expected three or more parts. Ignoring this message "
             "as it cannot have come from FlowAPI and we cannot determine a return address."
         )
         return
 
-    return_address, empty_delimiter, msg_contents = multipart_msg
+    *return_address, empty_delimiter, msg_contents = multipart_msg
 
-    if empty_delimiter != b"":
+    if empty_delimiter != b"" or b"" in return_address:
         logger.error(
             "Multipart message did not have the expected structure. "
             "Ignoring this message as it cannot have come from FlowAPI."
@@ -167,7 +168,7 @@ async def receive_next_zmq_message_and_send_back_reply(
 async def calculate_and_send_reply_for_message(
     *,
     socket: "zmq.asyncio.Socket",
-    return_address: bytes,
+    return_address: List[bytes],
     msg_contents: str,
     config: "FlowmachineServerConfig",
 ) -> None:
@@ -180,8 +181,9 @@ async def calculate_and_send_reply_for_message(
     ----------
     socket : zmq.asyncio.Socket
         The zmq socket to use for sending the reply.
-    return_address : bytes
-        The zmq return address to which to send the reply.
+    return_address : list of bytes
+        The zmq return address to which to send the reply, including any
+        request id the sender prefixed to the message.
     msg_contents : str
         JSON string with the message contents.
     config : FlowmachineServerConfig
@@ -198,7 +200,7 @@ async def calculate_and_send_reply_for_message(
         )
         reply_json = ZMQReply(status="error", msg="Could not get reply for message")
     await socket.send_multipart(
-        [return_address, b"", rapidjson.dumps(reply_json).encode()]
+        [*return_address, b"", rapidjson.dumps(reply_json).encode()]
     )
     logger.debug("Sent reply", reply=reply_json, msg=msg_contents)
 
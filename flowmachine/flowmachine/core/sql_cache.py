@@ -0,0 +1,354 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Process-wide in-memory cache of the SQL compiled for queries.
+
+Getting the SQL for a query which isn't stored means getting the SQL for each
+of its subqueries, which involves checking in redis and FlowDB whether each of
+them is stored. The SQL only changes when a subquery is stored or reset, so
+whether each query is stored, and the SQL compiled for it, are cached by query id.
+
+Whenever any query is stored or reset, the version of the set of stored queries
+recorded in redis changes (see `QueryStateMachine.trigger_event`). The cached
+entries for a connection are dropped when its version has changed, which is
+checked once at the start of each compilation rather than for every subquery,
+so compiling the same tree again makes no other requests to redis or FlowDB.
+Queries stored or reset by this process drop the cached entries immediately,
+even part way through a compilation.
+
+If the connection targets partitions, the SQL for event table subsets selects
+from the per-day child tables for the dates which have been ingested, so the
+version also includes the ingested dates (which are re-read from FlowDB at most
+every two minutes), and entries are dropped once another date is ingested.
+
+Reading a stored query's cache table counts as an access to it, which raises
+its cache score (see `flowmachine.core.cache.touch_cache`). Each cached entry
+records the stored queries its SQL reads, and every stored query read by the SQL
+compiled during a compilation, whether cached or not, is touched once, in a
+single statement, when the compilation ends.
+
+The number of entries held defaults to the value of the FLOWMACHINE_SQL_CACHE_SIZE
+environment variable, or 4096 if that is not set.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import RLock
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Hashable,
+    Iterable,
+    NamedTuple,
+    Optional,
+    Set,
+)
+
+import structlog
+from cachetools import LRUCache
+from get_secret_or_env_var import getenv
+from redis.exceptions import RedisError
+
+from flowmachine.core.context import get_db, get_redis
+from flowmachine.core.errors import NotConnectedError
+from flowmachine.core.query_state import (
+    get_local_stored_queries_version,
+    stored_queries_version_key,
+)
+
+if TYPE_CHECKING:
+    from flowmachine.core.connection import Connection
+    from flowmachine.core.query import Query
+
+logger = structlog.get_logger("flowmachine.debug", submodule=__name__)
+
+DEFAULT_SQL_CACHE_SIZE = 4096
+
+# Returned by SQLCache.get for entries which aren't cached, because None is a valid entry
+NOT_CACHED = object()
+
+try:
+    current_compilation
+except NameError:
+    current_compilation = ContextVar("current_compilation", default=None)
+
+try:
+    current_dependencies
+except NameError:
+    current_dependencies = ContextVar("current_dependencies", default=None)
+
+
+def ingested_dates_version(connection: "Connection") -> Optional[int]:
+    """
+    Get a version of the set of dates ingested into each events table, which
+    the SQL for queries depends on if the connection targets partitions.
+
+    Parameters
+    ----------
+    connection : Connection
+
+    Returns
+    -------
+    int or None
+        Hash of the ingested dates, or None if the connection doesn't target
+        partitions.
+    """
+    if not connection.target_partitions:
+        return None
+    return hash(
+        frozenset(
+            (table, frozenset(dates))
+            for table, dates in connection.available_dates.items()
+        )
+    )
+
+
+class _Compilation(NamedTuple):
+    # The versions of the set of stored queries (and of the ingested dates)
+    # when a compilation started
+    conn_id: str
+    version: Hashable
+    local_version: int
+    # Ids of the stored queries read by the SQL compiled so far
+    stored_query_ids: Set[str]
+
+
+class SQLCache:
+    """
+    Thread safe least-recently-used cache of the SQL compiled for queries, and
+    of whether queries are stored.
+
+    Entries are only read and written during a compilation (see `compilation`),
+    once the cache has been checked against the current version of the set of
+    stored queries.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of entries to hold
+    """
+
+    def __init__(self, maxsize: int):
+        self._lock = RLock()
+        self._cache = LRUCache(maxsize=maxsize)
+        self._versions = {}
+        self._local_version = get_local_stored_queries_version()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def check_version(self, conn_id: str, version: Hashable) -> None:
+        """
+        Drop the entries for a connection if the version of its set of stored
+        queries, or of its ingested dates, has changed since they were cached.
+
+        Parameters
+        ----------
+        conn_id : str
+            Connection id
+        version : hashable
+            Current version of the connection's set of stored queries and
+            ingested dates
+        """
+        with self._lock:
+            if conn_id in self._versions and self._versions[conn_id] == version:
+                return
+            for key in [key for key in self._cache.keys() if key[0] == conn_id]:
+                del self._cache[key]
+            self._versions[conn_id] = version
+            logger.debug("SQL cache version changed.", conn_id=conn_id)
+
+    def _check_local_version(self) -> None:
+        local_version = get_local_stored_queries_version()
+        if local_version != self._local_version:
+            self._cache.clear()
+            self._local_version = local_version
+
+    @contextmanager
+    def compilation(self):
+        """
+        Context manager within which the cache is used. On entering the outermost
+        compilation, the cache is checked against the current version of the
+        set of stored queries and ingested dates, and on leaving it the cache records of the stored
+        queries read by the compiled SQL are touched. If redis or FlowDB aren't
+        connected, the cache is not used.
+        """
+        if current_compilation.get() is not None:
+            yield
+            return
+        try:
+            db = get_db()
+            conn_id = db.conn_id
+            version = (
+                get_redis().get(stored_queries_version_key(conn_id)),
+                ingested_dates_version(db),
+            )
+        except (NotConnectedError, RedisError) as exc:
+            logger.debug("Not using SQL cache.", reason=str(exc))
+            compilation = False
+        else:
+            with self._lock:
+                self.check_version(conn_id, version)
+                self._check_local_version()
+                compilation = _Compilation(conn_id, version, self._local_version, set())
+        token = current_compilation.set(compilation)
+        try:
+            yield
+        finally:
+            current_compilation.reset(token)
+        if compilation:
+            self._touch(compilation.stored_query_ids)
+
+    @contextmanager
+    def computing(self):
+        """
+        Context manager within which an entry is computed. Yields the set of
+        ids of the stored queries read by the entry's SQL, which is filled in
+        on leaving the context and should be passed to `put` with the entry.
+        """
+        parent = current_dependencies.get()
+        stored_query_ids = set()
+        token = current_dependencies.set(stored_query_ids)
+        try:
+            yield stored_query_ids
+        finally:
+            current_dependencies.reset(token)
+        if parent is not None:
+            parent.update(stored_query_ids)
+
+    def read_stored(self, query: "Query") -> None:
+        """
+        Record that the SQL being compiled reads a stored query's cache table.
+        Its cache record is touched when the compilation ends, or immediately
+        if the cache isn't in use.
+
+        Parameters
+        ----------
+        query : Query
+            Stored query
+        """
+        self._reads_stored({query.query_id})
+
+    def _reads_stored(self, query_ids: Iterable[str]) -> None:
+        dependencies = current_dependencies.get()
+        if dependencies is not None:
+            dependencies.update(query_ids)
+        compilation = current_compilation.get()
+        if compilation:
+            compilation.stored_query_ids.update(query_ids)
+        else:
+            self._touch(query_ids)
+
+    @staticmethod
+    def _touch(query_ids: Iterable[str]) -> None:
+        from .cache import touch_cache_records
+
+        touch_cache_records(get_db(), query_ids)
+
+    def get(self, query: "Query", kind: str) -> Any:
+        """
+        Get a cached entry for a query, marking it as most recently used. The
+        stored queries read by the entry's SQL are recorded as read by the
+        current compilation.
+
+        Parameters
+        ----------
+        query : Query
+            Query the entry is for
+        kind : str
+            Kind of entry
+
+        Returns
+        -------
+        str, None or NOT_CACHED
+            The cached entry, or NOT_CACHED if it is not in the cache or
+            the cache isn't in use.
+        """
+        compilation = current_compilation.get()
+        if not compilation:
+            return NOT_CACHED
+        with self._lock:
+            self._check_local_version()
+            try:
+                entry, stored_query_ids = self._cache[
+                    (compilation.conn_id, query.query_id, kind)
+                ]
+            except KeyError:
+                self.misses += 1
+                return NOT_CACHED
+            self.hits += 1
+        self._reads_stored(stored_query_ids)
+        return entry
+
+    def put(
+        self,
+        query: "Query",
+        kind: str,
+        entry: Optional[str],
+        stored_query_ids: Iterable[str] = (),
+    ) -> None:
+        """
+        Add an entry for a query to the cache, if it is in use. Nothing is added if
+        any query has been stored or reset since the current compilation started,
+        because the entry may have been computed before the change.
+
+        Parameters
+        ----------
+        query : Query
+            Query the entry is for
+        kind : str
+            Kind of entry
+        entry : str or None
+            Entry to cache
+        stored_query_ids : iterable of str, optional
+            Ids of the stored queries read by the entry's SQL (see `computing`)
+        """
+        compilation = current_compilation.get()
+        if not compilation:
+            return
+        with self._lock:
+            self._check_local_version()
+            if (
+                compilation.local_version == self._local_version
+                and self._versions.get(compilation.conn_id) == compilation.version
+            ):
+                self._cache[(compilation.conn_id, query.query_id, kind)] = (
+                    entry,
+                    frozenset(stored_query_ids),
+                )
+
+    def clear(self) -> None:
+        """
+        Remove all entries from the cache and reset the hit and miss counts.
+        """
+        with self._lock:
+            self._cache.clear()
+            self._versions.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> Dict[str, Any]:
+        """
+        Get statistics about the cache.
+
+        Returns
+        -------
+        dict
+            Dict with the number of hits and misses, and the current and
+            maximum number of entries.
+        """
+        with self._lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                entries=len(self._cache),
+                max_entries=int(self._cache.maxsize),
+            )
+
+
+sql_cache = SQLCache(int(getenv("FLOWMACHINE_SQL_CACHE_SIZE", DEFAULT_SQL_CACHE_SIZE)))
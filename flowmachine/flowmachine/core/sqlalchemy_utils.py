@@ -5,7 +5,7 @@
 import pandas as pd
 from sqlalchemy import Table, MetaData
 from sqlalchemy.dialects import postgresql
-from sqlalchemy.sql import Selectable
+from sqlalchemy.sql import Alias, Selectable
 
 
 def get_sqlalchemy_table_definition(fully_qualified_table_name, *, engine):
@@ -107,8 +107,8 @@ def make_sqlalchemy_column_from_flowmachine_column_description(
 
     Parameters
     ----------
-    table : sqlalchemy.Table
-        The sqlalchemy_table for which to obtain the column.
+    table : sqlalchemy.Table or sqlalchemy.sql.Alias
+        The sqlalchemy_table (or aliased subquery) for which to obtain the column.
     column_str : str
         The column name, optionally describing an alias via
 
@@ -122,7 +122,7 @@ def make_sqlalchemy_column_from_flowmachine_column_description(
         >>> make_sqlalchemy_column_from_flowmachine_column_description(sqlalchemy_table, "msisdn")
         >>> make_sqlalchemy_column_from_flowmachine_column_description(sqlalchemy_table, "msisdn AS subscriber")
     """
-    assert isinstance(sqlalchemy_table, Table)
+    assert isinstance(sqlalchemy_table, (Table, Alias))
     parts = column_str.split()
     if len(parts) == 1:
         colname = parts[0]
@@ -100,6 +100,7 @@ ut = [
     "UniqueSubscribers",
     "EventsTablesUnion",
     "EventTableSubset",
+    "PerDayAggregate",
 ]
 
 sub_modules = ["location", "subscriber", "network", "utilities", "raster", "spatial"]
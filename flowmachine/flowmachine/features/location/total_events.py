@@ -17,6 +17,10 @@ from flowmachine.core.mixins.geodata_mixin import GeoDataMixin
 from flowmachine.core.spatial_unit import AnySpatialUnit, make_spatial_unit
 from flowmachine.features.utilities.events_tables_union import EventsTablesUnion
 from flowmachine.features.utilities.direction_enum import Direction
+from flowmachine.features.utilities.per_day_aggregate import (
+    PerDayAggregate,
+    split_by_day,
+)
 from flowmachine.utils import make_where, standardise_date
 
 
@@ -103,6 +107,34 @@ class TotalLocationEvents(GeoDataMixin, Query):
         )
         super().__init__()
 
+    @classmethod
+    def per_day(cls, start: str, stop: str, **kwargs) -> PerDayAggregate:
+        """
+        Total events per location and interval within the period, computed
+        from the totals for each day of the period, so that the totals for
+        days already stored are reused.
+
+        Parameters
+        ----------
+        start : str
+            ISO format date string to at which to start the analysis
+        stop : str
+            As above for the end of the analysis
+        **kwargs
+            Other parameters, as for `TotalLocationEvents`
+
+        Returns
+        -------
+        PerDayAggregate
+        """
+        return PerDayAggregate(
+            daily_queries=[
+                cls(day_start, day_stop, **kwargs)
+                for day_start, day_stop in split_by_day(start, stop)
+            ],
+            statistic="count",
+        )
+
     @property
     def column_names(self) -> List[str]:
         return (
@@ -9,6 +9,10 @@ from typing import List, Union
 from flowmachine.features.utilities.events_tables_union import EventsTablesUnion
 from flowmachine.features.subscriber.metaclasses import SubscriberFeature
 from flowmachine.features.utilities.direction_enum import Direction
+from flowmachine.features.utilities.per_day_aggregate import (
+    PerDayAggregate,
+    split_by_day,
+)
 from flowmachine.utils import make_where, standardise_date
 
 valid_stats = {"count", "sum", "avg", "max", "min", "median", "stddev", "variance"}
@@ -85,6 +89,32 @@ class EventCount(SubscriberFeature):
         )
         super().__init__()
 
+    @classmethod
+    def per_day(cls, start, stop, **kwargs) -> PerDayAggregate:
+        """
+        Event count per subscriber within the period, computed by summing
+        the counts for each day of the period, so that the counts for days
+        already stored are reused.
+
+        Parameters
+        ----------
+        start, stop : str
+             iso-format start and stop datetimes
+        **kwargs
+            Other parameters, as for `EventCount`
+
+        Returns
+        -------
+        PerDayAggregate
+        """
+        return PerDayAggregate(
+            daily_queries=[
+                cls(day_start, day_stop, **kwargs)
+                for day_start, day_stop in split_by_day(start, stop)
+            ],
+            statistic="count",
+        )
+
     @property
     def column_names(self) -> List[str]:
         return ["subscriber", "value"]
@@ -17,6 +17,10 @@ from flowmachine.core.spatial_unit import AnySpatialUnit, make_spatial_unit
 from flowmachine.features.utilities.events_tables_union import EventsTablesUnion
 from flowmachine.features.subscriber.metaclasses import SubscriberFeature
 from flowmachine.features.utilities.direction_enum import Direction
+from flowmachine.features.utilities.per_day_aggregate import (
+    PerDayAggregate,
+    split_by_day,
+)
 from flowmachine.utils import make_where, standardise_date
 
 valid_stats = {"count", "sum", "avg", "max", "min", "median", "stddev", "variance"}
@@ -102,6 +106,56 @@ class SubscriberCallDurations(SubscriberFeature):
         )
         super().__init__()
 
+    @classmethod
+    def per_day(cls, start, stop, *, statistic="sum", **kwargs) -> PerDayAggregate:
+        """
+        Statistic of each subscriber's call durations within the period,
+        computed from the durations for each day of the period, so that the
+        results for days already stored are reused.
+
+        Parameters
+        ----------
+        start, stop : str
+             iso-format start and stop datetimes
+        statistic : {'count', 'sum', 'avg', 'max', 'min'}, default 'sum'
+            Aggregation statistic over the durations. The mean is computed
+            from the daily sums and counts.
+        **kwargs
+            Other parameters, as for `SubscriberCallDurations`
+
+        Returns
+        -------
+        PerDayAggregate
+        """
+        statistic = statistic.lower()
+        per_day_stats = {"count", "sum", "avg", "max", "min"}
+        if statistic not in per_day_stats:
+            raise ValueError(
+                "{} can't be computed per day. Use one of {}".format(
+                    statistic, per_day_stats
+                )
+            )
+        days = split_by_day(start, stop)
+        if statistic == "avg":
+            return PerDayAggregate(
+                daily_queries=[
+                    cls(day_start, day_stop, statistic="sum", **kwargs)
+                    for day_start, day_stop in days
+                ],
+                statistic="avg",
+                daily_counts=[
+                    cls(day_start, day_stop, statistic="count", **kwargs)
+                    for day_start, day_stop in days
+                ],
+            )
+        return PerDayAggregate(
+            daily_queries=[
+                cls(day_start, day_stop, statistic=statistic, **kwargs)
+                for day_start, day_stop in days
+            ],
+            statistic=statistic,
+        )
+
     @property
     def column_names(self) -> List[str]:
         return ["subscriber", "value"]
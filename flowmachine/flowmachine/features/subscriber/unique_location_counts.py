@@ -16,6 +16,7 @@ from typing import List
 from flowmachine.core import make_spatial_unit
 from flowmachine.core.spatial_unit import AnySpatialUnit
 from .unique_locations import UniqueLocations
+from ..utilities.per_day_aggregate import PerDayAggregate, split_by_day
 from ..utilities.subscriber_locations import SubscriberLocations
 from .metaclasses import SubscriberFeature
 
@@ -97,6 +98,36 @@ class UniqueLocationCounts(SubscriberFeature):
         )
         super().__init__()
 
+    @classmethod
+    def per_day(cls, start, stop, **kwargs) -> PerDayAggregate:
+        """
+        Counts of unique locations for each subscriber within the period,
+        computed from the unique locations visited on each day of the period,
+        so that the unique locations for days already stored are reused.
+
+        Parameters
+        ----------
+        start : str
+            iso format date range for the beginning of the time frame,
+            e.g. 2016-01-01 or 2016-01-01 14:03:01
+        stop : str
+            As above
+        **kwargs
+            Other parameters, as for `UniqueLocationCounts`
+
+        Returns
+        -------
+        PerDayAggregate
+        """
+        return PerDayAggregate(
+            daily_queries=[
+                cls(day_start, day_stop, **kwargs).ul
+                for day_start, day_stop in split_by_day(start, stop)
+            ],
+            statistic="count_distinct",
+            group_columns=["subscriber"],
+        )
+
     @property
     def column_names(self) -> List[str]:
         return ["subscriber", "value"]
@@ -6,7 +6,7 @@
 import datetime
 import pandas as pd
 import warnings
-from sqlalchemy import select
+from sqlalchemy import MetaData, select, union_all
 from typing import List
 
 from ...core import Query, Table
@@ -62,6 +62,10 @@ class EventTableSubset(Query):
 
     * Use 24 hr format!
 
+    * If the connection targets partitions (see `Connection.target_partitions`),
+      events are selected from only the per-day child tables of the table
+      for the ingested dates within the date range.
+
     Examples
     --------
     >>> sd = EventTableSubset(start='2016-01-01 13:30:30', stop='2016-01-02 16:25:00')
@@ -155,12 +159,17 @@ class EventTableSubset(Query):
     def column_names(self) -> List[str]:
         return [c.split(" AS ")[-1] for c in self.columns]
 
-    def _check_dates(self):
+    def _get_dates(self) -> List[str]:
+        """
+        Get the calendar dates this subset covers.
 
-        # Handle the logic for dealing with missing dates.
-        # If there are no dates present, then we raise an error
-        # if some are present, but some are missing we raise a
-        # warning.
+        Returns
+        -------
+        list of str
+            ISO format dates from the start date, or the earliest date in the
+            table if there is no start date, to the last date before the stop
+            date, or the latest date in the table if there is no stop date.
+        """
         # If the subscriber does not pass a start or stop date, then we take
         # the min/max date in the events.calls table
         if self.start is None:
@@ -190,6 +199,15 @@ class EventTableSubset(Query):
             len(self.stop) == 10 or self.stop.endswith("00:00:00")
         ):
             all_dates.pop(-1)
+        return all_dates
+
+    def _check_dates(self):
+
+        # Handle the logic for dealing with missing dates.
+        # If there are no dates present, then we raise an error
+        # if some are present, but some are missing we raise a
+        # warning.
+        all_dates = self._get_dates()
         # This will be a true false list for whether each of the dates
         # is present in the database
         try:
@@ -214,26 +232,70 @@ class EventTableSubset(Query):
                 stacklevel=2,
             )
 
+    def _get_source_table(self):
+        """
+        Get the table to select events from. This is the table itself, unless
+        the connection targets partitions and the table has per-day child
+        tables, in which case it is the UNION ALL of the child tables for the
+        ingested dates within the date range. The planner then only considers
+        those child tables, instead of checking the constraints of every child
+        of the table, so planning time doesn't grow with the amount of history.
+        If any ingested date within the range has no child table (e.g. because
+        it was ingested after the child tables were last listed), the table
+        itself is used.
+
+        Returns
+        -------
+        sqlalchemy.Table or sqlalchemy.sql.Alias
+        """
+        db = get_db()
+        if not db.target_partitions:
+            return self.sqlalchemy_table
+        table_name = self.sqlalchemy_table.name
+        partitions = db.partitions(table_name, self.sqlalchemy_table.schema)
+        ingested_dates = set(db.available_dates.get(table_name, []))
+        child_tables = []
+        for date in self._get_dates():
+            date = datetime.date.fromisoformat(date)
+            if date not in ingested_dates:
+                continue
+            if date not in partitions:
+                return self.sqlalchemy_table
+            child_tables.append(partitions[date])
+        if len(child_tables) == 0:
+            return self.sqlalchemy_table
+        logger.debug(
+            "Targeting partitions.", table=table_name, partitions=len(child_tables)
+        )
+        # The child tables have the same columns as the parent, so the
+        # parent's definition is copied rather than reflecting each of them.
+        metadata = MetaData()
+        child_selects = []
+        for child_table in child_tables:
+            schema, name = child_table.split(".")
+            child = self.sqlalchemy_table.tometadata(metadata, schema=schema, name=name)
+            child_selects.append(select(child.columns))
+        return union_all(*child_selects).alias(table_name)
+
     def _make_query_with_sqlalchemy(self):
+        source_table = self._get_source_table()
         sqlalchemy_columns = [
             make_sqlalchemy_column_from_flowmachine_column_description(
-                self.sqlalchemy_table, column_str
+                source_table, column_str
             )
             for column_str in self.columns
         ]
         select_stmt = select(sqlalchemy_columns)
 
+        # When selecting from child tables, the date conditions are pushed
+        # down to each of them, which trims the first and last days.
         if self.start is not None:
-            select_stmt = select_stmt.where(
-                self.sqlalchemy_table.c.datetime >= self.start
-            )
+            select_stmt = select_stmt.where(source_table.c.datetime >= self.start)
         if self.stop is not None:
-            select_stmt = select_stmt.where(
-                self.sqlalchemy_table.c.datetime < self.stop
-            )
+            select_stmt = select_stmt.where(source_table.c.datetime < self.stop)
 
         select_stmt = select_stmt.where(
-            self.hour_slices.get_subsetting_condition(self.sqlalchemy_table.c.datetime)
+            self.hour_slices.get_subsetting_condition(source_table.c.datetime)
         )
         select_stmt = self.subscriber_subsetter.apply_subset_if_needed(
             select_stmt, subscriber_identifier=self.subscriber_identifier
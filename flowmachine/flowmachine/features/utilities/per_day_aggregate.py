@@ -0,0 +1,229 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Computing aggregates over several days by combining per-day partial results.
+
+An aggregate such as a count of events per subscriber over a 90 day window
+scans all 90 days of events. If the window then moves on by a day, the
+aggregate over the new window scans all 90 days again, although 89 of them
+are the same as before.
+
+Aggregates which can be computed from the same aggregate over each day
+(counts, sums, minima and maxima, and means as the ratio of a sum and a
+count) can instead be computed by combining the results of a query for each
+day in the window. Each of these per-day queries is an ordinary query, whose
+id depends only on its day, so when they are stored the aggregate over any
+window which includes that day reuses the stored result, and only the days
+which haven't been computed before need to be scanned.
+"""
+
+import datetime
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+from flowmachine.core.query import Query
+from flowmachine.utils import parse_datestring, standardise_date
+
+
+def split_by_day(start: str, stop: str) -> List[Tuple[str, str]]:
+    """
+    Split a period into the parts of it which fall on each day.
+
+    Parameters
+    ----------
+    start, stop : str
+        iso-format start and (exclusive) stop datetimes of the period
+
+    Returns
+    -------
+    list of tuple of str
+        Standardised start and stop datetimes of each part of the period, in
+        order. Parts other than the first start, and parts other than the last
+        stop, at midnight.
+
+    Examples
+    --------
+    >>> split_by_day("2016-01-01 12:00:00", "2016-01-03")
+    [('2016-01-01 12:00:00', '2016-01-02 00:00:00'), ('2016-01-02 00:00:00', '2016-01-03 00:00:00')]
+    """
+    start = parse_datestring(start)
+    stop = parse_datestring(stop)
+    if stop <= start:
+        raise ValueError(f"Period must end after it starts, got {start} to {stop}.")
+    parts = []
+    while start < stop:
+        next_midnight = datetime.datetime.combine(
+            start.date() + datetime.timedelta(days=1), datetime.time()
+        )
+        part_stop = min(next_midnight, stop)
+        parts.append((standardise_date(start), standardise_date(part_stop)))
+        start = part_stop
+    return parts
+
+
+class PerDayAggregate(Query):
+    """
+    Combines the results of a query for each day of a period into an aggregate
+    over the whole period.
+
+    Each of the daily queries must have the same columns, one of which is
+    'value'. The values are combined over all the days for each distinct
+    combination of the other columns.
+
+    Parameters
+    ----------
+    daily_queries : list of Query
+        Queries giving the partial result for each day
+    statistic : {'count', 'sum', 'min', 'max', 'avg', 'count_distinct'}
+        How the daily values were computed. Daily counts and sums are summed,
+        daily minima and maxima are combined with min and max. For 'avg',
+        `daily_queries` give the daily sums and `daily_counts` the matching daily
+        counts, and the value is the total sum divided by the total count.
+        For 'count_distinct', the daily queries have no 'value' column, and the
+        value is the number of distinct rows over all the days in each group.
+    group_columns : list of str, optional
+        Columns to group by. Defaults to all the columns of the daily queries
+        except 'value'. Required for 'count_distinct'.
+    daily_counts : list of Query, optional
+        Queries giving the daily counts, for 'avg'
+
+    Examples
+    --------
+    >>> agg = PerDayAggregate(
+    ...     daily_queries=[
+    ...         EventCount(start, stop) for start, stop in split_by_day("2016-01-01", "2016-01-08")
+    ...     ],
+    ...     statistic="count",
+    ... )
+    >>> agg.get_dataframe()
+              subscriber  value
+    0   038OVABN11Ak4W5P     65
+    1   09NrjaNNvDanD8pk     81
+    ...
+
+    Notes
+    -----
+    Storing this query also stores each of the daily queries (without their
+    own subqueries), so that an aggregate over a different period which
+    includes some of the same days reuses their results.
+    See also the `per_day` methods of `EventCount`, `TotalLocationEvents`,
+    `SubscriberCallDurations` and `UniqueLocationCounts`.
+    """
+
+    combiners = {
+        "count": "sum(value)::bigint",
+        "sum": "sum(value)",
+        "min": "min(value)",
+        "max": "max(value)",
+        "avg": "sum(total) / nullif(sum(n), 0)",
+        "count_distinct": "count(*)",
+    }
+
+    def __init__(
+        self,
+        *,
+        daily_queries: List[Query],
+        statistic: str,
+        group_columns: Optional[List[str]] = None,
+        daily_counts: Optional[List[Query]] = None,
+    ):
+        self.statistic = statistic.lower()
+        if self.statistic not in self.combiners:
+            raise ValueError(
+                "{} is not a valid statistic. Use one of {}".format(
+                    self.statistic, set(self.combiners)
+                )
+            )
+        if len(daily_queries) == 0:
+            raise ValueError("At least one daily query is required.")
+        self.daily_queries = list(daily_queries)
+        columns = self.daily_queries[0].column_names
+        for query in self.daily_queries + list(daily_counts or []):
+            if query.column_names != columns:
+                raise ValueError(
+                    f"Daily queries must all have the same columns, got {columns} and {query.column_names}."
+                )
+        if self.statistic == "count_distinct":
+            if group_columns is None:
+                raise ValueError("group_columns are required for 'count_distinct'.")
+        elif "value" not in columns:
+            raise ValueError("Daily queries must have a 'value' column.")
+        if group_columns is None:
+            group_columns = [col for col in columns if col != "value"]
+        missing_columns = set(group_columns).difference(columns)
+        if len(missing_columns) > 0:
+            raise ValueError(f"Daily queries have no columns {missing_columns}.")
+        self.group_columns = list(group_columns)
+
+        if self.statistic == "avg":
+            if daily_counts is None or len(daily_counts) != len(self.daily_queries):
+                raise ValueError(
+                    "'avg' requires a daily count for each daily sum in daily_counts."
+                )
+            self.daily_counts = list(daily_counts)
+        elif daily_counts is not None:
+            raise ValueError("daily_counts are only used for 'avg'.")
+        else:
+            self.daily_counts = []
+        super().__init__()
+
+    @property
+    def column_names(self) -> List[str]:
+        return self.group_columns + ["value"]
+
+    def _make_query(self):
+        groups = ", ".join(self.group_columns)
+        if self.statistic == "count_distinct":
+            columns = ", ".join(self.daily_queries[0].column_names)
+            unioned = " UNION ".join(
+                f"SELECT {columns} FROM ({query.get_query()}) _"
+                for query in self.daily_queries
+            )
+        elif self.statistic == "avg":
+            unioned = " UNION ALL ".join(
+                [
+                    f"SELECT {groups}, value::numeric AS total, NULL::numeric AS n FROM ({query.get_query()}) _"
+                    for query in self.daily_queries
+                ]
+                + [
+                    f"SELECT {groups}, NULL::numeric AS total, value::numeric AS n FROM ({query.get_query()}) _"
+                    for query in self.daily_counts
+                ]
+            )
+        else:
+            unioned = " UNION ALL ".join(
+                f"SELECT {groups}, value FROM ({query.get_query()}) _"
+                for query in self.daily_queries
+            )
+        return f"""
+        SELECT {groups}, {self.combiners[self.statistic]} AS value
+        FROM ({unioned}) daily
+        GROUP BY {groups}
+        """
+
+    def store(self, store_dependencies: bool = False) -> Future:
+        """
+        Store the results of this computation with the correct table
+        name using a background thread. Each of the daily queries is also
+        stored, ahead of this one.
+
+        Parameters
+        ----------
+        store_dependencies : bool, default False
+            If True, store all the dependencies of this query, rather than
+            only the daily queries.
+
+        Returns
+        -------
+        Future
+            Future object which can be queried to check the query
+            is stored.
+        """
+        if not store_dependencies:
+            # Getting the SQL for this query waits for each daily query
+            # which is being stored, so they're only computed once.
+            for query in self.daily_queries + self.daily_counts:
+                query.store()
+        return super().store(store_dependencies=store_dependencies)
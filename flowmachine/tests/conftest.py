@@ -221,6 +221,30 @@ def get_length(flowmachine_connect):
     yield lambda query: len(pd.read_sql_query(query.get_query(), con=get_db().engine))
 
 
+class DummyPubSub:
+    """
+    Drop-in replacement for a redis subscription.
+    """
+
+    def __init__(self, dummy_redis):
+        self._redis = dummy_redis
+        self.channels = set()
+        self.messages = []
+
+    def subscribe(self, channel):
+        self.channels.add(channel)
+        self._redis._subscriptions.append(self)
+
+    def get_message(self, timeout=0.0):
+        try:
+            return self.messages.pop(0)
+        except IndexError:
+            return None
+
+    def close(self):
+        self._redis._subscriptions.remove(self)
+
+
 class DummyRedis:
     """
     Drop-in replacement for redis.
@@ -228,6 +252,7 @@ class DummyRedis:
 
     def __init__(self):
         self._store = {}
+        self._subscriptions = []
         self.allow_flush = True
 
     def setnx(self, name, val):
@@ -254,6 +279,17 @@ class DummyRedis:
     def get(self, key):
         return self._store.get(key, None)
 
+    def publish(self, channel, message):
+        subscribers = [sub for sub in self._subscriptions if channel in sub.channels]
+        for sub in subscribers:
+            sub.messages.append(
+                dict(type="message", channel=channel, data=message.encode())
+            )
+        return len(subscribers)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return DummyPubSub(self)
+
     def keys(self):
         return sorted(self._store.keys())
 
@@ -22,6 +22,7 @@ from flowmachine.core.query_state import QueryState, QueryStateMachine
 from flowmachine.core.server.action_handlers import (
     action_handler__get_geography,
     action_handler__get_query_params,
+    action_handler__get_query_schemas,
     action_handler__get_sql,
     action_handler__run_query,
     get_action_handler,
@@ -31,6 +32,24 @@ from flowmachine.core.server.query_schemas import FlowmachineQuerySchema
 from flowmachine.core.server.zmq_helpers import ZMQReplyStatus
 
 
+@pytest.mark.asyncio
+async def test_get_query_schemas_only_sends_changed_schemas(server_config):
+    """
+    Test that the query schemas are omitted if the caller already has the current version.
+    """
+    msg = await action_handler__get_query_schemas(config=server_config)
+    assert "query_schemas" in msg["payload"]
+    schemas_hash = msg["payload"]["query_schemas_hash"]
+    msg = await action_handler__get_query_schemas(
+        config=server_config, schemas_hash=schemas_hash
+    )
+    assert msg["payload"] == {"query_schemas_hash": schemas_hash}
+    msg = await action_handler__get_query_schemas(
+        config=server_config, schemas_hash="OLD_HASH"
+    )
+    assert "query_schemas" in msg["payload"]
+
+
 def test_bad_action_handler():
     """Exception should be raised if we try to get a handler that doesn't exist."""
     with pytest.raises(FlowmachineServerError):
@@ -228,3 +247,63 @@ async def test_get_sql_error_states(query_state, dummy_redis, server_config):
     assert msg.status == ZMQReplyStatus.ERROR
     assert msg.payload["query_state"] == query_state
     redis_connection.reset(redis_reset)
+
+
+@pytest.mark.asyncio
+async def test_get_sql_with_selection(server_config, real_connections):
+    """
+    Test that get_sql handler replies with SQL for the selected part of the result.
+    """
+    msg = await action_handler__run_query(
+        config=server_config,
+        query_kind="spatial_aggregate",
+        locations=dict(
+            query_kind="daily_location",
+            date="2016-01-01",
+            method="last",
+            aggregation_unit="admin3",
+        ),
+    )
+    query_id = msg["payload"]["query_id"]
+    QueryStateMachine(get_redis(), query_id, get_db().conn_id).wait_until_complete()
+    msg = await action_handler__get_sql(
+        config=server_config,
+        query_id=query_id,
+        selection=dict(columns=["pcod"], order_by=["pcod"], limit=2),
+    )
+    assert msg.status == ZMQReplyStatus.SUCCESS
+    first_page = get_db().fetch(msg.payload["sql"])
+    assert 2 == len(first_page)
+    msg = await action_handler__get_sql(
+        config=server_config,
+        query_id=query_id,
+        selection=dict(order_by=["pcod"], after=[first_page[-1][0]], limit=2),
+    )
+    assert first_page[-1][0] < get_db().fetch(msg.payload["sql"])[0][0]
+
+
+@pytest.mark.asyncio
+async def test_get_sql_with_invalid_selection(server_config, real_connections):
+    """
+    Test that get_sql handler replies with an error for an invalid selection.
+    """
+    msg = await action_handler__run_query(
+        config=server_config,
+        query_kind="spatial_aggregate",
+        locations=dict(
+            query_kind="daily_location",
+            date="2016-01-01",
+            method="last",
+            aggregation_unit="admin3",
+        ),
+    )
+    query_id = msg["payload"]["query_id"]
+    QueryStateMachine(get_redis(), query_id, get_db().conn_id).wait_until_complete()
+    msg = await action_handler__get_sql(
+        config=server_config,
+        query_id=query_id,
+        selection=dict(columns=["NOT_A_COLUMN"]),
+    )
+    assert msg.status == ZMQReplyStatus.ERROR
+    assert msg.payload["query_state"] == QueryState.COMPLETED
+    assert "NOT_A_COLUMN" in msg.msg
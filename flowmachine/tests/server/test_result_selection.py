@@ -0,0 +1,80 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import pytest
+from marshmallow import ValidationError
+
+from flowmachine.core.server.result_selection import (
+    ResultSelectionSchema,
+    select_from_result,
+)
+
+
+@pytest.mark.parametrize(
+    "selection, expected",
+    [
+        ({}, "SELECT * FROM cache.x"),
+        ({"columns": ["pcod"]}, 'SELECT "pcod" FROM (SELECT * FROM cache.x) AS _'),
+        (
+            {"filters": {"pcod": "it's", "value": None}},
+            """SELECT * FROM (SELECT * FROM cache.x) AS _ WHERE "pcod" = 'it''s' AND "value" IS NULL""",
+        ),
+        (
+            {"order_by": ["pcod"], "after": ["NPL.1"], "limit": 10},
+            """SELECT * FROM (SELECT * FROM cache.x) AS _ WHERE ("pcod") > ('NPL.1') ORDER BY "pcod" LIMIT 10""",
+        ),
+        (
+            {"limit": 10, "offset": 20},
+            'SELECT * FROM (SELECT * FROM cache.x) AS _ ORDER BY "pcod", "value" LIMIT 10 OFFSET 20',
+        ),
+        (
+            {"columns": ["value"], "offset": 20},
+            'SELECT "value" FROM (SELECT * FROM cache.x) AS _ ORDER BY "value" OFFSET 20',
+        ),
+    ],
+)
+def test_select_from_result(selection, expected):
+    """
+    Test that the SQL selecting part of a result is as expected.
+    """
+    assert expected == select_from_result(
+        "SELECT * FROM cache.x", available_columns=["pcod", "value"], **selection
+    )
+
+
+@pytest.mark.parametrize(
+    "selection",
+    [
+        {"columns": ["pcod", "NOT_A_COLUMN"]},
+        {"filters": {"NOT_A_COLUMN": 1}},
+        {"order_by": ["NOT_A_COLUMN"]},
+    ],
+)
+def test_select_from_result_unknown_column(selection):
+    """
+    Test that selecting columns which aren't in the result raises an error.
+    """
+    with pytest.raises(ValueError, match="Unknown column\\(s\\): NOT_A_COLUMN"):
+        select_from_result(
+            "SELECT * FROM cache.x", available_columns=["pcod", "value"], **selection
+        )
+
+
+@pytest.mark.parametrize(
+    "selection",
+    [
+        {"columns": []},
+        {"after": ["NPL.1"]},
+        {"order_by": ["pcod"], "after": ["NPL.1", 2]},
+        {"filters": {"pcod": ["NPL.1"]}},
+        {"limit": -1},
+        {"offset": "NOT_AN_INTEGER"},
+    ],
+)
+def test_invalid_selection(selection):
+    """
+    Test that invalid selections fail validation.
+    """
+    with pytest.raises(ValidationError):
+        ResultSelectionSchema().load(selection)
@@ -11,6 +11,7 @@ import rapidjson
 from flowmachine.core.server.server import (
     get_reply_for_message,
     calculate_and_send_reply_for_message,
+    receive_next_zmq_message_and_send_back_reply,
 )
 from flowmachine.core.server.zmq_helpers import *
 
@@ -124,7 +125,7 @@ async def test_generic_error_catch(server_config):
     mock_socket = Mock()
     mock_socket.send_multipart = CoroutineMock()
     expected_response = [
-        "DUMMY_RETURN_ADDRESS",
+        b"DUMMY_RETURN_ADDRESS",
         b"",
         rapidjson.dumps(
             ZMQReply(status="error", msg="Could not get reply for message")
@@ -136,9 +137,34 @@ async def test_generic_error_catch(server_config):
         mock_get_reply.side_effect = Exception("Didn't see this one coming!")
         await calculate_and_send_reply_for_message(
             socket=mock_socket,
-            return_address="DUMMY_RETURN_ADDRESS",
+            return_address=[b"DUMMY_RETURN_ADDRESS"],
             msg_contents="DUMMY_MESSAGE",
             config=server_config,
         )
         mock_get_reply.assert_called_once()
         mock_socket.send_multipart.assert_called_once_with(expected_response)
+
+
+@pytest.mark.asyncio
+async def test_reply_includes_request_id_envelope(server_config):
+    """
+    Test that replies to messages sent with a request id prefix (as by a DEALER socket) echo the request id.
+    """
+    mock_socket = Mock()
+    mock_socket.recv_multipart = CoroutineMock(
+        return_value=[b"DUMMY_RETURN_ADDRESS", b"DUMMY_REQUEST_ID", b"", b"{}"]
+    )
+    mock_socket.send_multipart = CoroutineMock()
+    with patch(
+        "flowmachine.core.server.server.calculate_and_send_reply_for_message",
+        new_callable=CoroutineMock,
+    ) as mock_calculate:
+        await receive_next_zmq_message_and_send_back_reply(
+            socket=mock_socket, config=server_config
+        )
+    mock_calculate.assert_called_once_with(
+        socket=mock_socket,
+        return_address=[b"DUMMY_RETURN_ADDRESS", b"DUMMY_REQUEST_ID"],
+        msg_contents=b"{}",
+        config=server_config,
+    )
@@ -10,6 +10,7 @@ from unittest.mock import Mock
 
 import pytest
 
+import flowmachine.core.cache
 from flowmachine.core import Table, Query
 from flowmachine.core.cache import (
     get_compute_time,
@@ -20,7 +21,10 @@ from flowmachine.core.cache import (
     get_score,
     get_query_object_by_id,
     get_cached_query_objects_ordered_by_score,
+    get_cached_query_sql,
+    get_cached_query_record,
     touch_cache,
+    touch_cache_records,
     get_max_size_of_cache,
     set_max_size_of_cache,
     get_cache_half_life,
@@ -105,6 +109,45 @@ def test_touch_cache_record_for_query(flowmachine_connect):
     )
 
 
+def test_get_cached_query_sql(flowmachine_connect):
+    """
+    Getting the SQL for a cached query should match the query's own SQL, and touch the cache.
+    """
+    dl = daily_location("2016-01-01")
+    dl.store().result()
+    assert get_cached_query_sql(get_db(), dl.query_id) == dl.get_query()
+    assert (
+        3
+        == get_db().fetch(
+            f"SELECT access_count FROM cache.cached WHERE query_id='{dl.query_id}'"
+        )[0][0]
+    )
+
+
+def test_get_cached_query_record(flowmachine_connect):
+    """
+    Getting the cache record for a query should give its table and the time it was cached.
+    """
+    dl = daily_location("2016-01-01")
+    dl.store().result()
+    schema, table_name, created = get_cached_query_record(get_db(), dl.query_id)
+    assert f"SELECT * FROM {schema}.{table_name}" == dl.get_query()
+    assert (
+        created
+        == get_db().fetch(
+            f"SELECT created FROM cache.cached WHERE query_id='{dl.query_id}'"
+        )[0][0]
+    )
+
+
+def test_get_cached_query_sql_raises_for_uncached(flowmachine_connect):
+    """
+    Getting the SQL for a query which isn't cached should raise a ValueError.
+    """
+    with pytest.raises(ValueError):
+        get_cached_query_sql(get_db(), daily_location("2016-01-01").query_id)
+
+
 def test_touch_cache_record_for_table(flowmachine_connect):
     """
     Touching a cache record for a table should update access count and last accessed but not touch score, or counter.
@@ -263,6 +306,36 @@ def test_shrink_to_size_dry_run_reflects_wet_run(flowmachine_connect):
     ]
 
 
+def test_shrink_to_size_removes_tables_pointing_at_removed_queries(
+    flowmachine_connect,
+):
+    """
+    Test that shrink_below_size also removes Table records which point at the removed cache tables.
+    """
+    dl = daily_location("2016-01-01").store().result()
+    table = dl.get_table()
+    removed_queries = shrink_below_size(get_db(), 0, protected_period=-1)
+    assert [dl.query_id] == [q.query_id for q in removed_queries]
+    assert not dl.is_stored
+    assert not cache_table_exists(get_db(), table.query_id)
+    assert QueryState.KNOWN == dl.query_state
+    assert QueryState.KNOWN == table.query_state
+
+
+def test_shrink_to_size_removes_in_batches(flowmachine_connect, monkeypatch):
+    """
+    Test that shrink_below_size removes everything it should when there are several batches.
+    """
+    monkeypatch.setattr(flowmachine.core.cache, "CACHE_REMOVAL_BATCH_SIZE", 1)
+    dl = daily_location("2016-01-01").store().result()
+    dl2 = daily_location("2016-01-02").store().result()
+    removed_queries = shrink_below_size(get_db(), 0, protected_period=-1)
+    assert 2 == len(removed_queries)
+    assert not dl.is_stored
+    assert not dl2.is_stored
+    assert 0 == get_size_of_cache(get_db())
+
+
 def test_shrink_to_size_uses_score(flowmachine_connect):
     """
     Test that shrink_below_size removes cache records in ascending score order.
@@ -324,6 +397,23 @@ def test_size_of_table(flowmachine_connect):
     assert total_cache_size == table_size
 
 
+def test_stored_score_tracks_multiplier(flowmachine_connect):
+    """
+    Test that the stored cache score and table size are kept up to date when the cache record changes.
+    """
+    dl = daily_location("2016-01-01").store().result()
+    table_size, compute_time = get_db().fetch(
+        f"SELECT table_size, compute_time FROM cache.cached WHERE query_id='{dl.query_id}'"
+    )[0]
+    assert table_size == get_size_of_table(get_db(), dl.table_name, "cache")
+    get_db().engine.execute(
+        f"UPDATE cache.cached SET cache_score_multiplier = 2 WHERE query_id='{dl.query_id}'"
+    )
+    assert get_score(get_db(), dl.query_id) == pytest.approx(
+        2 * float(compute_time) / 1000 / table_size
+    )
+
+
 def test_cache_miss_value_error_rescore():
     """
     ValueError should be raised if we try to rescore something not in cache.
@@ -334,6 +424,31 @@ def test_cache_miss_value_error_rescore():
         touch_cache(connection_mock, "NOT_IN_CACHE")
 
 
+def test_touch_cache_records(flowmachine_connect):
+    """
+    Touching several cache records should update the access count of each, and ignore queries which aren't cached.
+    """
+    first = daily_location("2016-01-01").store().result()
+    second = daily_location("2016-01-02").store().result()
+    touch_cache_records(get_db(), [first.query_id, second.query_id, "NOT_IN_CACHE"])
+    assert get_db().fetch(
+        f"SELECT access_count FROM cache.cached WHERE query_id IN ('{first.query_id}', '{second.query_id}')"
+    ) == [(2,), (2,)]
+
+
+def test_touch_cache_records_single_statement():
+    """
+    Touching several cache records should make one request to the database, and none if there are no records to touch.
+    """
+    connection_mock = Mock()
+    touch_cache_records(connection_mock, ["A", "B", "A"])
+    connection_mock.fetch.assert_called_once()
+    assert "IN ('A', 'B')" in connection_mock.fetch.call_args[0][0]
+    connection_mock.reset_mock()
+    touch_cache_records(connection_mock, [])
+    connection_mock.fetch.assert_not_called()
+
+
 def test_cache_miss_value_error_size_of_table():
     """
     ValueError should be raised if we try to get the size of something not in cache.
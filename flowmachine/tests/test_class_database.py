@@ -85,6 +85,14 @@ def test_available_dates(flowmachine_connect):
     assert datetime.date(2016, 9, 9) not in get_db().available_dates["calls"]
 
 
+def test_partitions(flowmachine_connect):
+    """Test that partitions finds the per-day child tables of an events table."""
+    partitions = get_db().partitions("calls")
+    assert partitions[datetime.date(2016, 1, 7)] == "events.calls_20160107"
+    assert datetime.date(2016, 9, 9) in partitions
+    assert get_db().partitions("not_a_table") == {}
+
+
 def test_location_id(flowmachine_connect):
     """Test that we can get the location_id lookup table from the db."""
     assert "infrastructure.cells" == get_db().location_table
@@ -93,3 +101,42 @@ def test_location_id(flowmachine_connect):
 def test_location_tables(flowmachine_connect):
     """Test that connection's location_tables attribute is correctly calculated"""
     assert sorted(["calls", "mds", "sms", "topups"]) == sorted(get_db().location_tables)
+
+
+def test_has_table_uses_catalog_cache(test_tables, monkeypatch):
+    """
+    Connection.has_table() only asks the database once per table.
+    """
+    fetch = Mock(wraps=get_db().fetch)
+    monkeypatch.setattr(get_db(), "fetch", fetch)
+    assert get_db().has_table("test_table_a", "public")
+    assert get_db().has_table("test_table_a", "public")
+    assert not get_db().has_table("not_a_table", "public")
+    assert not get_db().has_table("not_a_table", "public")
+    assert fetch.call_count == 2
+
+
+def test_table_columns(test_tables):
+    """
+    Connection.table_columns() returns the table's columns in order.
+    """
+    assert get_db().table_columns("test_table_b", "public") == [
+        "id",
+        "field",
+        "numeric_field",
+    ]
+    assert get_db().table_columns("not_a_table", "public") == []
+
+
+def test_catalog_cache_invalidated_when_storing(flowmachine_connect):
+    """
+    Storing a query makes it visible to has_table, even if it was checked before storing.
+    """
+    from flowmachine.features import daily_location
+
+    dl = daily_location("2016-01-01")
+    assert not dl.is_stored
+    dl.store().result()
+    assert dl.is_stored
+    dl.invalidate_db_cache()
+    assert not dl.is_stored
@@ -0,0 +1,73 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Tests for the size-bounded in-memory dataframe cache.
+"""
+import pandas as pd
+
+from flowmachine.core.dataframe_cache import DataFrameCache, dataframe_size
+
+
+def make_df(rows):
+    return pd.DataFrame({"value": range(rows)})
+
+
+def test_cache_hits_and_misses():
+    """
+    Test that the cache counts hits and misses.
+    """
+    cache = DataFrameCache(max_bytes=10 ** 6)
+    assert cache.get("a") is None
+    df = make_df(10)
+    assert cache.put("a", df)
+    assert cache.get("a") is df
+    assert cache.info() == dict(
+        hits=1,
+        misses=1,
+        entries=1,
+        current_bytes=dataframe_size(df),
+        max_bytes=10 ** 6,
+    )
+
+
+def test_least_recently_used_is_evicted():
+    """
+    Test that the least recently used dataframe is evicted when over budget.
+    """
+    size = dataframe_size(make_df(100))
+    cache = DataFrameCache(max_bytes=2 * size)
+    cache.put("a", make_df(100))
+    cache.put("b", make_df(100))
+    cache.get("a")
+    cache.put("c", make_df(100))
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.current_bytes <= cache.max_bytes
+
+
+def test_oversized_dataframe_not_cached():
+    """
+    Test that a dataframe bigger than the budget is not cached.
+    """
+    cache = DataFrameCache(max_bytes=10)
+    assert not cache.put("a", make_df(100))
+    assert "a" not in cache
+
+
+def test_resize_keeps_most_recently_used():
+    """
+    Test that shrinking the cache evicts the least recently used dataframes.
+    """
+    size = dataframe_size(make_df(100))
+    cache = DataFrameCache(max_bytes=3 * size)
+    for key in "abc":
+        cache.put(key, make_df(100))
+    cache.get("a")
+    cache.resize(2 * size)
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.max_bytes == 2 * size
@@ -1,10 +1,12 @@
 # This Source Code Form is subject to the terms of the Mozilla Public
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
+import numpy as np
 import pandas as pd
 
 import pytest
 
+from flowmachine.core.dataframe_cache import dataframe_cache
 from flowmachine.features import EventTableSubset
 
 # TODO: These tests are for the in memory cache of recently retrieved dataframes once flowmachine is no longer used to get dataframes they should be removed
@@ -17,13 +19,12 @@ def test_turn_off_caching():
     sd = EventTableSubset(start="2016-01-01", stop="2016-01-02")
     sd.get_dataframe()
     sd.turn_off_caching()
-    with pytest.raises(AttributeError):
-        sd._df
+    assert sd._dataframe_cache_key() not in dataframe_cache
 
 
 def test_turn_off_caching_handles_error():
     """
-    *.turn_off_caching() works even if ._df attribute is not present.
+    *.turn_off_caching() works even if the dataframe has been evicted.
     """
     sd = EventTableSubset(start="2016-01-01", stop="2016-01-02")
     sd.get_dataframe()
@@ -31,7 +32,7 @@ def test_turn_off_caching_handles_error():
     sd.turn_on_caching()
     sd.get_dataframe()
 
-    del sd._df
+    dataframe_cache.pop(sd._dataframe_cache_key())
     sd.turn_off_caching()
 
 
@@ -55,7 +56,31 @@ def test_turn_on_caching():
     sd.turn_off_caching()
     sd.turn_on_caching()
     sd.get_dataframe()
-    assert isinstance(sd._df, pd.DataFrame)
+    assert isinstance(dataframe_cache.get(sd._dataframe_cache_key()), pd.DataFrame)
+
+
+def test_cached_dataframe_is_reused():
+    """
+    Repeated calls to get_dataframe are served from the dataframe cache.
+    """
+    sd = EventTableSubset(start="2016-01-01", stop="2016-01-02")
+    sd.get_dataframe()
+    hits = dataframe_cache.hits
+    df = sd.get_dataframe()
+    assert dataframe_cache.hits == hits + 1
+    df["id"] = None  # Modifying a copy doesn't affect the cache
+    assert dataframe_cache.get(sd._dataframe_cache_key())["id"].notnull().all()
+
+
+def test_uncopied_dataframe_shares_data():
+    """
+    get_dataframe(copy=False) returns a dataframe sharing data with the cached one.
+    """
+    sd = EventTableSubset(start="2016-01-01", stop="2016-01-02")
+    df = sd.get_dataframe(copy=False)
+    cached = dataframe_cache.get(sd._dataframe_cache_key())
+    assert df is not cached
+    assert np.shares_memory(df["id"].values, cached["id"].values)
 
 
 def test_cache_is_returned():
@@ -9,12 +9,14 @@ import pytest
 import re
 import textwrap
 import IPython
+from concurrent.futures import Future
 from io import StringIO
+from unittest.mock import Mock
 
 from flowmachine.core import CustomQuery
 from flowmachine.core.context import get_db
 from flowmachine.core.dummy_query import DummyQuery
-from flowmachine.core.query_state import QueryStateMachine
+from flowmachine.core.query_state import QueryStateMachine, QueryState
 from flowmachine.core.subscriber_subsetter import make_subscriber_subsetter
 from flowmachine.features import daily_location, EventTableSubset
 
@@ -161,7 +163,7 @@ def test_store_queries_in_order():
         def store(self):
             for query in self.dependencies:
                 assert query.is_stored
-            super().store()
+            return super().store()
 
     dummy1 = QueryWithStoreAssertions(dummy_param=["dummy1"])
     dummy2 = QueryWithStoreAssertions(dummy_param=["dummy2"])
@@ -169,7 +171,49 @@ def test_store_queries_in_order():
     dummy4 = QueryWithStoreAssertions(dummy_param=["dummy4", dummy2])
     dummy5 = QueryWithStoreAssertions(dummy_param=["dummy5", dummy3, dummy4])
     graph = calculate_dependency_graph(dummy5)
-    store_queries_in_order(graph)
+    store_futures = store_queries_in_order(graph)
+    assert all(future.result() is not None for future in store_futures.values())
+
+
+def test_store_queries_in_order_prioritises_critical_path():
+    """
+    Test that store_queries_in_order() stores the queries with the longest chain of dependents first.
+    """
+    store_order = []
+
+    class QueryRecordingStoreOrder(DummyQuery):
+        def store(self):
+            store_order.append(self.dummy_param[0])
+            return super().store()
+
+    chain_start = QueryRecordingStoreOrder(dummy_param=["chain_start"])
+    chain_middle = QueryRecordingStoreOrder(dummy_param=["chain_middle", chain_start])
+    chain_end = QueryRecordingStoreOrder(dummy_param=["chain_end", chain_middle])
+    short = QueryRecordingStoreOrder(dummy_param=["short"])
+    root = QueryRecordingStoreOrder(dummy_param=["root", chain_end, short])
+    graph = calculate_dependency_graph(root)
+    store_queries_in_order(graph, max_concurrency=1)
+    assert store_order[:2] == ["chain_start", "chain_middle"]
+    assert store_order[-1] == "root"
+
+
+def test_store_queries_in_order_waits_for_dependencies():
+    """
+    Test that store_queries_in_order() doesn't trigger a store until the query's dependencies are finished.
+    """
+    pending_store = Future()
+    dependency = DummyQuery(dummy_param=["dependency"])
+    dependency.store = Mock(return_value=pending_store)
+    dependent = DummyQuery(dummy_param=["dependent", dependency])
+    dependent.store = Mock(wraps=dependent.store)
+    graph = calculate_dependency_graph(dependent)
+
+    store_futures = store_queries_in_order(graph)
+    dependent.store.assert_not_called()
+    assert dependent.query_state == QueryState.QUEUED
+    pending_store.set_result(dependency)
+    dependent.store.assert_called_once()
+    assert store_futures[f"x{dependent.query_id}"].result() is dependent
 
 
 def test_dependencies_eligible_for_store():
@@ -8,9 +8,11 @@ Unit tests for EventTableSubset
 import pytest
 import pytz
 
-from datetime import datetime
+from datetime import datetime, timedelta
 
+from flowmachine.core.context import get_db
 from flowmachine.core.errors import MissingDateError
+from flowmachine.core.sql_cache import sql_cache
 from flowmachine.features.utilities.event_table_subset import EventTableSubset
 
 
@@ -170,3 +172,93 @@ def test_avoids_searching_extra_tables(get_dataframe):
     sd = EventTableSubset(start="2016-01-01", stop="2016-01-02")
     explain_string = sd.explain()
     assert "calls_20160103" not in explain_string
+
+
+@pytest.fixture
+def target_partitions(flowmachine_connect, monkeypatch):
+    """
+    Target partitions, without reusing SQL compiled while not targeting them.
+    """
+    sql_cache.clear()
+    monkeypatch.setattr(get_db(), "target_partitions", True)
+    yield
+    sql_cache.clear()
+
+
+def test_targets_partitions(target_partitions):
+    """
+    EventTableSubset selects from only the child tables for its dates when targeting partitions.
+    """
+    sql = EventTableSubset(start="2016-01-02 12:00:00", stop="2016-01-04").get_query()
+    assert "events.calls_20160102" in sql
+    assert "events.calls_20160103" in sql
+    assert "UNION ALL" in sql
+    assert "events.calls_20160101" not in sql
+    assert "events.calls_20160104" not in sql
+    assert "events.calls " not in sql
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        dict(start="2016-01-01 13:30:30", stop="2016-01-03 16:25:00"),
+        dict(start="2016-01-03", stop=None, hours=(20, 4)),
+        dict(start=None, stop="2016-01-03", subscriber_subset=["1p4MYbA1Y4bZzBQa"]),
+        dict(start="2016-01-01", stop="2016-01-02", columns=["msisdn", "datetime"]),
+    ],
+)
+def test_targeting_partitions_gives_same_result(kwargs, get_dataframe, monkeypatch):
+    """
+    EventTableSubset gives the same result whether or not it targets partitions.
+    """
+    expected = get_dataframe(EventTableSubset(**kwargs))
+    sql_cache.clear()
+    monkeypatch.setattr(get_db(), "target_partitions", True)
+    targeted = get_dataframe(EventTableSubset(**kwargs))
+    sql_cache.clear()
+    assert len(targeted) > 0
+    assert (
+        targeted.sort_values(list(targeted.columns)).values.tolist()
+        == expected.sort_values(list(expected.columns)).values.tolist()
+    )
+
+
+def test_targeting_partitions_skips_dates_not_ingested(target_partitions):
+    """
+    EventTableSubset only targets child tables for dates recorded as ingested.
+    """
+    sql = EventTableSubset(start="2016-01-07", stop="2016-09-10").get_query()
+    assert "events.calls_20160107" in sql
+    assert "events.calls_20160909" not in sql
+
+
+def test_targeted_sql_updated_after_ingestion(target_partitions, monkeypatch):
+    """
+    SQL compiled while targeting partitions isn't reused once another date has been ingested.
+    """
+    dates = get_db().available_dates
+    last_date = max(dates["calls"])
+    last_partition = f"events.calls_{last_date:%Y%m%d}"
+    subset = EventTableSubset(
+        start="2016-01-01", stop=str(last_date + timedelta(days=1))
+    )
+    earlier_dates = {
+        **dates,
+        "calls": [date for date in dates["calls"] if date != last_date],
+    }
+    monkeypatch.setattr(get_db(), "_available_dates", lambda: earlier_dates)
+    assert last_partition not in subset.get_query()
+    monkeypatch.setattr(get_db(), "_available_dates", lambda: dates)
+    assert last_partition in subset.get_query()
+
+
+def test_targeting_partitions_without_child_table(target_partitions, monkeypatch):
+    """
+    EventTableSubset selects from the table itself if an ingested date has no child table.
+    """
+    partitions = dict(get_db().partitions("calls"))
+    del partitions[datetime(2016, 1, 2).date()]
+    monkeypatch.setattr(get_db(), "_partitions", lambda table, schema: partitions)
+    sql = EventTableSubset(start="2016-01-01", stop="2016-01-04").get_query()
+    assert "UNION ALL" not in sql
+    assert "events.calls " in sql
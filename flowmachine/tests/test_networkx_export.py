@@ -64,6 +64,30 @@ def test_directed_dupe():
         graph = DupeFlow(flow).to_networkx(directed_graph=True)
 
 
+def test_batched_graph_matches_unbatched():
+    """
+    to_networkx() builds the same graph when reading the query in batches.
+    """
+    dl1 = daily_location("2016-01-01")
+    dl2 = daily_location("2016-01-02")
+    flow = Flows(dl1, dl2)
+    graph = flow.to_networkx()
+    batched_graph = flow.to_networkx(batch_size=10)
+    assert sorted(graph.edges(data=True)) == sorted(batched_graph.edges(data=True))
+
+
+def test_batched_undirected_warns_on_dupes():
+    """
+    to_networkx() raises a warning if duplicate edges are detected across batches.
+    """
+    dl1 = daily_location("2016-01-01")
+    dl2 = daily_location("2016-01-02")
+    flow = Flows(dl1, dl2)
+    with pytest.warns(UserWarning):
+        graph = flow.to_networkx(directed_graph=False, batch_size=10)
+    assert "524 1 02 09" in graph.neighbors("524 3 09 50")
+
+
 def test_errors_with_one_param():
     """
     to_networkx() raises error if only one side of parameters is passed.
@@ -0,0 +1,134 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Tests for computing aggregates over several days from per-day partial results.
+"""
+
+import pytest
+
+from flowmachine.features import (
+    EventCount,
+    PerDayAggregate,
+    SubscriberCallDurations,
+    TotalLocationEvents,
+    UniqueLocationCounts,
+)
+from flowmachine.features.utilities.per_day_aggregate import split_by_day
+
+
+def test_split_by_day():
+    """
+    Test that periods are split at each midnight.
+    """
+    assert split_by_day("2016-01-01 12:00:00", "2016-01-03 06:00:00") == [
+        ("2016-01-01 12:00:00", "2016-01-02 00:00:00"),
+        ("2016-01-02 00:00:00", "2016-01-03 00:00:00"),
+        ("2016-01-03 00:00:00", "2016-01-03 06:00:00"),
+    ]
+    assert split_by_day("2016-01-01", "2016-01-02") == [
+        ("2016-01-01 00:00:00", "2016-01-02 00:00:00")
+    ]
+
+
+def test_split_by_day_error():
+    """
+    Test that splitting a period which ends before it starts raises an error.
+    """
+    with pytest.raises(ValueError):
+        split_by_day("2016-01-02", "2016-01-01")
+
+
+@pytest.mark.parametrize(
+    "query_class, kwargs",
+    [
+        (EventCount, dict(direction="in")),
+        (EventCount, dict(hours=(20, 4))),
+        (TotalLocationEvents, dict(interval="day")),
+        (TotalLocationEvents, dict(direction="out")),
+        (SubscriberCallDurations, dict(statistic="sum")),
+        (SubscriberCallDurations, dict(statistic="count")),
+        (SubscriberCallDurations, dict(statistic="min", direction="both")),
+        (SubscriberCallDurations, dict(statistic="max")),
+        (SubscriberCallDurations, dict(statistic="avg")),
+        (UniqueLocationCounts, dict()),
+    ],
+)
+def test_per_day_gives_same_result(query_class, kwargs, get_dataframe):
+    """
+    Test that combining per-day results gives the same result as the query over the whole period.
+    """
+    start, stop = "2016-01-01 12:00:00", "2016-01-04"
+    expected = get_dataframe(query_class(start, stop, **kwargs))
+    per_day = get_dataframe(query_class.per_day(start, stop, **kwargs))
+    group_columns = [col for col in expected.columns if col != "value"]
+    expected = expected.sort_values(group_columns).reset_index(drop=True)
+    per_day = per_day.sort_values(group_columns).reset_index(drop=True)
+    assert per_day[group_columns].values.tolist() == (
+        expected[group_columns].values.tolist()
+    )
+    assert per_day.value.astype(float).values == pytest.approx(
+        expected.value.astype(float).values
+    )
+
+
+def test_sliding_window_reuses_days():
+    """
+    Test that aggregates over overlapping periods share the queries for the days they have in common.
+    """
+    first = EventCount.per_day("2016-01-01", "2016-01-04")
+    second = EventCount.per_day("2016-01-02", "2016-01-05")
+    assert first.query_id != second.query_id
+    shared = {q.query_id for q in first.daily_queries} & {
+        q.query_id for q in second.daily_queries
+    }
+    assert shared == {
+        EventCount("2016-01-02", "2016-01-03").query_id,
+        EventCount("2016-01-03", "2016-01-04").query_id,
+    }
+
+
+def test_storing_stores_days():
+    """
+    Test that storing a per-day aggregate stores the per-day results, which are used by later windows.
+    """
+    first = SubscriberCallDurations.per_day("2016-01-01", "2016-01-03", statistic="avg")
+    first.store().result()
+    assert all(q.is_stored for q in first.daily_queries + first.daily_counts)
+    assert not first.daily_queries[0].unioned_query.is_stored
+
+    second = SubscriberCallDurations.per_day(
+        "2016-01-02", "2016-01-04", statistic="avg"
+    )
+    sql = second.get_query()
+    assert first.daily_queries[1].fully_qualified_table_name in sql
+    assert first.daily_counts[1].fully_qualified_table_name in sql
+
+
+def test_undecomposable_statistic_error():
+    """
+    Test that statistics which can't be computed from per-day results raise an error.
+    """
+    with pytest.raises(ValueError):
+        SubscriberCallDurations.per_day("2016-01-01", "2016-01-03", statistic="median")
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        dict(statistic="mode"),
+        dict(statistic="avg"),
+        dict(statistic="count", group_columns=["not_a_column"]),
+        dict(statistic="count", daily_counts=[]),
+        dict(statistic="count_distinct"),
+    ],
+)
+def test_per_day_aggregate_errors(kwargs):
+    """
+    Test that invalid arguments to PerDayAggregate raise errors.
+    """
+    with pytest.raises(ValueError):
+        PerDayAggregate(
+            daily_queries=[EventCount("2016-01-01", "2016-01-02")], **kwargs
+        )
@@ -12,6 +12,8 @@ import pytest
 from sqlalchemy.exc import ProgrammingError
 
 from flowmachine.core import make_spatial_unit
+from flowmachine.core.context import get_db
+from flowmachine.core.dataframe_cache import dataframe_cache
 from flowmachine.core.query import Query
 from flowmachine.features import daily_location
 
@@ -129,6 +131,80 @@ def test_limited_head():
     dl.random_sample(size=2, sampling_method="bernoulli").head()
 
 
+def test_copy_fetch_matches_sql_fetch():
+    """Test that fetching a dataframe using COPY gives the same result as read_sql_query."""
+    dl = daily_location("2016-01-01")
+    dl.turn_off_caching()
+    via_sql = dl.get_dataframe(fetch_method="sql")
+    via_copy = dl.get_dataframe(fetch_method="copy")
+    assert via_sql.columns.tolist() == via_copy.columns.tolist()
+    assert (
+        via_sql.sort_values("subscriber").values.tolist()
+        == via_copy.sort_values("subscriber").values.tolist()
+    )
+
+
+def test_copy_fetch_empty_result():
+    """Test that fetching an empty result using COPY gives an empty dataframe with the right columns."""
+    dl = daily_location("2016-01-01")
+    df = get_db().copy_to_dataframe(f"SELECT * FROM ({dl.get_query()}) _ LIMIT 0")
+    assert df.empty
+    assert df.columns.tolist() == dl.column_names
+
+
+def test_copy_fetch_in_batches():
+    """Test that parsing the COPY output in small batches gives the same result."""
+    dl = daily_location("2016-01-01")
+    query = f"SELECT * FROM ({dl.get_query()}) _"
+    in_batches = get_db().copy_to_dataframe(query, batch_size=7)
+    at_once = get_db().copy_to_dataframe(query, batch_size=10 ** 9)
+    assert len(in_batches) > 7
+    assert in_batches.index.tolist() == list(range(len(in_batches)))
+    assert (
+        in_batches.sort_values("subscriber").values.tolist()
+        == at_once.sort_values("subscriber").values.tolist()
+    )
+
+
+def test_fetch_methods_cached_separately():
+    """Test that results fetched with different fetch methods are cached separately."""
+    dl = daily_location("2016-01-01")
+    dl.get_dataframe(fetch_method="sql")
+    assert dl._dataframe_cache_key("copy") not in dataframe_cache
+    dl.get_dataframe(fetch_method="copy")
+    assert dl._dataframe_cache_key("sql") in dataframe_cache
+    assert dl._dataframe_cache_key("copy") in dataframe_cache
+    assert dataframe_cache.get(
+        dl._dataframe_cache_key("copy")
+    ) is not dataframe_cache.get(dl._dataframe_cache_key("sql"))
+    dl.turn_off_caching()
+    assert dl._dataframe_cache_key("sql") not in dataframe_cache
+    assert dl._dataframe_cache_key("copy") not in dataframe_cache
+
+
+def test_invalid_fetch_method_raises():
+    """Test that an unknown fetch method is rejected."""
+    dl = daily_location("2016-01-01")
+    with pytest.raises(ValueError, match="not a valid fetch method"):
+        dl.get_dataframe(fetch_method="NOT_A_METHOD")
+
+
+def test_iter_batches():
+    """Test that iter_batches yields the whole result in bounded dataframes."""
+    dl = daily_location("2016-01-01")
+    batches = list(dl.iter_batches(batch_size=100))
+    assert all(len(batch) <= 100 for batch in batches)
+    assert all(batch.columns.tolist() == dl.column_names for batch in batches)
+    assert sum(len(batch) for batch in batches) == len(dl)
+
+
+def test_iter_batches_rejects_bad_size():
+    """Test that iter_batches requires a positive batch size."""
+    dl = daily_location("2016-01-01")
+    with pytest.raises(ValueError):
+        next(dl.iter_batches(batch_size=0))
+
+
 def test_make_sql_no_overwrite():
     """
     Test the Query._make_sql won't overwrite an existing table
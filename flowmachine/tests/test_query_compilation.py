@@ -0,0 +1,147 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Tests for compiling queries with common subexpressions as CTEs.
+"""
+from typing import List
+
+import pytest
+
+from flowmachine.core import make_spatial_unit
+from flowmachine.core.query import Query
+from flowmachine.core.query_compilation import (
+    common_subexpressions_as_ctes,
+    compile_query,
+)
+from flowmachine.features import DistanceSeries, SubscriberLocations
+from flowmachine.features.subscriber.imputed_distance_series import (
+    ImputedDistanceSeries,
+)
+
+
+class Leaf(Query):
+    def __init__(self, value):
+        self.value = value
+        super().__init__()
+
+    @property
+    def column_names(self) -> List[str]:
+        return ["value"]
+
+    def _make_query(self):
+        return f"SELECT {self.value} AS value"
+
+
+class Pair(Query):
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+        super().__init__()
+
+    @property
+    def column_names(self) -> List[str]:
+        return ["value"]
+
+    def _make_query(self):
+        return f"""
+        SELECT l.value + r.value AS value
+        FROM ({compile_query(self.left)}) l, ({compile_query(self.right)}) r
+        """
+
+
+def test_shared_subqueries_compiled_once():
+    """
+    Test that each distinct subquery is emitted once, and that shared ones are materialised.
+    """
+    leaf = Leaf(1)
+    pair = Pair(leaf, leaf)
+    query = Pair(pair, pair)
+    sql = compile_query(query, use_ctes=True)
+    assert sql.startswith("WITH ")
+    assert sql.count("SELECT 1 AS value") == 1
+    assert sql.count(f"q_{leaf.query_id} AS MATERIALIZED (") == 1
+    assert sql.count(f"q_{pair.query_id} AS MATERIALIZED (") == 1
+    assert sql.index(f"q_{leaf.query_id} AS") < sql.index(f"q_{pair.query_id} AS")
+    assert compile_query(query).count("SELECT 1 AS value") == 4
+
+
+def test_single_use_subqueries_not_materialised():
+    """
+    Test that subqueries used only once are left for the planner to inline.
+    """
+    query = Pair(Leaf(1), Leaf(2))
+    sql = compile_query(query, use_ctes=True)
+    assert "MATERIALIZED" not in sql
+    assert sql.count(" AS (") == 2
+
+
+def test_cte_mode_context():
+    """
+    Test that the context manager sets the compilation mode only within the context.
+    """
+    query = Pair(Leaf(1), Leaf(2))
+    with common_subexpressions_as_ctes():
+        assert compile_query(query).startswith("WITH ")
+        with common_subexpressions_as_ctes(False):
+            assert not compile_query(query).startswith("WITH ")
+    assert not compile_query(query).startswith("WITH ")
+
+
+@pytest.fixture
+def imputed_distance_series():
+    sl = SubscriberLocations(
+        "2016-01-01",
+        "2016-01-03",
+        spatial_unit=make_spatial_unit("lon-lat"),
+        hours=(20, 0),
+    )
+    ds = DistanceSeries(subscriber_locations=sl, statistic="min")
+    return ImputedDistanceSeries(distance_series=ds)
+
+
+def test_cte_sql_shorter_for_shared_subquery(imputed_distance_series):
+    """
+    Test that a subquery embedded twice is emitted once, as a materialised CTE.
+    """
+    ds = imputed_distance_series.distance_series
+    cte_sql = imputed_distance_series.get_query(use_ctes=True)
+    assert cte_sql.count(f"q_{ds.query_id} AS MATERIALIZED (") == 1
+    assert len(cte_sql) < len(imputed_distance_series.get_query())
+
+
+def test_cte_results_match(imputed_distance_series, get_dataframe):
+    """
+    Test that compiling with CTEs gives the same result.
+    """
+    inlined = get_dataframe(imputed_distance_series)
+    with common_subexpressions_as_ctes():
+        with_ctes = get_dataframe(imputed_distance_series)
+    assert (
+        with_ctes.sort_values(list(with_ctes.columns)).values.tolist()
+        == inlined.sort_values(list(inlined.columns)).values.tolist()
+    )
+
+
+def test_stored_subqueries_not_ctes(imputed_distance_series):
+    """
+    Test that stored subqueries are referenced by their cache table rather than a CTE.
+    """
+    ds = imputed_distance_series.distance_series
+    ds.store().result()
+    sql = imputed_distance_series.get_query(use_ctes=True)
+    assert f"q_{ds.query_id}" not in sql
+    assert ds.fully_qualified_table_name in sql
+
+
+def test_store_with_ctes(imputed_distance_series):
+    """
+    Test that queries can be stored when compiled with CTEs.
+    """
+    expected = imputed_distance_series.get_dataframe()
+    with common_subexpressions_as_ctes():
+        imputed_distance_series.store().result()
+    assert imputed_distance_series.is_stored
+    stored = imputed_distance_series.get_table().get_dataframe()
+    assert len(stored) == len(expected)
@@ -5,8 +5,10 @@
 """
 Tests for the query state machine.
 """
+import asyncio
 from unittest.mock import Mock
 
+import threading
 import time
 
 import pytest
@@ -19,7 +21,12 @@ from flowmachine.core.errors.flowmachine_errors import (
     QueryErroredException,
     QueryResetFailedException,
 )
-from flowmachine.core.query_state import QueryStateMachine, QueryState, QueryEvent
+from flowmachine.core.query_state import (
+    QueryStateMachine,
+    QueryState,
+    QueryEvent,
+    stored_queries_version_key,
+)
 import flowmachine.utils
 
 
@@ -58,7 +65,9 @@ def test_blocks(blocking_state, monkeypatch, dummy_redis):
     state_machine = QueryStateMachine(dummy_redis, "DUMMY_QUERY_ID", get_db().conn_id)
     dummy_redis.set(state_machine.state_machine._name, blocking_state)
     monkeypatch.setattr(
-        flowmachine.core.query_state, "_sleep", Mock(side_effect=BlockingIOError)
+        flowmachine.core.query_state,
+        "_wait_for_message",
+        Mock(side_effect=BlockingIOError),
     )
 
     with pytest.raises(BlockingIOError):
@@ -69,7 +78,9 @@ def test_no_limit_on_blocks(monkeypatch):
     """Test that even with a large number of queries, starting a store op will block calls to get_query."""
 
     monkeypatch.setattr(
-        flowmachine.core.query_state, "_sleep", Mock(side_effect=BlockingIOError)
+        flowmachine.core.query_state,
+        "_wait_for_message",
+        Mock(side_effect=BlockingIOError),
     )
     dummies = [DummyQuery(dummy_id=x) for x in range(50)]
     [dummy.store() for dummy in dummies]
@@ -84,7 +95,9 @@ def test_non_blocking(monkeypatch):
     dummies = [DummyQuery(dummy_id=x) for x in range(50)]
     [dummy.store() for dummy in dummies]
     monkeypatch.setattr(
-        flowmachine.core.query_state, "_sleep", Mock(side_effect=BlockingIOError)
+        flowmachine.core.query_state,
+        "_wait_for_message",
+        Mock(side_effect=BlockingIOError),
     )
 
     with pytest.raises(BlockingIOError):
@@ -105,7 +118,9 @@ def test_non_blocks(non_blocking_state, expected_return, monkeypatch, dummy_redi
     state_machine = QueryStateMachine(dummy_redis, "DUMMY_QUERY_ID", get_db().conn_id)
     dummy_redis.set(state_machine.state_machine._name, non_blocking_state)
     monkeypatch.setattr(
-        flowmachine.core.query_state, "_sleep", Mock(side_effect=BlockingIOError)
+        flowmachine.core.query_state,
+        "_wait_for_message",
+        Mock(side_effect=BlockingIOError),
     )
 
     try:
@@ -179,3 +194,91 @@ def test_drop_query_errors():
     qsm.execute()
     with pytest.raises(QueryResetFailedException):
         q.invalidate_db_cache()
+
+
+def test_state_changes_are_published():
+    """Test that successful state transitions are published to the state change channel."""
+    qsm = QueryStateMachine(get_redis(), "DUMMY_QUERY_ID", get_db().conn_id)
+    pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(qsm.state_change_channel)
+    pubsub.get_message(timeout=1)  # Consume the subscription confirmation
+    qsm.enqueue()
+    qsm.finish()  # Not a valid transition from queued, so shouldn't publish
+    qsm.execute()
+    assert pubsub.get_message(timeout=1)["data"] == b"queued"
+    assert pubsub.get_message(timeout=1)["data"] == b"executing"
+    assert pubsub.get_message(timeout=1) is None
+    pubsub.close()
+
+
+def test_wait_until_complete_wakes_on_state_change():
+    """Test that waiting for a query is ended by a state change notification, rather than the timeout."""
+    qsm = QueryStateMachine(get_redis(), "DUMMY_QUERY_ID", get_db().conn_id)
+    qsm.enqueue()
+    qsm.execute()
+    finisher = threading.Timer(0.1, qsm.finish)
+    finisher.start()
+    start = time.monotonic()
+    qsm.wait_until_complete(sleep_duration=30)
+    finisher.join()
+    assert qsm.is_completed
+    assert time.monotonic() - start < 10
+
+
+@pytest.mark.asyncio
+async def test_wait_for_state_change_wakes_on_state_change(dummy_redis):
+    """Test that waiting for a state change is ended by a state change notification, rather than the timeout."""
+    qsm = QueryStateMachine(dummy_redis, "DUMMY_QUERY_ID", get_db().conn_id)
+    qsm.enqueue()
+    qsm.execute()
+    asyncio.get_running_loop().call_later(0.1, qsm.finish)
+    start = time.monotonic()
+    state = await qsm.wait_for_state_change(QueryState.EXECUTING, timeout=30)
+    assert state == QueryState.COMPLETED
+    assert time.monotonic() - start < 10
+
+
+@pytest.mark.asyncio
+async def test_wait_for_state_change_times_out(dummy_redis):
+    """Test that waiting for a state change returns the unchanged state after the timeout."""
+    qsm = QueryStateMachine(dummy_redis, "DUMMY_QUERY_ID", get_db().conn_id)
+    qsm.enqueue()
+    state = await qsm.wait_for_state_change(QueryState.QUEUED, timeout=0.2)
+    assert state == QueryState.QUEUED
+
+
+@pytest.mark.asyncio
+async def test_wait_for_state_change_returns_immediately_if_changed(dummy_redis):
+    """Test that waiting for a query to leave a state it isn't in doesn't wait."""
+    qsm = QueryStateMachine(dummy_redis, "DUMMY_QUERY_ID", get_db().conn_id)
+    qsm.enqueue()
+    start = time.monotonic()
+    state = await qsm.wait_for_state_change(QueryState.EXECUTING, timeout=30)
+    assert state == QueryState.QUEUED
+    assert time.monotonic() - start < 10
+
+
+@pytest.mark.parametrize(
+    "events, changes",
+    [
+        ((QueryEvent.QUEUE, QueryEvent.EXECUTE), False),
+        ((QueryEvent.QUEUE, QueryEvent.EXECUTE, QueryEvent.ERROR), False),
+        ((QueryEvent.QUEUE, QueryEvent.EXECUTE, QueryEvent.FINISH), True),
+        ((QueryEvent.RESET,), True),
+        ((QueryEvent.FINISH_RESET,), True),
+    ],
+)
+def test_stored_queries_version_changes(events, changes, dummy_redis):
+    """Test that the stored queries version changes when a query is stored or reset."""
+    state_machine = QueryStateMachine(dummy_redis, "DUMMY_QUERY_ID", get_db().conn_id)
+    if events[0] != QueryEvent.QUEUE:
+        # Start from a stored query
+        for event in (QueryEvent.QUEUE, QueryEvent.EXECUTE, QueryEvent.FINISH):
+            state_machine.trigger_event(event)
+        if events[0] == QueryEvent.FINISH_RESET:
+            state_machine.trigger_event(QueryEvent.RESET)
+    version_key = stored_queries_version_key(get_db().conn_id)
+    version = dummy_redis.get(version_key)
+    for event in events:
+        state_machine.trigger_event(event)
+    assert (dummy_redis.get(version_key) != version) == changes
@@ -0,0 +1,105 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Tests for the cache of SQL compiled for queries.
+"""
+from unittest.mock import Mock
+
+import pytest
+
+import flowmachine.core.cache
+from flowmachine.core import Query
+from flowmachine.core.context import get_db, get_redis
+from flowmachine.core.query_state import stored_queries_version_key
+from flowmachine.core.sql_cache import sql_cache
+from flowmachine.features import daily_location
+
+
+@pytest.fixture
+def stored_query_checks(monkeypatch):
+    """
+    Count the times queries check whether they are stored.
+    """
+    sql_cache.clear()
+    checks = Mock(wraps=Query._get_stored_query)
+    monkeypatch.setattr(Query, "_get_stored_query", lambda self: checks(self))
+    yield checks
+    sql_cache.clear()
+
+
+def test_repeated_compilation_cached(stored_query_checks):
+    """
+    Test that compiling the same query again doesn't check whether its subqueries are stored.
+    """
+    agg = daily_location("2016-01-01").aggregate()
+    sql = agg.get_query()
+    assert stored_query_checks.call_count > 1
+    stored_query_checks.reset_mock()
+    assert sql == agg.get_query()
+    assert stored_query_checks.call_count == 0
+
+
+def test_storing_dependency_invalidates(stored_query_checks):
+    """
+    Test that storing a subquery invalidates the SQL compiled for queries which use it.
+    """
+    dl = daily_location("2016-01-01")
+    agg = dl.aggregate()
+    assert dl.fully_qualified_table_name not in agg.get_query()
+    dl.store().result()
+    assert dl.fully_qualified_table_name in agg.get_query()
+
+
+def test_resetting_dependency_invalidates(stored_query_checks):
+    """
+    Test that resetting a subquery invalidates the SQL compiled for queries which use it.
+    """
+    dl = daily_location("2016-01-01")
+    agg = dl.aggregate()
+    dl.store().result()
+    assert dl.fully_qualified_table_name in agg.get_query()
+    dl.invalidate_db_cache()
+    assert dl.fully_qualified_table_name not in agg.get_query()
+    assert len(agg.get_dataframe()) > 0
+
+
+def test_version_changed_elsewhere_invalidates(stored_query_checks):
+    """
+    Test that a change to the stored queries version in redis (e.g. by another process) invalidates the cache.
+    """
+    agg = daily_location("2016-01-01").aggregate()
+    agg.get_query()
+    get_redis().set(stored_queries_version_key(get_db().conn_id), "CHANGED")
+    stored_query_checks.reset_mock()
+    agg.get_query()
+    assert stored_query_checks.call_count > 1
+
+
+def test_cache_hits_touch_stored_queries(stored_query_checks, monkeypatch):
+    """
+    Test that stored subqueries are touched once, in one statement, each time SQL
+    which reads them is compiled, including when the SQL comes from the cache.
+    """
+    dl = daily_location("2016-01-01")
+    dl.store().result()
+    agg = dl.aggregate()
+
+    def access_count():
+        return get_db().fetch(
+            f"SELECT access_count FROM cache.cached WHERE query_id='{dl.query_id}'"
+        )[0][0]
+
+    initial_count = access_count()
+    agg.get_query()
+    assert access_count() == initial_count + 1
+
+    touches = Mock(wraps=flowmachine.core.cache.touch_cache_records)
+    monkeypatch.setattr(flowmachine.core.cache, "touch_cache_records", touches)
+    stored_query_checks.reset_mock()
+    agg.get_query()
+    dl.get_query()
+    assert stored_query_checks.call_count == 0
+    assert access_count() == initial_count + 3
+    assert touches.call_count == 2